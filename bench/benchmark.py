@@ -0,0 +1,201 @@
+"""
+kokex.keywords, sentences, parse 의 처리량, 단계별 수행 시간, 최대 메모리 사용량을 측정합니다
+
+합성 문서는 트윗(140자) 부터 책의 한 장(100KB) 까지 크기별로, 저장소에 포함된 bench/corpus 의 문서는 그대로 측정합니다.
+--output 으로 결과를 JSON 파일로 저장하고, --baseline 으로 저장된 결과와 비교하여
+처리량(docs/sec)이 --tolerance 보다 많이 줄거나 최대 메모리가 --memory-tolerance 보다 많이 늘면 실패합니다.
+
+    python bench/benchmark.py --output result.json
+    python bench/benchmark.py --baseline bench/baseline.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from os import path
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from scaling import SAMPLE_PARAGRAPH, make_document
+
+import kokex
+from kokex.core.metrics import STAGES
+from kokex.core.reader import iter_documents
+
+CORPUS_DIR = path.join(path.dirname(path.abspath(__file__)), "corpus")
+
+# 크기 이름: 문서 하나의 크기(KB), 0 이면 SAMPLE_PARAGRAPH 의 첫 문장 정도 (140자)
+SYNTHETIC_SIZES = {
+    "tweet": 0,
+    "paragraph": 1,
+    "article": 10,
+    "chapter": 100,
+}
+TARGETS = ("keywords", "sentences", "parse")
+
+
+def synthetic_corpora(total_kb):
+    # 크기별로 전체 분량이 비슷하도록 문서 수를 정한다
+    corpora = {}
+    for name, size_kb in SYNTHETIC_SIZES.items():
+        if size_kb == 0:
+            document = SAMPLE_PARAGRAPH[:140]
+            count = max(1, total_kb * 1024 // len(document.encode("utf-8")))
+        else:
+            document = make_document(size_kb)
+            count = max(1, total_kb // size_kb)
+        corpora[f"synthetic/{name}"] = [
+            f"{idx}번 문서. {document}" for idx in range(count)
+        ]
+    return corpora
+
+
+def checked_in_corpora():
+    corpora = {}
+    for filename in ("sample.txt",):
+        corpora[f"corpus/{filename}"] = list(
+            iter_documents(path.join(CORPUS_DIR, filename))
+        )
+    return corpora
+
+
+def run_target(target, docs):
+    if target == "keywords":
+        kokex.keywords(docs)
+    elif target == "sentences":
+        for doc in docs:
+            kokex.sentences(doc)
+    else:
+        for doc in docs:
+            kokex.parse(doc)
+
+
+def measure(target, docs, repeat):
+    # 처리량은 가장 빠른 반복으로, 단계별 시간은 그 반복의 문서당 평균으로 계산한다
+    best = None
+    for _ in range(repeat):
+        with kokex.collect_stats() as collector:
+            started = time.perf_counter()
+            run_target(target, docs)
+            elapsed = time.perf_counter() - started
+        if best is None or elapsed < best[0]:
+            best = (elapsed, collector)
+
+    elapsed, collector = best
+
+    # tracemalloc 은 수행 시간을 늘리므로 따로 한번 더 실행하여 측정한다
+    tracemalloc.start()
+    run_target(target, docs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    chars = sum(len(doc) for doc in docs)
+    return {
+        "docs": len(docs),
+        "chars": chars,
+        "seconds": elapsed,
+        "docs_per_sec": len(docs) / elapsed,
+        "chars_per_sec": chars / elapsed,
+        "stages_ms": {
+            stage: collector.stages[stage].sum * 1000 / len(docs) for stage in STAGES
+        },
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """
+    :return: 기준보다 나빠진 항목의 설명 리스트
+    """
+    baseline = {
+        (result["corpus"], result["target"]): result for result in baseline["results"]
+    }
+
+    regressions = []
+    for result in results:
+        base = baseline.get((result["corpus"], result["target"]))
+        if base is None:
+            continue
+
+        name = f"{result['corpus']} {result['target']}"
+        speed = result["docs_per_sec"] / base["docs_per_sec"]
+        memory = result["peak_memory_kb"] / base["peak_memory_kb"]
+        if speed < 1 - tolerance:
+            regressions.append(f"{name}: docs/sec {speed:.2f}x of baseline")
+        if memory > 1 + memory_tolerance:
+            regressions.append(f"{name}: peak memory {memory:.2f}x of baseline")
+
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    arg_parser.add_argument(
+        "--targets", nargs="+", default=list(TARGETS), choices=TARGETS, help="측정할 함수"
+    )
+    arg_parser.add_argument(
+        "--total-kb", type=int, default=100, help="합성 문서의 크기별 전체 분량(KB)"
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3, help="반복 횟수")
+    arg_parser.add_argument("--output", help="결과를 저장할 JSON 파일")
+    arg_parser.add_argument("--baseline", help="비교할 기준 결과 JSON 파일")
+    arg_parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="처리량 감소의 허용 비율"
+    )
+    arg_parser.add_argument(
+        "--memory-tolerance", type=float, default=0.2, help="최대 메모리 증가의 허용 비율"
+    )
+    args = arg_parser.parse_args()
+
+    kokex.warmup()
+    corpora = {**synthetic_corpora(args.total_kb), **checked_in_corpora()}
+
+    results = []
+    print(
+        f"{'corpus':<22} {'target':<10} {'docs/s':>10} {'kchars/s':>10} {'peak(KB)':>10}"
+    )
+    for corpus, docs in corpora.items():
+        for target in args.targets:
+            result = {
+                "corpus": corpus,
+                "target": target,
+                **measure(target, docs, args.repeat),
+            }
+            results.append(result)
+            print(
+                f"{corpus:<22} {target:<10} {result['docs_per_sec']:>10.1f} "
+                f"{result['chars_per_sec'] / 1000:>10.1f} {result['peak_memory_kb']:>10.0f}"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": kokex.__version__,
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print(f"FAIL: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("baseline 대비 성능 저하 없음")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+문서 길이에 따른 DocumentParser.parse 의 수행 시간을 측정합니다
+
+1KB 부터 1MB 까지 문서 길이를 늘려가며 KB 당 수행 시간을 비교하고,
+가장 긴 문서의 KB 당 수행 시간이 가장 짧은 문서보다 --max-ratio 배 이상 느려지면 실패합니다.
+
+    python bench/scaling.py
+"""
+import argparse
+import sys
+import time
+from os import path
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from kokex.core.parser import DocumentParser
+
+SAMPLE_PARAGRAPH = (
+    "서울시는 오늘 대중교통 요금 인상안을 발표했다. 시민단체는 즉각 반발했다. "
+    '시장은 "요금 인상은 불가피한 선택입니다"라고 말했다. '
+    "인공지능 기술의 발전으로 자연어 처리 분야가 빠르게 성장하고 있다. "
+    "특히 한국어 형태소 분석기의 성능이 크게 향상되었다!\n"
+    "'기생충'이 아카데미 작품상을 받았다. 봉준호 감독은 기뻐했다... "
+    "#영화 #아카데미 관련 소식은 https://example.com 에서 확인하세요.\n"
+)
+
+DOCUMENT_SIZES_KB = [1, 10, 100, 1000]
+
+
+def make_document(size_kb):
+    size = size_kb * 1024
+    paragraphs = []
+    length = 0
+    idx = 0
+    while length < size:
+        paragraph = f"{idx}번째 단락입니다. " + SAMPLE_PARAGRAPH
+        paragraphs.append(paragraph)
+        length += len(paragraph.encode("utf-8"))
+        idx += 1
+    return "".join(paragraphs)
+
+
+def measure(parser, document, repeat):
+    elapsed = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parser.parse(document=document)
+        elapsed.append(time.perf_counter() - started)
+    return min(elapsed)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DOCUMENT_SIZES_KB, help="문서 크기(KB)"
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3, help="크기별 반복 횟수")
+    arg_parser.add_argument(
+        "--max-ratio", type=float, default=3.0, help="KB 당 수행시간 비율의 허용 한도"
+    )
+    args = arg_parser.parse_args()
+
+    parser = DocumentParser()
+    parser.parse(document=SAMPLE_PARAGRAPH)
+
+    per_kb = []
+    print(f"{'size(KB)':>10} {'time(s)':>10} {'ms/KB':>10}")
+    for size_kb in args.sizes:
+        elapsed = measure(parser, make_document(size_kb), args.repeat)
+        per_kb.append(elapsed * 1000 / size_kb)
+        print(f"{size_kb:>10} {elapsed:>10.3f} {per_kb[-1]:>10.2f}")
+
+    ratio = per_kb[-1] / per_kb[0]
+    print(f"ms/KB ratio (largest / smallest): {ratio:.2f}")
+    if ratio > args.max_ratio:
+        print(f"FAIL: ratio exceeds {args.max_ratio}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
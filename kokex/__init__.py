@@ -1,6 +1,60 @@
 """
 한국어 키워드 추출기
 """
-from kokex.api import keywords, parse, sentences
+import importlib
+from typing import TYPE_CHECKING
 
 __version__ = "0.0.11"
+
+# import kokex 를 빠르게 하기 위해 공개 이름은 처음 사용할 때 해당 모듈에서 불러온다
+# 형태소 분석기와 사전은 첫 분석 때, 혹은 kokex.warmup() 을 호출할 때 적재된다
+_LAZY_NAMES = {
+    "count_keywords": "kokex.api",
+    "iter_keywords": "kokex.api",
+    "keyword_spans": "kokex.api",
+    "keywords": "kokex.api",
+    "parse": "kokex.api",
+    "sentence_spans": "kokex.api",
+    "sentences": "kokex.api",
+    "warmup": "kokex.api",
+    "DiskCache": "kokex.core.cache",
+    "ParseCache": "kokex.core.cache",
+    "KeywordIndex": "kokex.core.index",
+    "StatsCollector": "kokex.core.metrics",
+    "collect_stats": "kokex.core.metrics",
+    "CustomPatterns": "kokex.core.patterns",
+    "KeywordScorer": "kokex.core.scoring",
+}
+
+__all__ = list(_LAZY_NAMES)
+
+
+def __getattr__(name):
+    if name not in _LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_LAZY_NAMES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
+
+
+if TYPE_CHECKING:
+    from kokex.api import (
+        count_keywords,
+        iter_keywords,
+        keyword_spans,
+        keywords,
+        parse,
+        sentence_spans,
+        sentences,
+        warmup,
+    )
+    from kokex.core.cache import DiskCache, ParseCache
+    from kokex.core.index import KeywordIndex
+    from kokex.core.metrics import StatsCollector, collect_stats
+    from kokex.core.patterns import CustomPatterns
+    from kokex.core.scoring import KeywordScorer
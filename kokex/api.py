@@ -1,51 +1,383 @@
-from collections import defaultdict
-from typing import Dict, List
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from os import PathLike
+from typing import IO, Dict, Iterable, Iterator, List, Tuple, Union
 
+from kokex.core.cache import DiskCache, ParseCache
 from kokex.core.parser import DocumentParser
+from kokex.core.patterns import CustomPatterns
+from kokex.core.pool import WARMUP_DOCUMENT, ParserPool
+from kokex.core.reader import iter_documents
+from kokex.core.scoring import SCORING_COUNT, KeywordScorer
+from kokex.core.tree import FORMAT_PLAIN
 
+# 프로세스 전체에서 공유하는 파서 풀, 크기는 환경변수 KOKEX_POOL_SIZE 로 지정한다
+_pool = ParserPool()
 
-def keywords(docs: List[str]) -> Dict[str, int]:
+
+def warmup(pool_size: int = None):
+    """
+    파서 풀을 미리 채워 첫 요청에서 Mecab 사전을 읽는 지연을 없앱니다
+
+    :param pool_size: 파서 풀의 최대 크기 (기본값 환경변수 KOKEX_POOL_SIZE 또는 4)
+    :return: void
+    """
+    if pool_size is not None:
+        _pool.resize(pool_size)
+    _pool.warmup()
+
+
+def keywords(
+    docs: Iterable[str],
+    workers: int = None,
+    chunk_size: int = 64,
+    custom_patterns: Union[List[Dict[str, str]], CustomPatterns] = None,
+    cache: Union[ParseCache, DiskCache] = None,
+    scoring: str = SCORING_COUNT,
+    top_k: int = None,
+) -> Dict[str, Union[int, float]]:
     """
     문서 목록을 받아서 포함된 키워드를 리턴합니다
 
     :param docs: 문서 목록
-    :return: 키워드와 빈도가 담긴 딕셔너리
+    :param workers: 2 이상이면 지정한 개수의 프로세스에서 나누어 분석 (기본값 None, 현재 프로세스에서 분석)
+    :param chunk_size: 프로세스에 한번에 전달할 문서의 개수 (기본값 64)
+    :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}] 혹은 CustomPatterns (기본값 None)
+    :param cache: 분석 결과를 재사용할 ParseCache 혹은 DiskCache, 여러 프로세스에서 분석할 때 ParseCache 는 프로세스마다 따로 보관 (기본값 None)
+    :param scoring: 키워드 점수 계산 방식 count(빈도), df(문서 빈도), tfidf, bm25 중 하나 (기본값 count)
+    :param top_k: 지정하면 점수가 높은 키워드 top_k 개만 점수 순서대로 리턴 (기본값 None)
+    :return: 키워드와 점수(기본값은 빈도)가 담긴 딕셔너리
     """
+    custom_patterns = CustomPatterns.of(custom_patterns)
+    if scoring != SCORING_COUNT or top_k is not None:
+        scorer = _score_keywords_all(
+            docs, workers, chunk_size, custom_patterns, cache, scoring
+        )
+        if top_k is None:
+            return scorer.scores()
+        return dict(scorer.top(top_k))
+
     result = defaultdict(int)
-    parser = DocumentParser()
+    if workers is not None and workers > 1:
+        # 청크의 순서대로 병합하므로 결과는 workers 값과 무관하게 동일하다
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(custom_patterns, cache),
+        ) as executor:
+            for counts in _map_in_order(
+                executor, _count_keywords, _chunks(docs, chunk_size), workers * 2
+            ):
+                for word, count in counts.items():
+                    result[word] += count
+        return result
 
-    for doc in docs:
-        parser.parse(document=doc)
+    with _pool.parser() as parser:
+        for doc in docs:
+            parser.parse(
+                document=doc,
+                custom_patterns=custom_patterns,
+                cache=cache,
+                build_tree=False,
+            )
 
-        for word in parser.keywords():
-            result[word] += 1
+            for word in parser.keywords():
+                result[word] += 1
 
     return result
 
 
-def sentences(doc: str) -> List[str]:
+def iter_keywords(
+    docs: Union[Iterable[str], str, PathLike, IO],
+    workers: int = None,
+    chunk_size: int = 64,
+    custom_patterns: Union[List[Dict[str, str]], CustomPatterns] = None,
+    text_field: str = "doc",
+    format: str = None,
+    cache: Union[ParseCache, DiskCache] = None,
+) -> Iterator[List[str]]:
+    """
+    문서를 하나씩 분석하여 문서별 키워드 목록을 차례로 돌려줍니다
+
+    :param docs: 문서 iterable, 파일 경로 혹은 열린 파일 객체 (한 줄에 한 문서, 혹은 jsonl)
+    :param workers: 2 이상이면 지정한 개수의 프로세스에서 나누어 분석 (기본값 None, 현재 프로세스에서 분석)
+    :param chunk_size: 프로세스에 한번에 전달할 문서의 개수 (기본값 64)
+    :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}] 혹은 CustomPatterns (기본값 None)
+    :param text_field: jsonl 의 각 줄이 객체일 때 문서가 담긴 필드 이름 (기본값 doc)
+    :param format: 파일 형식 lines 혹은 jsonl, 지정하지 않으면 파일 확장자로 판단 (기본값 None)
+    :param cache: 분석 결과를 재사용할 ParseCache 혹은 DiskCache, 여러 프로세스에서 분석할 때 ParseCache 는 프로세스마다 따로 보관 (기본값 None)
+    :return: 입력 순서대로 문서별 키워드 목록을 돌려주는 generator
+    """
+    docs = iter_documents(docs, text_field=text_field, format=format)
+    custom_patterns = CustomPatterns.of(custom_patterns)
+
+    if workers is not None and workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(custom_patterns, cache),
+        ) as executor:
+            for chunk_keywords in _map_in_order(
+                executor, _extract_keywords, _chunks(docs, chunk_size), workers * 2
+            ):
+                yield from chunk_keywords
+        return
+
+    for doc in docs:
+        with _pool.parser() as parser:
+            parser.parse(
+                document=doc,
+                custom_patterns=custom_patterns,
+                cache=cache,
+                build_tree=False,
+            )
+            result = parser.keywords()
+        yield result
+
+
+def count_keywords(
+    docs: Union[Iterable[str], str, PathLike, IO],
+    workers: int = None,
+    chunk_size: int = 64,
+    custom_patterns: Union[List[Dict[str, str]], CustomPatterns] = None,
+    text_field: str = "doc",
+    format: str = None,
+    cache: Union[ParseCache, DiskCache] = None,
+    scoring: str = SCORING_COUNT,
+    top_k: int = None,
+) -> Dict[str, Union[int, float]]:
+    """
+    문서를 하나씩 읽어가며 키워드 빈도를 집계합니다. 문서 전체를 메모리에 올리지 않습니다
+
+    :param docs: 문서 iterable, 파일 경로 혹은 열린 파일 객체 (한 줄에 한 문서, 혹은 jsonl)
+    :param workers: 2 이상이면 지정한 개수의 프로세스에서 나누어 분석 (기본값 None, 현재 프로세스에서 분석)
+    :param chunk_size: 프로세스에 한번에 전달할 문서의 개수 (기본값 64)
+    :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}] 혹은 CustomPatterns (기본값 None)
+    :param text_field: jsonl 의 각 줄이 객체일 때 문서가 담긴 필드 이름 (기본값 doc)
+    :param format: 파일 형식 lines 혹은 jsonl, 지정하지 않으면 파일 확장자로 판단 (기본값 None)
+    :param cache: 분석 결과를 재사용할 ParseCache 혹은 DiskCache, 여러 프로세스에서 분석할 때 ParseCache 는 프로세스마다 따로 보관 (기본값 None)
+    :param scoring: 키워드 점수 계산 방식 count(빈도), df(문서 빈도), tfidf, bm25 중 하나 (기본값 count)
+    :param top_k: 지정하면 점수가 높은 키워드 top_k 개만 점수 순서대로 리턴 (기본값 None)
+    :return: 키워드와 점수(기본값은 빈도)가 담긴 딕셔너리
+    """
+    return keywords(
+        iter_documents(docs, text_field=text_field, format=format),
+        workers=workers,
+        chunk_size=chunk_size,
+        custom_patterns=custom_patterns,
+        cache=cache,
+        scoring=scoring,
+        top_k=top_k,
+    )
+
+
+def sentences(
+    doc: str,
+    custom_patterns: Union[List[Dict[str, str]], CustomPatterns] = None,
+    cache: Union[ParseCache, DiskCache] = None,
+) -> List[str]:
     """
     문서를 입력 받아 문장으로 분리한 리스트를 리턴합니다
 
     :param doc: 문서
+    :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}] 혹은 CustomPatterns (기본값 None)
+    :param cache: 분석 결과를 재사용할 ParseCache 혹은 DiskCache (기본값 None)
     :return: 문장으로 분리한 리스트
     """
-    parser = DocumentParser()
-    parser.parse(document=doc)
+    with _pool.parser() as parser:
+        parser.parse(
+            document=doc,
+            custom_patterns=custom_patterns,
+            cache=cache,
+            build_tree=False,
+            eager_phrase=False,
+        )
+
+        return parser.sentences()
+
+
+def keyword_spans(
+    doc: str,
+    custom_patterns: Union[List[Dict[str, str]], CustomPatterns] = None,
+    cache: Union[ParseCache, DiskCache] = None,
+) -> List[Tuple[str, int, int]]:
+    """
+    문서의 키워드를 원래 문서에서의 위치와 함께 리턴합니다.
+    위치는 전처리 전 문서 기준이므로 doc[start:end] 로 키워드가 나타난 부분을 찾을 수 있습니다.
+
+    :param doc: 문서
+    :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}] 혹은 CustomPatterns (기본값 None)
+    :param cache: 분석 결과를 재사용할 ParseCache 혹은 DiskCache (기본값 None)
+    :return: [(키워드, 시작 위치, 끝 위치)] 리스트
+    """
+    with _pool.parser() as parser:
+        parser.parse(
+            document=doc, custom_patterns=custom_patterns, cache=cache, build_tree=False
+        )
+
+        return parser.keyword_spans()
+
+
+def sentence_spans(
+    doc: str,
+    custom_patterns: Union[List[Dict[str, str]], CustomPatterns] = None,
+    cache: Union[ParseCache, DiskCache] = None,
+) -> List[Tuple[str, int, int]]:
+    """
+    문서를 문장으로 분리하여 원래 문서에서의 위치와 함께 리턴합니다.
+    위치는 전처리 전 문서 기준이므로 doc[start:end] 로 문장이 나타난 부분을 찾을 수 있습니다.
 
-    return parser.sentences()
+    :param doc: 문서
+    :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}] 혹은 CustomPatterns (기본값 None)
+    :param cache: 분석 결과를 재사용할 ParseCache 혹은 DiskCache (기본값 None)
+    :return: [(문장, 시작 위치, 끝 위치)] 리스트
+    """
+    with _pool.parser() as parser:
+        parser.parse(
+            document=doc,
+            custom_patterns=custom_patterns,
+            cache=cache,
+            build_tree=False,
+            eager_phrase=False,
+        )
 
+        return parser.sentence_spans()
 
-def parse(doc: str, debug: bool = True, custom_patterns: List[Dict[str, str]] = []):
+
+def parse(
+    doc: str,
+    debug: bool = True,
+    custom_patterns: Union[List[Dict[str, str]], CustomPatterns] = None,
+    cache: Union[ParseCache, DiskCache] = None,
+    format: str = FORMAT_PLAIN,
+):
     """
     문서를 입력받아서 파싱된 결과를 문자열로 리턴합니다
 
     :param doc: 입력 문서
     :param debug: true 일 경우 문서위계, 5언 7성분 9품사 정보를 함께 출력 (기본값 true)
-    :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}] (기본값 [])
+    :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}] 혹은 CustomPatterns (기본값 None)
+    :param cache: 분석 결과를 재사용할 ParseCache 혹은 DiskCache (기본값 None)
+    :param format: 출력 형식 plain, html(이스케이프된 HTML), json(한 줄에 노드 하나) 중 하나 (기본값 plain)
     :return: 출력을 위해 들여쓰기가 된 문자열
     """
-    parser = DocumentParser()
-    parser.parse(document=doc, custom_patterns=custom_patterns)
+    with _pool.parser() as parser:
+        parser.parse(document=doc, custom_patterns=custom_patterns, cache=cache)
+
+        return parser.printable_tree(debug=debug, format=format)
+
+
+def _score_keywords_all(docs, workers, chunk_size, custom_patterns, cache, scoring):
+    # 점수 계산에 필요한 빈도는 문서를 한번 분석할 때 모두 집계한다
+    scorer = KeywordScorer(scoring=scoring)
+
+    if workers is not None and workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(custom_patterns, cache),
+        ) as executor:
+            for chunk_scorer in _map_in_order(
+                executor,
+                partial(_score_keywords, scoring),
+                _chunks(docs, chunk_size),
+                workers * 2,
+            ):
+                scorer.merge(chunk_scorer)
+        return scorer
+
+    with _pool.parser() as parser:
+        for doc in docs:
+            parser.parse(
+                document=doc,
+                custom_patterns=custom_patterns,
+                cache=cache,
+                build_tree=False,
+            )
+            scorer.add(parser.keywords())
+
+    return scorer
+
+
+##### 멀티 프로세스 처리 관련 함수 시작
+# 각 워커 프로세스가 보유하는 파서
+_worker_parser = None
+_worker_custom_patterns = None
+_worker_cache = None
+
+
+def _init_worker(custom_patterns, cache):
+    global _worker_parser, _worker_custom_patterns, _worker_cache
+    _worker_parser = DocumentParser()
+    _worker_parser.parse(document=WARMUP_DOCUMENT)
+    _worker_custom_patterns = custom_patterns
+    _worker_cache = cache
+
+
+def _count_keywords(docs):
+    counts = defaultdict(int)
+    for doc in docs:
+        _worker_parser.parse(
+            document=doc,
+            custom_patterns=_worker_custom_patterns,
+            cache=_worker_cache,
+            build_tree=False,
+        )
+
+        for word in _worker_parser.keywords():
+            counts[word] += 1
+
+    return dict(counts)
+
+
+def _score_keywords(scoring, docs):
+    scorer = KeywordScorer(scoring=scoring)
+    for doc in docs:
+        _worker_parser.parse(
+            document=doc,
+            custom_patterns=_worker_custom_patterns,
+            cache=_worker_cache,
+            build_tree=False,
+        )
+        scorer.add(_worker_parser.keywords())
+
+    return scorer
+
+
+def _extract_keywords(docs):
+    result = []
+    for doc in docs:
+        _worker_parser.parse(
+            document=doc,
+            custom_patterns=_worker_custom_patterns,
+            cache=_worker_cache,
+            build_tree=False,
+        )
+        result.append(_worker_parser.keywords())
+
+    return result
+
+
+def _chunks(docs, chunk_size):
+    if chunk_size < 1:
+        raise ValueError("chunk_size 는 1 이상이어야 합니다")
+
+    docs = iter(docs)
+    chunk = list(islice(docs, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(docs, chunk_size))
+
+
+def _map_in_order(executor, func, items, window):
+    # executor.map 은 입력을 한번에 모두 제출하므로, 진행 중인 작업 수를 제한하며 순서대로 결과를 돌려준다
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
 
-    return parser.printable_tree(debug=debug)
+    while pending:
+        yield pending.popleft().result()
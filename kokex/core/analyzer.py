@@ -0,0 +1,275 @@
+import re
+import subprocess
+import threading
+from os import environ
+
+ANALYZER_KONLPY = "konlpy"
+ANALYZER_MECAB = "mecab"
+ANALYZER_SUBPROCESS = "subprocess"
+ANALYZER_FAKE = "fake"
+
+# konlpy 와 결과가 같으면서 JPype 를 적재하지 않는 mecab-python3 바인딩을 기본으로 사용한다
+DEFAULT_ANALYZER = ANALYZER_MECAB
+
+# konlpy.tag.Mecab 과 같은 기본 사전 경로, 환경변수 KOKEX_MECAB_DICPATH 로 바꿀 수 있다
+DEFAULT_DICPATH = "/usr/local/lib/mecab/dic/mecab-ko-dic"
+
+
+def mecab_dicpath():
+    """
+    :return: 환경변수 KOKEX_MECAB_DICPATH 로 지정한 Mecab 사전 경로, 지정하지 않으면 konlpy 와 같은 기본 경로
+    """
+    return environ.get("KOKEX_MECAB_DICPATH") or DEFAULT_DICPATH
+
+
+class Analyzer:
+    """
+    형태소 분석기 백엔드의 기본 클래스
+
+    pos 는 문자열 하나를, pos_many 는 여러 문자열을 한번에 분석합니다.
+    호출마다 드는 비용이 큰 백엔드는 pos_many 를 재정의하여 한번에 처리합니다.
+    """
+
+    name = None
+    dicpath = None  # 사전을 사용하는 백엔드의 사전 경로, 캐시 키에 분석기 이름과 함께 사용
+
+    @staticmethod
+    def default_dicpath():
+        """
+        :return: 사전 경로를 지정하지 않고 생성할 때 사용하는 사전 경로, 사전을 사용하지 않는 백엔드는 None
+        """
+        return None
+
+    def pos(self, text):
+        """
+        :param text: 분석할 문자열
+        :return: [(형태소, 태그)] 리스트
+        """
+        raise NotImplementedError
+
+    def pos_many(self, texts):
+        """
+        :param texts: 분석할 문자열 리스트
+        :return: 문자열마다 [(형태소, 태그)] 리스트, 입력 순서와 같음
+        """
+        return [self.pos(text) for text in texts]
+
+    def close(self):
+        """
+        백엔드가 사용하는 자원을 정리합니다.
+
+        :return: void
+        """
+
+
+class KonlpyMecabAnalyzer(Analyzer):
+    """
+    konlpy.tag.Mecab 을 사용하는 백엔드
+    """
+
+    name = ANALYZER_KONLPY
+    default_dicpath = staticmethod(mecab_dicpath)
+
+    def __init__(self, dicpath=None):
+        """
+        :param dicpath: Mecab 사전 경로 (기본값 None, 환경변수 KOKEX_MECAB_DICPATH 또는 konlpy 와 같은 경로)
+        """
+        from konlpy.tag import Mecab
+
+        self.dicpath = dicpath or self.default_dicpath()
+        self._mecab = Mecab(dicpath=self.dicpath)
+
+    def pos(self, text):
+        return self._mecab.pos(text)
+
+
+class MecabAnalyzer(Analyzer):
+    """
+    konlpy 를 거치지 않고 mecab-python3 (MeCab) 바인딩을 직접 사용하는 백엔드 (기본값)
+    결과는 konlpy 와 같으며, konlpy 가 불러오는 JPype 를 적재하지 않습니다.
+    """
+
+    name = ANALYZER_MECAB
+    default_dicpath = staticmethod(mecab_dicpath)
+
+    def __init__(self, dicpath=None):
+        """
+        :param dicpath: Mecab 사전 경로 (기본값 None, 환경변수 KOKEX_MECAB_DICPATH 또는 konlpy 와 같은 경로)
+        """
+        from MeCab import Tagger
+
+        self.dicpath = dicpath or self.default_dicpath()
+        self._tagger = Tagger(f"-d {self.dicpath}")
+
+    def pos(self, text):
+        return _parse_mecab_output(self._tagger.parse(text).splitlines()[:-1])
+
+
+class SubprocessMecabAnalyzer(Analyzer):
+    """
+    mecab 명령을 하위 프로세스로 띄워두고 한 줄에 문서 하나씩 주고받는 백엔드
+
+    Mecab 은 개행문자를 공백과 같이 취급하므로 개행문자는 공백으로 바꾸어 한 줄로 보냅니다.
+    pos_many 는 모든 문자열을 한번에 보내고 결과를 차례로 읽습니다.
+    """
+
+    name = ANALYZER_SUBPROCESS
+    default_dicpath = staticmethod(mecab_dicpath)
+
+    def __init__(self, command=None, dicpath=None):
+        """
+        :param command: 실행할 명령 리스트 (기본값 mecab -d dicpath, 입력 버퍼 16MB)
+        :param dicpath: Mecab 사전 경로 (기본값 None, 환경변수 KOKEX_MECAB_DICPATH 또는 konlpy 와 같은 경로)
+        """
+        self.dicpath = dicpath or self.default_dicpath()
+        if command is None:
+            command = ["mecab", "-d", self.dicpath, "-b", str(16 * 1024 * 1024)]
+
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self._lock = threading.Lock()
+
+    def pos(self, text):
+        return self.pos_many([text])[0]
+
+    def pos_many(self, texts):
+        lines = [text.replace("\n", " ") + "\n" for text in texts]
+
+        with self._lock:
+            # 결과를 읽지 않고 모두 쓰면 파이프가 가득 차서 멈출 수 있으므로 다른 스레드에서 쓴다
+            writer = threading.Thread(target=self._write, args=(lines,))
+            writer.start()
+            try:
+                return [self._read() for _ in lines]
+            finally:
+                writer.join()
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            self._process.wait()
+
+    def _write(self, lines):
+        self._process.stdin.writelines(lines)
+        self._process.stdin.flush()
+
+    def _read(self):
+        lines = []
+        for line in iter(self._process.stdout.readline, ""):
+            line = line.rstrip("\n")
+            if line == "EOS":
+                return _parse_mecab_output(lines)
+            lines.append(line)
+        raise RuntimeError("mecab 프로세스가 종료되었습니다")
+
+
+class FakeAnalyzer(Analyzer):
+    """
+    Mecab 없이 문자 종류로만 태그를 붙이는 결정적인 백엔드 (테스트용)
+
+    공백으로 나눈 어절을 한글, 숫자, 영문, 문장부호, 기타 문자의 연속으로 나누어
+    각각 NNG, SN, SL, SF(.?!) 혹은 SY 태그를 붙입니다.
+    """
+
+    name = ANALYZER_FAKE
+
+    RE_TOKEN = re.compile(r"[가-힣]+|[0-9]+|[a-zA-Z]+|[.?!]|[^\s가-힣0-9a-zA-Z.?!]+")
+
+    def pos(self, text):
+        return [(token, self._tag(token)) for token in self.RE_TOKEN.findall(text)]
+
+    @staticmethod
+    def _tag(token):
+        if "가" <= token[0] <= "힣":
+            return "NNG"
+        if token[0].isdigit():
+            return "SN"
+        if token[0].isascii() and token[0].isalpha():
+            return "SL"
+        if token in ".?!":
+            return "SF"
+        return "SY"
+
+
+_ANALYZERS = {
+    ANALYZER_KONLPY: KonlpyMecabAnalyzer,
+    ANALYZER_MECAB: MecabAnalyzer,
+    ANALYZER_SUBPROCESS: SubprocessMecabAnalyzer,
+    ANALYZER_FAKE: FakeAnalyzer,
+}
+
+
+def create_analyzer(analyzer=None):
+    """
+    형태소 분석기 백엔드를 생성합니다.
+
+    :param analyzer: Analyzer 객체 혹은 mecab, konlpy, subprocess, fake 중 하나 (기본값 None, 환경변수 KOKEX_ANALYZER 또는 mecab)
+    :return: Analyzer
+    """
+    if isinstance(analyzer, Analyzer):
+        return analyzer
+    return analyzer_class(analyzer)()
+
+
+def analyzer_class(name=None):
+    """
+    :param name: mecab, konlpy, subprocess, fake 중 하나 (기본값 None, 환경변수 KOKEX_ANALYZER 또는 mecab)
+    :return: 이름에 해당하는 Analyzer 클래스
+    """
+    name = name or environ.get("KOKEX_ANALYZER", DEFAULT_ANALYZER)
+    if name not in _ANALYZERS:
+        raise ValueError(f"지원하지 않는 형태소 분석기입니다: {name}")
+    return _ANALYZERS[name]
+
+
+def align_morph(text, morph, start=0):
+    """
+    형태소 분석 결과의 형태소가 문서에서 차지하는 위치를 찾습니다.
+    형태소가 앞 형태소 바로 뒤 (공백 제외) 에 없는 경우, 글자 단위로 비교하여 위치를 맞춥니다.
+
+    :param text: 분석한 문서
+    :param morph: 형태소 문자열
+    :param start: 탐색을 시작할 위치, 앞 형태소가 끝난 위치 (기본값 0)
+    :return: (시작 위치, 끝 위치)
+    """
+    # 앞 형태소와의 사이가 공백일 때만 찾은 위치를 사용한다 (뒤에 나오는 같은 문자열로 건너뛰지 않는다)
+    found = text.find(morph, start)
+    if found >= 0 and (found == start or text[start:found].isspace()):
+        return found, found + len(morph)
+
+    # 공백을 건너뛴 뒤 형태소의 글자를 차례로 맞춘다
+    # 문서에만 있는 글자 (예: 숫자의 쉼표) 는 어절 안에서만 건너뛰고 형태소에 포함한다
+    begin = start
+    while begin < len(text) and text[begin].isspace():
+        begin += 1
+    end = begin
+    for char in morph:
+        idx = end
+        while idx < len(text) and text[idx] != char and not text[idx].isspace():
+            idx += 1
+        if idx >= len(text) or text[idx] != char:
+            break
+        end = idx + 1
+
+    if end > begin:
+        return begin, end
+    if found >= 0:
+        return found, found + len(morph)
+    raise ValueError(f"형태소 분석 결과를 문서에서 찾을 수 없습니다: {morph!r}")
+
+
+def _parse_mecab_output(lines):
+    # konlpy.tag._mecab.parse 와 같은 규칙으로 "형태소\t태그,..." 줄을 (형태소, 태그) 로 바꾼다
+    result = []
+    for line in lines:
+        surface, tab, features = line.partition("\t")
+        if not tab:
+            result.append(("", "SY"))
+            continue
+        result.append((surface, features.split(",", 1)[0]))
+    return result
@@ -0,0 +1,535 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+from .analyzer import align_morph
+
+# 트리를 함께 저장할 때 노드 하나가 차지하는 메모리의 어림값 (NodeData 와 트리 배열의 항목)
+TREE_NODE_BYTES = 400
+
+
+class CacheEntry:
+    """
+    문서 하나의 분석 결과
+    """
+
+    __slots__ = ("keywords", "sentences", "tree", "nbytes")
+
+    def __init__(self, keywords, sentences, tree=None):
+        self.keywords = tuple(keywords)
+        self.sentences = tuple(sentences)
+        self.tree = tree
+        self.nbytes = (
+            sum(sys.getsizeof(text) for text in self.keywords)
+            + sum(sys.getsizeof(text) for text in self.sentences)
+            + (len(tree) * TREE_NODE_BYTES if tree is not None else 0)
+        )
+
+
+class ParseCache:
+    """
+    전처리된 문서와 분석 옵션의 해시를 키로 분석 결과를 보관하는 LRU 캐시
+
+    전처리 결과가 같은 문서는 (HTML 태그, URL 등만 다른 문서 포함) 같은 키를 가지므로
+    반복되는 문서는 형태소 분석과 트리 생성을 다시 하지 않습니다.
+    max_segments 를 지정하면 문서가 달라도 서명, 면책 문구처럼 반복되는 줄은 Mecab 분석 결과를 재사용합니다.
+    여러 스레드에서 함께 사용할 수 있습니다.
+    """
+
+    def __init__(
+        self, max_entries=1024, max_bytes=None, store_tree=False, max_segments=0
+    ):
+        """
+        :param max_entries: 보관할 문서의 최대 개수, None 이면 제한하지 않음 (기본값 1024)
+        :param max_bytes: 보관할 결과의 최대 크기(바이트, 어림값), None 이면 제한하지 않음 (기본값 None)
+        :param store_tree: 파싱 트리도 함께 보관할 것인가 (기본값 False)
+        :param max_segments: 줄 단위 Mecab 분석 결과를 보관할 최대 개수, 0 이면 보관하지 않음 (기본값 0)
+        """
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries 는 1 이상이어야 합니다")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes 는 1 이상이어야 합니다")
+
+        if max_segments < 0:
+            raise ValueError("max_segments 는 0 이상이어야 합니다")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.store_tree = store_tree
+        self.max_segments = max_segments
+
+        self._entries = OrderedDict()
+        self._segments = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.segment_hits = 0
+        self.segment_misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        # 다른 프로세스로 전달할 때는 설정만 넘기고 빈 캐시로 시작한다
+        return self.max_entries, self.max_bytes, self.store_tree, self.max_segments
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    @staticmethod
+    def key(
+        document,
+        proc_composite_word=True,
+        proc_josa=True,
+        proc_phrase=True,
+        custom_patterns=(),
+        analyzer=None,
+    ):
+        """
+        전처리된 문서와 분석 옵션, 형태소 분석기로 캐시 키를 생성합니다.
+
+        :param document: 전처리된 문서
+        :param proc_composite_word: 복합명사를 처리할 것인가 (기본값 True)
+        :param proc_josa: 조사를 앞단어에 붙여서 하나의 단어로 처리할 것인가 (기본값 True)
+        :param proc_phrase: 구 단위 분석을 수행할 것인가 (기본값 True)
+        :param custom_patterns: CustomPatterns 혹은 [{'pattern': string, 'tag': string}] (기본값 없음)
+        :param analyzer: 형태소 분석기 Analyzer 객체 혹은 클래스, 분석기 이름과 사전 경로를 키에 포함 (기본값 None)
+        :return: bytes
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(document.encode("utf-8", "surrogatepass"))
+        digest.update(
+            repr(
+                (
+                    bool(proc_composite_word),
+                    bool(proc_josa),
+                    bool(proc_phrase),
+                    [(p["pattern"], p["tag"]) for p in custom_patterns or ()],
+                    _analyzer_key(analyzer),
+                )
+            ).encode("utf-8", "surrogatepass")
+        )
+        return digest.digest()
+
+    def get(self, key):
+        """
+        :param key: 캐시 키
+        :return: CacheEntry, 없으면 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """
+        분석 결과를 보관하고, 제한을 넘으면 가장 오래 사용하지 않은 결과부터 버립니다.
+
+        :param key: 캐시 키
+        :param entry: CacheEntry
+        :return: void
+        """
+        if self.max_bytes is not None and entry.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+
+            self._entries[key] = entry
+            self._nbytes += entry.nbytes
+
+            while (
+                self.max_entries is not None and len(self._entries) > self.max_entries
+            ) or (self.max_bytes is not None and self._nbytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+                self.evictions += 1
+
+    def pos(self, document, analyze, analyze_many=None, analyzer=None):
+        """
+        문서의 Mecab 형태소 분석 결과를 리턴합니다. max_segments 가 0 이면 analyze 를 그대로 호출합니다.
+
+        Mecab 은 줄바꿈을 넘어 앞뒤 문맥을 함께 고려하므로, 각 줄은 공백이 아닌 앞뒤 한 줄과 함께 분석하고
+        (앞 줄, 줄, 뒷 줄) 을 키로 보관합니다. 보관된 결과가 없는 줄들은 앞뒤 한 줄을 붙여서 분석하며,
+        analyze_many 를 지정하면 이렇게 만든 문자열들을 한번에 분석합니다.
+
+        :param document: 전처리된 문서
+        :param analyze: 문자열을 받아 [(형태소, 태그)] 를 리턴하는 함수 (예: Analyzer.pos)
+        :param analyze_many: 문자열 리스트를 받아 문자열마다 [(형태소, 태그)] 를 리턴하는 함수 (예: Analyzer.pos_many) (기본값 None)
+        :param analyzer: analyze 가 사용하는 Analyzer 객체 혹은 클래스, 분석기마다 결과를 따로 보관 (기본값 None)
+        :return: [(형태소, 태그)]
+        """
+        if not self.max_segments:
+            return analyze(document)
+
+        # 공백만 있는 줄은 형태소가 없으므로 제외한다
+        lines = [line for line in document.split("\n") if line.strip()]
+        analyzer_key = _analyzer_key(analyzer)
+        keys = [
+            self._segment_key(
+                lines[idx - 1] if idx > 0 else None,
+                line,
+                lines[idx + 1] if idx + 1 < len(lines) else None,
+                analyzer_key,
+            )
+            for idx, line in enumerate(lines)
+        ]
+
+        segments = [None] * len(lines)
+        with self._lock:
+            for idx, key in enumerate(keys):
+                segments[idx] = self._segments.get(key)
+                if segments[idx] is None:
+                    self.segment_misses += 1
+                else:
+                    self._segments.move_to_end(key)
+                    self.segment_hits += 1
+
+        # 보관된 결과가 없는 연속된 줄들을 찾는다
+        runs = []
+        start = 0
+        while start < len(lines):
+            if segments[start] is not None:
+                start += 1
+                continue
+
+            end = start
+            while end + 1 < len(lines) and segments[end + 1] is None:
+                end += 1
+            runs.append((start, end))
+            start = end + 1
+
+        # 연속된 줄들을 앞뒤 한 줄과 함께 분석한다
+        texts = [self._context_text(lines, start, end) for start, end in runs]
+        if analyze_many is not None and len(texts) > 1:
+            analyzed_texts = analyze_many(texts)
+        else:
+            analyzed_texts = [analyze(text) for text in texts]
+
+        for (start, end), text, morphs in zip(runs, texts, analyzed_texts):
+            analyzed = self._split_lines(lines, start, end, text, morphs)
+            with self._lock:
+                for idx, line_morphs in zip(range(start, end + 1), analyzed):
+                    segments[idx] = line_morphs
+                    self._segments[keys[idx]] = line_morphs
+                    self._segments.move_to_end(keys[idx])
+                while len(self._segments) > self.max_segments:
+                    self._segments.popitem(last=False)
+
+        return [morph for morphs in segments for morph in morphs]
+
+    @staticmethod
+    def _segment_key(prev_line, line, next_line, analyzer_key):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(
+            repr((prev_line, line, next_line, analyzer_key)).encode(
+                "utf-8", "surrogatepass"
+            )
+        )
+        return digest.digest()
+
+    @staticmethod
+    def _context_text(lines, start, end):
+        first = max(start - 1, 0)
+        last = min(end + 1, len(lines) - 1)
+        return "\n".join(lines[first : last + 1])
+
+    @staticmethod
+    def _split_lines(lines, start, end, text, morphs):
+        first = max(start - 1, 0)
+        last = min(end + 1, len(lines) - 1)
+
+        # 각 줄이 끝나는 위치
+        line_ends = []
+        for line in lines[first : last + 1]:
+            line_ends.append((line_ends[-1] + 1 if line_ends else 0) + len(line))
+
+        result = [[] for _ in line_ends]
+        line_idx = 0
+        txt_idx = 0
+        for morph, tag in morphs:
+            # 문서에서 찾을 수 없는 형태소는 ValueError 를 발생시킨다
+            morph_start, txt_idx = align_morph(text, morph, txt_idx)
+            while line_idx + 1 < len(line_ends) and morph_start >= line_ends[line_idx]:
+                line_idx += 1
+
+            result[line_idx].append((morph, tag))
+
+        # 문맥으로 붙인 앞뒤 줄의 결과는 버린다
+        return [tuple(morphs) for morphs in result[start - first : end - first + 1]]
+
+    def clear(self):
+        """
+        보관한 결과와 통계를 모두 지웁니다.
+
+        :return: void
+        """
+        with self._lock:
+            self._entries.clear()
+            self._segments.clear()
+            self._nbytes = 0
+            self.hits = self.misses = self.evictions = 0
+            self.segment_hits = self.segment_misses = 0
+
+    def stats(self):
+        """
+        :return: 캐시 적중/실패 횟수 등이 담긴 딕셔너리
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "segments": len(self._segments),
+                "segment_hits": self.segment_hits,
+                "segment_misses": self.segment_misses,
+            }
+
+
+class DiskCache:
+    """
+    여러 프로세스와 재시작 사이에 공유할 수 있는 SQLite 기반의 분석 결과 캐시
+
+    문서별 키워드와 문장, 그리고 Mecab 형태소 분석 결과를 kokex 버전과 함께 보관합니다.
+    분석 옵션이 달라 키워드를 재사용할 수 없는 경우에도 형태소 분석은 다시 하지 않습니다.
+    파싱 트리는 보관하지 않습니다.
+    """
+
+    store_tree = False
+    key = staticmethod(ParseCache.key)
+
+    def __init__(self, path, version=None, timeout=30.0):
+        """
+        :param path: SQLite 데이터베이스 파일 경로
+        :param version: 결과를 구분할 버전, 다른 버전의 결과는 사용하지 않음 (기본값 kokex 버전)
+        :param timeout: 다른 프로세스가 쓰는 동안 기다리는 최대 시간(초) (기본값 30)
+        """
+        if version is None:
+            import kokex
+
+            version = kokex.__version__
+
+        self.path = os.fspath(path)
+        self.version = version
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+        self.hits = 0
+        self.misses = 0
+        self.morph_hits = 0
+        self.morph_misses = 0
+
+        self._connect()
+
+    def __getstate__(self):
+        # 다른 프로세스에서는 같은 파일을 새로 연결해서 사용한다
+        return self.path, self.version, self.timeout
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __len__(self):
+        rows = self._execute(
+            "SELECT COUNT(*) FROM results WHERE version = ?", (self.version,)
+        )
+        return rows[0][0]
+
+    def get(self, key):
+        """
+        :param key: 캐시 키
+        :return: CacheEntry, 없으면 None
+        """
+        rows = self._execute(
+            "SELECT keywords, sentences FROM results WHERE key = ? AND version = ?",
+            (key, self.version),
+        )
+
+        with self._lock:
+            if not rows:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        keywords, sentences = rows[0]
+        return CacheEntry(json.loads(keywords), json.loads(sentences))
+
+    def put(self, key, entry):
+        """
+        :param key: 캐시 키
+        :param entry: CacheEntry
+        :return: void
+        """
+        self._execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            (
+                key,
+                self.version,
+                json.dumps(entry.keywords, ensure_ascii=False),
+                json.dumps(entry.sentences, ensure_ascii=False),
+            ),
+        )
+
+    def get_morphs(self, document, analyzer=None):
+        """
+        :param document: 전처리된 문서
+        :param analyzer: 분석에 사용한 Analyzer 객체 혹은 클래스 (기본값 None)
+        :return: Mecab 형태소 분석 결과 [(형태소, 태그)], 없으면 None
+        """
+        rows = self._execute(
+            "SELECT morphs FROM morphs WHERE key = ? AND version = ?",
+            (self._morphs_key(document, analyzer), self.version),
+        )
+
+        with self._lock:
+            if not rows:
+                self.morph_misses += 1
+                return None
+            self.morph_hits += 1
+
+        return [tuple(morph) for morph in json.loads(rows[0][0])]
+
+    def put_morphs(self, document, morphs, analyzer=None):
+        """
+        :param document: 전처리된 문서
+        :param morphs: Mecab 형태소 분석 결과 [(형태소, 태그)]
+        :param analyzer: 분석에 사용한 Analyzer 객체 혹은 클래스 (기본값 None)
+        :return: void
+        """
+        self._execute(
+            "INSERT OR REPLACE INTO morphs VALUES (?, ?, ?)",
+            (
+                self._morphs_key(document, analyzer),
+                self.version,
+                json.dumps(morphs, ensure_ascii=False),
+            ),
+        )
+
+    def pos(self, document, analyze, analyze_many=None, analyzer=None):
+        """
+        보관된 Mecab 형태소 분석 결과가 있으면 돌려주고, 없으면 analyze 로 분석하여 보관합니다.
+
+        :param document: 전처리된 문서
+        :param analyze: 문자열을 받아 [(형태소, 태그)] 를 리턴하는 함수 (예: Analyzer.pos)
+        :param analyze_many: ParseCache.pos 와 같은 형태로 받지만 문서 단위로 보관하므로 사용하지 않음 (기본값 None)
+        :param analyzer: analyze 가 사용하는 Analyzer 객체 혹은 클래스, 분석기마다 결과를 따로 보관 (기본값 None)
+        :return: [(형태소, 태그)]
+        """
+        morphs = self.get_morphs(document, analyzer)
+        if morphs is None:
+            morphs = analyze(document)
+            self.put_morphs(document, morphs, analyzer)
+        return morphs
+
+    def prune(self):
+        """
+        다른 버전에서 보관한 결과를 지웁니다.
+
+        :return: void
+        """
+        for table in ["results", "morphs"]:
+            self._execute(f"DELETE FROM {table} WHERE version != ?", (self.version,))
+
+    def clear(self):
+        """
+        보관한 결과와 통계를 모두 지웁니다.
+
+        :return: void
+        """
+        for table in ["results", "morphs"]:
+            self._execute(f"DELETE FROM {table}")
+
+        with self._lock:
+            self.hits = self.misses = self.morph_hits = self.morph_misses = 0
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+            self._connection = None
+
+    def stats(self):
+        """
+        :return: 캐시 적중/실패 횟수 등이 담긴 딕셔너리
+        """
+        entries = len(self)
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "morph_hits": self.morph_hits,
+                "morph_misses": self.morph_misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+    @staticmethod
+    def _morphs_key(document, analyzer=None):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(document.encode("utf-8", "surrogatepass"))
+        digest.update(repr(_analyzer_key(analyzer)).encode("utf-8", "surrogatepass"))
+        return digest.digest()
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        # WAL 모드에서는 쓰는 동안에도 다른 프로세스가 읽을 수 있다
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key BLOB, version TEXT, keywords TEXT, sentences TEXT, "
+            "PRIMARY KEY (key, version))"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS morphs ("
+            "key BLOB, version TEXT, morphs TEXT, PRIMARY KEY (key, version))"
+        )
+
+        self._connection = connection
+        self._pid = os.getpid()
+
+    def _execute(self, sql, parameters=()):
+        with self._lock:
+            # fork 로 생성된 프로세스는 부모의 연결을 공유하지 않도록 새로 연결한다
+            if self._connection is None or self._pid != os.getpid():
+                self._connect()
+            return self._connection.execute(sql, parameters).fetchall()
+
+
+def _analyzer_key(analyzer):
+    # 같은 문서라도 분석기나 사전이 다르면 형태소 분석 결과가 다르므로 키에 포함한다
+    # 아직 생성하지 않은 분석기는 클래스로 받으며, 생성할 때 사용할 사전 경로를 키에 포함한다
+    if analyzer is None:
+        return None
+    if isinstance(analyzer, type):
+        return analyzer.name, analyzer.default_dicpath()
+    return analyzer.name, analyzer.dicpath
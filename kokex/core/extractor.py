@@ -0,0 +1,466 @@
+import re
+
+from .metrics import (
+    STAGE_COMPOSITE_WORDS,
+    STAGE_JOSA_SUFFIX_WORDS,
+    STAGE_PHRASES,
+    STAGE_SENTENCES,
+    STAGE_SUB_DOCUMENTS,
+    STAGE_WORDS,
+)
+from .tree import ParseTree
+
+RE_HANJA = re.compile(
+    r"[\u2e80-\u2eff\u31c0-\u31ef\u3200-\u32ff\u3400-\u4dbf\u4e00-\u9fbf\uf900-\ufaff]"
+)
+
+# 복합명사를 만들 때 단어를 나누는 구분자 태그
+COMPOSITE_DELIMITERS = frozenset(
+    [
+        "SF",
+        "SE",
+        "SSO",
+        "SSC",
+        "SC",
+        "SY",
+        "SWS",
+        "JKS",
+        "JKC",
+        "JKG",
+        "JKO",
+        "JKB",
+        "JKV",
+        "JKQ",
+        "JX",
+        "JC",
+        "IC",
+        "UNKNOWN",
+    ]
+)
+
+
+class Unit:
+    """
+    Extraction 이 파싱 트리의 노드 대신 사용하는 가벼운 노드
+
+    NodeData 와 같은 이름의 속성을 가지며, 태그는 생성할 때 한번 계산해둔다.
+    """
+
+    __slots__ = (
+        "node_type",
+        "org_txt_form",
+        "start",
+        "first_pos_tag",
+        "last_pos_tag",
+        "word_tag",
+        "sentence_tag",
+        "children",
+    )
+
+    def __init__(self, node_type, org_txt_form, start, first_pos_tag, last_pos_tag):
+        self.node_type = node_type
+        self.org_txt_form = org_txt_form
+        self.start = start
+        self.first_pos_tag = first_pos_tag
+        self.last_pos_tag = last_pos_tag
+        self.children = ()
+
+        # ParseTree._new_node 와 같은 규칙으로 5언 7성분을 태깅
+        self.word_tag = None
+        self.sentence_tag = None
+        if node_type in ("단어", "구"):
+            self.word_tag = ParseTree._compute_word_tag(last_pos_tag)
+            self.sentence_tag = ParseTree._compute_sentence_tag(last_pos_tag)
+
+    @property
+    def end(self):
+        return self.start + len(self.org_txt_form)
+
+
+class Extraction:
+    """
+    파싱 트리를 만들지 않고 DocumentParser 와 같은 규칙으로 키워드와 문장을 추출합니다.
+
+    단어 목록을 한번씩 훑으며 복합명사, 조사, 하위 문서, 문장을 차례로 묶고, 구 단위 분석은 키워드를 처음 요청할 때 수행합니다.
+    키워드와 문장의 순서는 파싱 트리에서 구한 것과 같습니다.
+    """
+
+    def __init__(
+        self,
+        words,
+        start=0,
+        proc_composite_word=True,
+        proc_josa=True,
+        proc_phrase=True,
+        stats=None,
+    ):
+        """
+        :param words: DocumentParser._words_from_morphs 가 리턴한 단어별 형태소 목록
+        :param start: 첫 단어가 시작하는 위치 (기본값 0)
+        :param proc_composite_word: 복합명사를 처리할 것인가 (기본값 True)
+        :param proc_josa: 조사를 앞단어에 붙여서 하나의 단어로 처리할 것인가 (기본값 True)
+        :param proc_phrase: 구 단위 분석을 수행할 것인가 (기본값 True)
+        :param stats: 단계별 수행 시간을 기록할 ParseStats (기본값 None)
+        """
+        self._proc_phrase = proc_phrase
+        self._size = 1  # 파싱 트리의 노드 수와 같게 루트를 포함하여 센다
+
+        units = self._create_words(words, start)
+        self._lap(stats, STAGE_WORDS)
+        if proc_composite_word:
+            units = self._create_composite_words(units)
+            self._lap(stats, STAGE_COMPOSITE_WORDS)
+        if proc_josa:
+            units = self._create_josa_suffix_words(units)
+            self._lap(stats, STAGE_JOSA_SUFFIX_WORDS)
+
+        units, sub_documents = self._identify_sub_documents(units)
+        self._lap(stats, STAGE_SUB_DOCUMENTS)
+
+        # 파싱 트리와 같이 루트의 문장을 먼저, 하위 문서의 문장을 그 다음에 둔다
+        self._sentences = []
+        self._root = Unit("문서", "", 0, None, None)
+        self._root.children = self._identify_sentences(units)
+        for sub_document in sub_documents:
+            sub_document.children = self._identify_sentences(sub_document.children)
+        self._lap(stats, STAGE_SENTENCES)
+
+        self._phrases_identified = False
+
+    def __len__(self):
+        return self._size
+
+    def sentences(self):
+        """
+        :return: 문장 Unit 리스트, DocumentParser.sentences() 와 같은 순서
+        """
+        return self._sentences
+
+    def keywords(self):
+        """
+        :return: 키워드 Unit 리스트, DocumentParser.keywords() 와 같은 순서
+        """
+        self.identify_phrases()
+
+        # 파싱 트리의 너비 우선 탐색과 같은 순서가 되도록, 문서 순서로 찾은 키워드를 깊이로 안정 정렬한다
+        found = []
+        stack = [(unit, 1) for unit in reversed(self._root.children)]
+        while stack:
+            unit, depth = stack.pop()
+            if is_keyword(unit):
+                found.append((depth, unit))
+                continue
+            stack.extend((child, depth + 1) for child in reversed(unit.children))
+
+        found.sort(key=lambda x: x[0])
+        return [unit for _, unit in found]
+
+    def identify_phrases(self, stats=None):
+        """
+        구 단위 분석을 아직 수행하지 않았다면 수행합니다.
+
+        :param stats: 수행 시간을 기록할 ParseStats (기본값 None)
+        :return: void
+        """
+        if not self._proc_phrase or self._phrases_identified:
+            return
+
+        for sentence in self._sentences:
+            sentence.children = self._identify_phrases(sentence.children)
+        self._phrases_identified = True
+        self._lap(stats, STAGE_PHRASES)
+
+    def _lap(self, stats, stage):
+        if stats is not None:
+            stats.lap(stage, self._size)
+
+    def _group(self, node_type, children):
+        # DocumentParser._create_sub_tree 와 같이 하위 노드를 묶은 노드를 만든다
+        unit = Unit(
+            node_type,
+            "".join([child.org_txt_form for child in children]),
+            children[0].start,
+            children[0].first_pos_tag,
+            children[-1].last_pos_tag,
+        )
+        unit.children = children
+        self._size += 1
+        return unit
+
+    def _create_words(self, words, start):
+        units = []
+        for word in words:
+            org_txt_form = "".join([morph[0] for morph in word])
+            pos_tag = "+".join([morph[1] for morph in word])
+
+            units.append(
+                Unit(
+                    "단어",
+                    org_txt_form,
+                    start,
+                    pos_tag.split("+", 1)[0],
+                    pos_tag.rsplit("+", 1)[-1],
+                )
+            )
+            start += len(org_txt_form)
+
+        self._size += len(units)
+        return units
+
+    def _create_composite_words(self, units):
+        return self._replace_spans(units, find_composite_words(units), "단어")[0]
+
+    def _create_josa_suffix_words(self, units):
+        return self._replace_spans(units, find_josa_suffix_words(units), "단어")[0]
+
+    def _identify_sub_documents(self, units):
+        return self._replace_spans(units, find_sub_documents(units), "문서")
+
+    def _identify_sentences(self, children):
+        children, sentences = self._replace_spans(
+            children, find_sentences(children), "문장"
+        )
+        self._sentences += sentences
+        return children
+
+    def _identify_phrases(self, children):
+        return self._replace_spans(children, find_phrases(children), "구")[0]
+
+    def _replace_spans(self, children, spans, node_type):
+        # 구간 [begin, end) 의 하위 노드들을 묶은 노드로 바꾼 목록과 묶은 노드 목록을 리턴한다
+        groups = []
+        result = []
+        idx = 0
+        for begin, end in spans:
+            group = self._group(node_type, children[begin:end])
+            groups.append(group)
+            result += children[idx:begin]
+            result.append(group)
+            idx = end
+        result += children[idx:]
+        return result, groups
+
+
+##### 묶을 노드의 구간을 찾는 함수 시작
+# 파싱 트리의 NodeData 와 Unit 을 모두 받으며, DocumentParser 와 Extraction 이 같은 규칙을 사용한다
+# 하위 노드 목록에서 하나의 노드로 묶을 구간 [begin, end) 를 차례로 리턴한다
+def find_composite_words(children):
+    spans = []
+    begin = 0
+    for idx, child in enumerate(children):
+        if child.last_pos_tag in COMPOSITE_DELIMITERS:
+            if idx - begin > 1:
+                spans.append((begin, idx))
+            begin = idx + 1
+
+    if len(children) - begin > 1:
+        spans.append((begin, len(children)))
+
+    return spans
+
+
+def find_josa_suffix_words(children):
+    spans = []
+    begin = 0
+    for idx, child in enumerate(children):
+        if child.last_pos_tag == "SWS":  # 공백/개행문자 처리
+            begin = idx + 1
+            continue
+        if (
+            child.last_pos_tag == "SY" and len(child.org_txt_form) > 1
+        ) or child.word_tag == "관계언":  # 기호, 조사 처리 (모든 조사는 관계언에 속함)
+            spans.append((begin, idx + 1))
+            begin = idx + 1
+
+    return spans
+
+
+def find_sub_documents(children):
+    spans = []
+    begin = None  # 하위 문서의 첫 하위 노드, None 이면 아직 하위 문서가 시작되지 않음
+    for idx, child in enumerate(children):
+        if begin is None:
+            if '"' in child.org_txt_form or "“" in child.org_txt_form:
+                begin = idx
+            continue
+
+        if '"' in child.org_txt_form or "”" in child.org_txt_form:
+            spans.append((begin, idx + 1))
+            begin = None
+
+    return spans
+
+
+def find_sentences(children):
+    spans = []
+    begin = None  # 현재 문장의 첫 하위 노드, None 이면 아직 문장이 시작되지 않음
+    idx = 0
+    while idx < len(children):
+        child = children[idx]
+
+        # 문장의 처음에 공백문자를 추가하지 않는다
+        if begin is None and child.last_pos_tag == "SWS":
+            idx += 1
+            continue
+
+        if begin is None:
+            begin = idx
+
+        if child.node_type != "단어":
+            idx += 1
+            continue
+
+        last_pos_tag = child.last_pos_tag
+
+        # 종결어미, 문장부호(.!?)로 문장구분
+        if last_pos_tag in ("EF", "SF"):
+            idx += 1
+            while idx < len(children):
+                if children[idx].last_pos_tag in ("SF", "SE", "SY", "SWS"):
+                    idx += 1
+                    continue
+
+                # 공백으로 끝나지 않도록 조정한다
+                end = idx - 1 if children[idx - 1].last_pos_tag == "SWS" else idx
+                spans.append((begin, end))
+                begin = idx  # 다음 노드는 규칙을 확인하지 않고 다음 문장에 추가된다
+                break
+
+        # 종결부호 [.!?]/SY 후 띄어쓰기나 엔터가 오는 문장 처리
+        elif child.org_txt_form in (".", "!", "?") and last_pos_tag == "SY":
+            if idx + 1 < len(children) and children[idx + 1].last_pos_tag == "SWS":
+                spans.append((begin, idx + 1))
+                begin = None
+                idx += 1
+
+        # 2개이상의 기호가 연속으로 왔을때 문장으로 구분함
+        elif last_pos_tag == "SY" and len(child.org_txt_form) > 1:
+            idx += 1
+            while idx < len(children):
+                if children[idx].last_pos_tag in ("SY", "SF", "SE"):
+                    idx += 1
+                    continue
+
+                spans.append((begin, idx))
+                begin = idx
+                break
+
+        # 말줄임표로 구분된 문장 처리
+        elif last_pos_tag == "SE":
+            spans.append((begin, idx + 1))
+            begin = None
+
+        # 감탄사로 구분된 문장 처리
+        elif last_pos_tag == "IC":
+            idx += 1
+            while idx < len(children):
+                if children[idx].last_pos_tag in ("IC", "SWS"):
+                    idx += 1
+                    continue
+
+                end = idx - 1 if children[idx - 1].last_pos_tag == "SWS" else idx
+                spans.append((begin, end))
+                begin = idx
+                break
+
+        idx += 1
+
+    if begin is not None:
+        spans.append((begin, len(children)))
+
+    return spans
+
+
+def find_phrases(children):
+    spans = []
+    begin = None  # 현재 구의 첫 하위 노드, None 이면 아직 구가 시작되지 않음
+    idx = 0
+    while idx < len(children):
+        child = children[idx]
+
+        # 구의 처음에 공백문자를 추가하지 않는다
+        if begin is None and child.last_pos_tag == "SWS":
+            idx += 1
+            continue
+
+        if begin is None:
+            begin = idx
+
+        if child.node_type != "단어":
+            idx += 1
+            continue
+
+        sentence_tag = child.sentence_tag
+
+        # 문장의 부속성분 (관형어, 부사어) 와 관련한 구 구분 규칙
+        if sentence_tag in ("관형어", "부사어"):
+            # 관형어 뒤에 1) 체언으로 시작하는 단어, 2) 주어 혹은 목적어가 오면 합친다
+            if sentence_tag == "관형어":
+                idx = _merge_next_word(
+                    children,
+                    idx,
+                    lambda unit: unit.word_tag == "체언"
+                    or unit.sentence_tag in ("주어", "목적어"),
+                )
+
+            spans.append((begin, idx + 1))
+            begin = None
+
+        # 문장의 주성분 (주어, 목적어, 서술어, 보어) 과 관련한 구 구분 규칙
+        if sentence_tag in ("주어", "목적어", "서술어", "보어"):
+            # 목적어 뒤에 오는 관형어를 처리한다: '중국을 방문한 대통령'을 '중국을 방문한' '대통령' 으로 나눈다
+            if sentence_tag == "목적어":
+                idx = _merge_next_word(
+                    children, idx, lambda unit: unit.sentence_tag == "관형어"
+                )
+
+            # 서술어 뒤어 오는 보조 용언 VX를 처리한다: '논란을 빚고 있다' 를 '논란을' '빚고 있다' 로 나눈다
+            if sentence_tag == "서술어":
+                idx = _merge_next_word(
+                    children, idx, lambda unit: unit.first_pos_tag == "VX"
+                )
+
+            # 동사(VV)로 시작하는 보어가 다음에 서술어를 만나면 합친다: '이긴것이 아니다', '위해서도 낫다'
+            if sentence_tag == "보어" and child.first_pos_tag == "VV":
+                idx = _merge_next_word(
+                    children, idx, lambda unit: unit.sentence_tag == "서술어"
+                )
+
+            spans.append((begin, idx + 1))
+            begin = None
+
+        idx += 1
+
+    if begin is not None:
+        spans.append((begin, len(children)))
+
+    return spans
+
+
+def is_keyword(unit):
+    """
+    :param unit: 파싱 트리의 NodeData 혹은 Unit
+    :return: 키워드가 될 노드인가
+    """
+    if unit.node_type == "구":
+        return (
+            unit.word_tag == "체언"
+            and unit.sentence_tag == "독립어"
+            and not unit.org_txt_form.endswith("할 수")
+        )
+    if unit.node_type == "단어":
+        return unit.word_tag in ("체언", "독립언") and (
+            len(unit.org_txt_form) > 1 or RE_HANJA.match(unit.org_txt_form) is not None
+        )
+    return False
+
+
+def _merge_next_word(children, idx, rule):
+    # 공백문자를 건너뛴 다음 노드가 규칙에 맞으면 그 노드의 위치를, 아니면 idx 를 리턴한다
+    next_idx = idx + 1
+    while next_idx < len(children) and children[next_idx].last_pos_tag == "SWS":
+        next_idx += 1
+
+    if next_idx < len(children) and rule(children[next_idx]):
+        return next_idx
+    return idx
@@ -0,0 +1,176 @@
+import heapq
+import json
+import time
+import zlib
+from collections import Counter, defaultdict
+
+SNAPSHOT_VERSION = 1
+
+
+class KeywordIndex:
+    """
+    문서별 키워드 목록을 시간 구간(bucket)별로 누적하는 키워드 통계 저장소
+
+    문서를 추가하거나 삭제할 때 해당 문서의 키워드만 갱신하므로, 최근 1시간, 1일 같은 구간의 키워드 빈도를
+    구간의 문서를 다시 분석하지 않고 구할 수 있습니다. 빈도는 kokex.keywords 와 같이 키워드가 나타난 횟수입니다.
+    """
+
+    def __init__(self, bucket_seconds=3600):
+        """
+        :param bucket_seconds: 시간 구간의 길이(초) (기본값 3600)
+        """
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds 는 0 보다 커야 합니다")
+
+        self.bucket_seconds = bucket_seconds
+
+        self._docs = {}  # 문서 id: (시간 구간, 키워드 튜플)
+        self._buckets = defaultdict(Counter)  # 시간 구간: 키워드 빈도
+        self._totals = Counter()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._docs
+
+    def add(self, doc_id, keywords, timestamp=None):
+        """
+        문서의 키워드 목록을 추가합니다. 이미 있는 문서라면 기존 키워드를 대체합니다.
+
+        :param doc_id: 문서 id, 스냅샷을 저장하려면 JSON 으로 저장할 수 있는 문자열 혹은 정수
+        :param keywords: DocumentParser.keywords() 가 리턴한 키워드 목록
+        :param timestamp: 문서의 시각 (epoch 초) (기본값 현재 시각)
+        :return: void
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self._add(doc_id, int(timestamp // self.bucket_seconds), tuple(keywords))
+
+    def remove(self, doc_id):
+        """
+        문서의 키워드 목록을 통계에서 제외합니다.
+
+        :param doc_id: 문서 id
+        :return: 문서가 있었으면 true
+        """
+        if doc_id not in self._docs:
+            return False
+
+        bucket, keywords = self._docs.pop(doc_id)
+        counts = Counter(keywords)
+        _subtract(self._buckets[bucket], counts)
+        _subtract(self._totals, counts)
+        if not self._buckets[bucket]:
+            del self._buckets[bucket]
+        return True
+
+    def expire(self, before):
+        """
+        지정한 시각보다 이전 시간 구간의 문서를 모두 제외합니다.
+
+        :param before: 기준 시각 (epoch 초), 이 시각을 포함하는 구간은 남겨둔다
+        :return: 제외한 문서의 개수
+        """
+        bucket = int(before // self.bucket_seconds)
+        expired = [
+            doc_id
+            for doc_id, (doc_bucket, _) in self._docs.items()
+            if doc_bucket < bucket
+        ]
+        for doc_id in expired:
+            self.remove(doc_id)
+        return len(expired)
+
+    def counts(self, start=None, end=None):
+        """
+        :param start: 구간의 시작 시각 (epoch 초), 이 시각을 포함하는 시간 구간부터 집계 (기본값 None, 처음부터)
+        :param end: 구간의 끝 시각 (epoch 초), 이 시각을 포함하는 시간 구간까지 집계 (기본값 None, 끝까지)
+        :return: 키워드와 빈도가 담긴 딕셔너리
+        """
+        if start is None and end is None:
+            return dict(self._totals)
+
+        first = None if start is None else int(start // self.bucket_seconds)
+        last = None if end is None else int(end // self.bucket_seconds)
+
+        result = Counter()
+        for bucket, counts in self._buckets.items():
+            if (first is None or bucket >= first) and (last is None or bucket <= last):
+                result.update(counts)
+        return dict(result)
+
+    def top(self, k, start=None, end=None):
+        """
+        구간에서 빈도가 높은 키워드 k 개를 리턴합니다.
+
+        :param k: 리턴할 키워드의 개수
+        :param start: 구간의 시작 시각 (epoch 초) (기본값 None, 처음부터)
+        :param end: 구간의 끝 시각 (epoch 초) (기본값 None, 끝까지)
+        :return: 빈도가 높은 순서의 (키워드, 빈도) 리스트
+        """
+        return heapq.nlargest(
+            k, self.counts(start=start, end=end).items(), key=lambda x: x[1]
+        )
+
+    def snapshot(self):
+        """
+        복원에 필요한 문서별 키워드만 압축하여 리턴합니다. 키워드는 어휘 목록의 번호로 저장합니다.
+
+        :return: bytes
+        """
+        vocab = {}
+        docs = []
+        for doc_id, (bucket, keywords) in self._docs.items():
+            docs.append(
+                [
+                    doc_id,
+                    bucket,
+                    [vocab.setdefault(word, len(vocab)) for word in keywords],
+                ]
+            )
+
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "bucket_seconds": self.bucket_seconds,
+            "vocab": list(vocab),
+            "docs": docs,
+        }
+        return zlib.compress(
+            json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        )
+
+    @classmethod
+    def restore(cls, snapshot):
+        """
+        snapshot() 으로 저장한 KeywordIndex 를 복원합니다.
+
+        :param snapshot: snapshot() 이 리턴한 bytes
+        :return: KeywordIndex
+        """
+        data = json.loads(zlib.decompress(snapshot).decode("utf-8"))
+        if data["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"지원하지 않는 스냅샷 버전입니다: {data['version']}")
+
+        index = cls(bucket_seconds=data["bucket_seconds"])
+        vocab = data["vocab"]
+        for doc_id, bucket, word_ids in data["docs"]:
+            index._add(doc_id, bucket, tuple(vocab[word_id] for word_id in word_ids))
+        return index
+
+    def _add(self, doc_id, bucket, keywords):
+        if doc_id in self._docs:
+            self.remove(doc_id)
+
+        self._docs[doc_id] = (bucket, keywords)
+        counts = Counter(keywords)
+        self._buckets[bucket].update(counts)
+        self._totals.update(counts)
+
+
+def _subtract(counter, counts):
+    # 빈도가 0 이 된 키워드는 지워서 오래된 키워드가 쌓이지 않도록 한다
+    for word, count in counts.items():
+        counter[word] -= count
+        if counter[word] <= 0:
+            del counter[word]
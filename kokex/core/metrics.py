@@ -0,0 +1,254 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+STAGE_PREPROC = "preproc"
+STAGE_MORPHS = "morphs"
+STAGE_WORDS = "words"
+STAGE_COMPOSITE_WORDS = "composite_words"
+STAGE_JOSA_SUFFIX_WORDS = "josa_suffix_words"
+STAGE_SUB_DOCUMENTS = "sub_documents"
+STAGE_SENTENCES = "sentences"
+STAGE_PHRASES = "phrases"
+STAGES = (
+    STAGE_PREPROC,
+    STAGE_MORPHS,
+    STAGE_WORDS,
+    STAGE_COMPOSITE_WORDS,
+    STAGE_JOSA_SUFFIX_WORDS,
+    STAGE_SUB_DOCUMENTS,
+    STAGE_SENTENCES,
+    STAGE_PHRASES,
+)
+
+# 히스토그램 구간의 상한(초)
+SECONDS_BUCKETS = (
+    0.0001,
+    0.0002,
+    0.0005,
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1,
+    2,
+    5,
+    10,
+)
+
+# 현재 컨텍스트에서 분석 통계를 받는 StatsCollector 목록
+_collectors = contextvars.ContextVar("kokex_stats_collectors", default=())
+
+
+class ParseStats:
+    """
+    DocumentParser.parse 한 번의 단계별 수행 시간과 노드 수
+
+    stages 는 실행된 단계만 실행된 순서대로 {단계: (수행 시간(초), 단계가 끝났을 때 트리의 노드 수)} 로 담는다.
+    캐시에서 결과를 찾으면 전처리 단계만 담기고 cached 가 true 이다.
+    """
+
+    __slots__ = ("chars", "cached", "stages", "_lap")
+
+    def __init__(self, chars):
+        self.chars = chars
+        self.cached = False
+        self.stages = {}
+        self._lap = time.perf_counter()
+
+    def lap(self, stage, nodes):
+        """
+        직전 lap 호출 이후의 시간을 단계의 수행 시간으로 기록합니다.
+
+        :param stage: 단계 이름
+        :param nodes: 단계가 끝났을 때 트리의 노드 수
+        :return: void
+        """
+        now = time.perf_counter()
+        self.stages[stage] = (now - self._lap, nodes)
+        self._lap = now
+
+    @property
+    def seconds(self):
+        return sum(seconds for seconds, _ in self.stages.values())
+
+    def to_dict(self):
+        return {
+            "chars": self.chars,
+            "cached": self.cached,
+            "seconds": self.seconds,
+            "stages": {
+                stage: {"seconds": seconds, "nodes": nodes}
+                for stage, (seconds, nodes) in self.stages.items()
+            },
+        }
+
+
+class Histogram:
+    """
+    고정된 구간으로 값의 분포를 집계하는 히스토그램
+    """
+
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 마지막 칸은 가장 큰 상한을 넘는 값
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        for idx, count in enumerate(other.counts):
+            self.counts[idx] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q):
+        """
+        :param q: 0 과 1 사이의 분위
+        :return: 분위에 해당하는 구간의 상한, 가장 큰 상한을 넘으면 inf, 값이 없으면 None
+        """
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": _printable_bound(self.quantile(0.5)),
+            "p90": _printable_bound(self.quantile(0.9)),
+            "p99": _printable_bound(self.quantile(0.99)),
+            "buckets": {
+                str(bound): count
+                for bound, count in zip(self.buckets + ("+Inf",), self.counts)
+            },
+        }
+
+
+class StatsCollector:
+    """
+    여러 문서의 ParseStats 를 단계별 히스토그램으로 집계하는 클래스
+
+    여러 스레드에서 함께 사용할 수 있으며, 다른 프로세스에서 집계한 결과를 merge 로 합칠 수 있습니다.
+    """
+
+    def __init__(self):
+        self.docs = 0
+        self.cached = 0
+        self.chars = 0
+        self.total = Histogram()
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.nodes = {stage: 0 for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add(self, stats):
+        """
+        :param stats: ParseStats
+        :return: void
+        """
+        with self._lock:
+            self.docs += 1
+            self.cached += stats.cached
+            self.chars += stats.chars
+            self.total.add(stats.seconds)
+            for stage, (seconds, nodes) in stats.stages.items():
+                self.stages[stage].add(seconds)
+                self.nodes[stage] += nodes
+
+    def merge(self, other):
+        """
+        :param other: 합칠 StatsCollector
+        :return: void
+        """
+        with self._lock:
+            self.docs += other.docs
+            self.cached += other.cached
+            self.chars += other.chars
+            self.total.merge(other.total)
+            for stage in STAGES:
+                self.stages[stage].merge(other.stages[stage])
+                self.nodes[stage] += other.nodes[stage]
+
+    def to_dict(self):
+        """
+        :return: 문서 수, 단계별 수행 시간 히스토그램과 평균 노드 수가 담긴 딕셔너리
+        """
+        with self._lock:
+            return {
+                "docs": self.docs,
+                "cached": self.cached,
+                "chars": self.chars,
+                "seconds": self.total.to_dict(),
+                "stages": {
+                    stage: {
+                        "seconds": histogram.to_dict(),
+                        "nodes": (
+                            self.nodes[stage] / histogram.count
+                            if histogram.count
+                            else None
+                        ),
+                    }
+                    for stage, histogram in self.stages.items()
+                },
+            }
+
+
+@contextmanager
+def collect_stats(collector=None):
+    """
+    with 블록 안에서 (같은 컨텍스트에서) 실행된 DocumentParser.parse 의 통계를 집계합니다.
+    다른 프로세스에서 실행된 분석은 집계되지 않습니다.
+
+    :param collector: 통계를 더할 StatsCollector (기본값 None, 새로 생성)
+    :return: StatsCollector
+    """
+    collector = collector if collector is not None else StatsCollector()
+    token = _collectors.set(_collectors.get() + (collector,))
+    try:
+        yield collector
+    finally:
+        _collectors.reset(token)
+
+
+def record(stats):
+    """
+    현재 컨텍스트의 모든 StatsCollector 에 통계를 더합니다.
+
+    :param stats: ParseStats
+    :return: void
+    """
+    for collector in _collectors.get():
+        collector.add(stats)
+
+
+def _printable_bound(bound):
+    # JSON 에는 inf 를 쓸 수 없으므로 구간 이름과 같이 +Inf 로 표시한다
+    return "+Inf" if bound == float("inf") else bound
@@ -1,16 +1,57 @@
-import re
-
-from konlpy.tag import Mecab
-
-from .preproc import preproc
-from .tree import NodeData, ParseTree
+from collections import deque
+
+from .analyzer import Analyzer, align_morph, analyzer_class
+from .cache import CacheEntry
+from .extractor import (
+    Extraction,
+    find_composite_words,
+    find_josa_suffix_words,
+    find_phrases,
+    find_sentences,
+    find_sub_documents,
+    is_keyword,
+)
+from .metrics import (
+    STAGE_COMPOSITE_WORDS,
+    STAGE_JOSA_SUFFIX_WORDS,
+    STAGE_MORPHS,
+    STAGE_PHRASES,
+    STAGE_PREPROC,
+    STAGE_SENTENCES,
+    STAGE_SUB_DOCUMENTS,
+    STAGE_WORDS,
+    ParseStats,
+    record,
+)
+from .patterns import CustomPatterns
+from .preproc import preproc, preproc_with_offsets
+from .tree import FORMAT_PLAIN, NodeData, ParseTree
 
 
 class DocumentParser:
-    def __init__(self):
+    def __init__(self, analyzer=None):
+        """
+        :param analyzer: 형태소 분석기 Analyzer 객체 혹은 mecab, konlpy, subprocess, fake 중 하나 (기본값 None, 환경변수 KOKEX_ANALYZER 또는 mecab)
+        """
+        self._original = ""
         self._document = ""
+        self._offsets = None  # 전처리된 문서의 위치를 원래 문서의 위치로 변환하는 배열
         self._morphs = []
-        self._mecab = Mecab()
+        self._morph_starts = []
+        self._morph_ends = []
+        # 형태소 분석기와 사전은 처음 분석할 때 (혹은 preload 를 호출할 때) 적재한다
+        if isinstance(analyzer, Analyzer):
+            self._analyzer = analyzer
+        else:
+            self._analyzer = None
+            self._analyzer_class = analyzer_class(analyzer)
+        self._options = None
+        self._cache = None
+        self._cached = None  # 캐시에서 찾은 분석 결과
+        self._extract_only = False
+        self._extraction = None  # 트리를 만들지 않고 추출한 결과
+        self._eager_phrase = True
+        self.stats = None  # 마지막 분석의 ParseStats
 
         # tree initialization
         self._tree = ParseTree()
@@ -21,152 +62,262 @@ class DocumentParser:
         proc_composite_word=True,
         proc_josa=True,
         proc_phrase=True,
-        custom_patterns=[],
+        custom_patterns=None,
+        cache=None,
+        on_stats=None,
+        build_tree=True,
+        eager_phrase=True,
     ):
         """
         문서를 입력 받아 파싱 트리를 생성합니다.
+        단계별 수행 시간과 노드 수는 self.stats 에 담기며, collect_stats 로 여러 문서의 통계를 집계할 수 있습니다.
 
         :param document: 분석대상 문서
         :param proc_composite_word: 복합명사를 처리할 것인가 (기본값 True)
         :param proc_josa: 조사를 앞단어에 붙여서 하나의 단어로 처리할 것인가 (기본값 True)
         :param proc_phrase: 구 단위 분석을 수행할 것인가 (기본값 True)
-        :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}]
+        :param custom_patterns: 정규식 패턴과 매칭된 문자열을 위한 형태소 태그 [{'pattern': string, 'tag': string}] 혹은 CustomPatterns
+        :param cache: 분석 결과를 재사용할 ParseCache 혹은 DiskCache, 캐시에 결과가 있으면 트리를 생성하지 않음 (기본값 None)
+        :param on_stats: 분석이 끝나면 ParseStats 를 인자로 호출할 함수 (기본값 None)
+        :param build_tree: false 이면 트리를 만들지 않고 키워드와 문장만 추출, 트리는 printable_tree 를 호출할 때 생성 (기본값 True)
+        :param eager_phrase: build_tree 가 false 일 때 구 단위 분석까지 수행할 것인가, false 이면 keywords() 를 처음 호출할 때 수행하며
+            그 수행 시간은 통계에 기록되지 않음. 문장만 필요할 때 false 로 지정 (기본값 True)
         :return: void
         """
+        self.stats = ParseStats(chars=len(document))
+
         # preprocessing
+        self._original = document
         self._document = preproc(document)
+        self._offsets = None
+        self._options = (
+            proc_composite_word,
+            proc_josa,
+            proc_phrase,
+            CustomPatterns.of(custom_patterns),
+        )
+        self._cache = cache
+        self._cached = None
+        self._extract_only = not build_tree
+        self._eager_phrase = eager_phrase
+        self._extraction = None
+        self.stats.lap(STAGE_PREPROC, 0)
+
+        if cache is None:
+            self._analyze(self.stats)
+        else:
+            self._parse_with_cache(cache)
+
+        record(self.stats)
+        if on_stats is not None:
+            on_stats(self.stats)
+
+    def _parse_with_cache(self, cache):
+        key = cache.key(self._document, *self._options, analyzer=self._cache_analyzer)
+        entry = cache.get(key)
+        if entry is not None:
+            # 캐시에 보관된 트리는 다른 파서와 공유하므로 수정하지 않는다
+            # 트리가 보관되어 있지 않다면 printable_tree 를 호출할 때 생성한다
+            self._cached = entry
+            self._morphs = []
+            self._morph_starts = []
+            self._morph_ends = []
+            self._tree = entry.tree
+            self.stats.cached = True
+            return
+
+        self._analyze(self.stats)
+        if self._extraction is not None:
+            # 캐시에는 키워드도 보관하므로 구 단위 분석까지 수행한다
+            self._extraction.identify_phrases(self.stats)
+        cache.put(
+            key,
+            CacheEntry(
+                keywords=self.keywords(),
+                sentences=self.sentences(),
+                tree=self._tree if cache.store_tree else None,
+            ),
+        )
+
+    def _analyze(self, stats=None):
+        if self._extract_only:
+            self._extract(stats)
+        else:
+            self._build_tree(stats)
+
+    def _extract(self, stats=None):
+        # 트리를 만들지 않고 키워드와 문장을 추출한다, 통계는 _build_tree 와 같은 단계로 기록한다
+        if stats is None:
+            stats = ParseStats(chars=len(self._original))
+
+        proc_composite_word, proc_josa, proc_phrase, custom_patterns = self._options
+        self._morphs = self._create_morphs(self._document, custom_patterns)
+        stats.lap(STAGE_MORPHS, 0)
+
+        self._tree = None
+        self._extraction = Extraction(
+            words=self._words_from_morphs(self._morphs),
+            start=self._morph_starts[0] if self._morph_starts else 0,
+            proc_composite_word=proc_composite_word,
+            proc_josa=proc_josa,
+            proc_phrase=proc_phrase,
+            stats=stats,
+        )
+        # 구 단위 분석은 parse 가 끝난 뒤에 수행하면 통계에 기록되지 않는다
+        if self._eager_phrase:
+            self._extraction.identify_phrases(stats)
+
+    def _build_tree(self, stats=None):
+        # 캐시에서 결과를 찾은 뒤에 트리를 만들 때는 통계를 기록하지 않는다
+        if stats is None:
+            stats = ParseStats(chars=len(self._original))
+
+        proc_composite_word, proc_josa, proc_phrase, custom_patterns = self._options
         self._morphs = self._create_morphs(self._document, custom_patterns)
+        stats.lap(STAGE_MORPHS, 0)
 
-        # root 생성
-        self._tree.clear()
+        # root 생성, 이전 트리는 캐시에 보관되어 있을 수 있으므로 새로 생성한다
+        self._tree = ParseTree()
         self._tree.add_node(
-            node_id=ParseTree.ID_ROOT,
             node_data=NodeData(
-                node_id=ParseTree.ID_ROOT,
                 node_type="문서",
                 org_txt_form=self._document,
-                pos_txt_form=" ".join(
-                    [f"{morph[0]}/{morph[1]}" for morph in self._morphs]
-                ),
+                pos_units=self._morphs,
+                start=0,
             ),
         )
 
-        self._create_words(proc_composite_word, proc_josa)
+        self._create_words()
+        stats.lap(STAGE_WORDS, len(self._tree))
+        if proc_composite_word:
+            self._create_composite_words()
+            stats.lap(STAGE_COMPOSITE_WORDS, len(self._tree))
+        if proc_josa:
+            self._create_josa_suffix_words()
+            stats.lap(STAGE_JOSA_SUFFIX_WORDS, len(self._tree))
 
         self._identify_sub_documents()
+        stats.lap(STAGE_SUB_DOCUMENTS, len(self._tree))
         self._identify_sentences()
+        stats.lap(STAGE_SENTENCES, len(self._tree))
 
         if proc_phrase:
             self._identify_phrases()
+            stats.lap(STAGE_PHRASES, len(self._tree))
 
-    def _is_hanja(self, text):
-        re_pattern = r"[\u2e80-\u2eff\u31c0-\u31ef\u3200-\u32ff\u3400-\u4dbf\u4e00-\u9fbf\uf900-\ufaff]"
-        return re.match(pattern=re_pattern, string=text)
+    def preload(self):
+        """
+        형태소 분석기와 사전을 미리 적재합니다. 호출하지 않으면 처음 분석할 때 적재합니다.
 
-    # mecab이 공백/개행문자등을 걸러내기 때문에 이를 보전하기 위한 처리를 하고, 또한 입력받은 정규식 패턴은 하나의 형태소로 처리한다
-    def _create_morphs(self, txt, custom_patterns):
-        old_morphs = self._mecab.pos(txt)
-        new_morphs = []
-        txt_idx = 0
-        for morph, tag in old_morphs:
-            # 공백/개행문자 탐지
-            morph_idx = 0
+        :return: void
+        """
+        if self._analyzer is None:
+            self._analyzer = self._analyzer_class()
 
-            start_txt_idx = txt_idx
-            while txt[txt_idx] != morph[morph_idx]:
-                txt_idx += 1
-            end_txt_idx = txt_idx
+    def _pos(self, txt):
+        self.preload()
 
-            # 공백/개행문자가 있다면 형태소 추가
-            if start_txt_idx < end_txt_idx:
-                new_morphs.append(
-                    (txt[start_txt_idx:end_txt_idx], "SWS")
-                )  # 특수문자는 SWS 태그를 준다
+        # 캐시에 형태소 분석 결과가 있다면 형태소 분석기를 호출하지 않는다
+        if self._cache is None:
+            return self._analyzer.pos(txt)
+        return self._cache.pos(
+            txt, self._analyzer.pos, self._analyzer.pos_many, analyzer=self._analyzer
+        )
 
-            # morph 에 해당하는 문자열은 건너뜀
-            while morph_idx < len(morph) and txt[txt_idx] == morph[morph_idx]:
-                txt_idx += 1
-                morph_idx += 1
+    @property
+    def _cache_analyzer(self):
+        # 캐시 키에 사용할 분석기, 캐시에서 결과를 찾으면 형태소 분석기를 적재하지 않도록 아직 생성하지 않았다면 클래스를 사용한다
+        return self._analyzer if self._analyzer is not None else self._analyzer_class
 
-            # 원래 morph 형태소 추가
-            new_morphs.append((morph, tag))
+    # mecab이 공백/개행문자등을 걸러내기 때문에 이를 보전하기 위한 처리를 하고, 또한 입력받은 정규식 패턴은 하나의 형태소로 처리한다
+    # 각 형태소의 문서 내 시작/끝 위치는 self._morph_starts, self._morph_ends 에 형태소와 같은 순서로 저장한다
+    def _create_morphs(self, txt, custom_patterns):
+        morphs = []
+        starts = []
+        ends = []
 
-        # 정규표현식 패턴 매칭 시작
-        matched_morphs = []
+        # 형태소와 그 사이의 공백/개행문자를 한번에 정렬한다
+        txt_idx = 0
+        for morph, tag in self._pos(txt):
+            start, end = align_morph(txt, morph, txt_idx)
+            if txt[start:end] != morph:
+                # 형태소들을 이어붙이면 문서가 되도록 문서에서 일치하는 부분을 형태소로 사용한다
+                morph = txt[start:end]
 
-        # 패턴 매칭 결과를 저장해둔다
-        matched_patterns = []
-        for pattern in custom_patterns:
-            # 패턴 유효성 검사
-            for c in pattern["tag"]:
-                if (not "A" <= c <= "Z") and (not "0" <= c <= "9") and (not c == "_"):
-                    raise Exception("패턴 tag 는 영문대문자 / 숫자 / 밑줄(_) 만 사용할 수 있습니다")
-
-            for match in re.finditer(pattern["pattern"], txt):
-                matched_patterns.append(
-                    {
-                        "start": match.start(),
-                        "end": match.end(),
-                        "txt": match.group(),
-                        "tag": pattern["tag"],
-                        "processing": False,
-                    }
-                )
+            # 공백/개행문자가 있다면 형태소 추가
+            if start > txt_idx:
+                morphs.append((txt[txt_idx:start], "SWS"))  # 특수문자는 SWS 태그를 준다
+                starts.append(txt_idx)
+                ends.append(start)
+
+            txt_idx = end
+            morphs.append((morph, tag))
+            starts.append(start)
+            ends.append(end)
+
+        self._morph_starts = starts
+        self._morph_ends = ends
+
+        # 정규표현식 패턴 매칭 결과를 시작 위치별로 저장해둔다
+        match_index = custom_patterns.match_index(txt) if custom_patterns else {}
+        if not match_index:
+            return morphs
+
+        # 형태소 경계에서 끝나지 않는 매칭은 하나의 형태소로 만들 수 없으므로 제외하고, 남은 후보 중 먼저 입력된 패턴을 고른다
+        boundaries = set(ends)
+        candidates = match_index
+        match_index = {}
+        for start, matches in candidates.items():
+            for match in matches:
+                if match[0] in boundaries:
+                    match_index[start] = match
+                    break
 
         # 패턴 매칭 형태소를 생성한다
-        txt_idx = 0
-        match = None
-        for morph, tag in new_morphs:
-            if match:
-                txt_idx += len(morph)
-                if txt_idx == match["end"]:
-                    matched_morphs.append((match["txt"], match["tag"]))
-                    match = None
-            else:
-                for matched_pattern in matched_patterns:
-                    if matched_pattern["start"] == txt_idx:
-                        match = matched_pattern
-                        break
-                if match:
-                    txt_idx += len(morph)
-                    if txt_idx == match["end"]:
-                        matched_morphs.append((match["txt"], match["tag"]))
-                        match = None
+        matched_morphs = []
+        self._morph_starts = []
+        self._morph_ends = []
+        match_start = None
+        for morph, start, end in zip(morphs, starts, ends):
+            if match_start is None:
+                if start in match_index:
+                    match_start = start
                 else:
-                    txt_idx += len(morph)
-                    matched_morphs.append((morph, tag))
+                    matched_morphs.append(morph)
+                    self._morph_starts.append(start)
+                    self._morph_ends.append(end)
+
+            if match_start is not None and end == match_index[match_start][0]:
+                _, text, tag = match_index[match_start]
+                matched_morphs.append((text, tag))
+                self._morph_starts.append(match_start)
+                self._morph_ends.append(end)
+                match_start = None
 
         return matched_morphs
 
     ##### create_word 관련 함수 시작
-    def _create_words(self, proc_composite_word=True, proc_josa=True):
+    def _create_words(self):
         """Create word nodes from morphs"""
         words = self._words_from_morphs(self._morphs)
 
-        for idx, word in enumerate(words):
-            # org_txt, pos_txt 계산
-            org_txt_form = ""
-            pos_txt_form = ""
-            for morph in word:
-                org_txt_form += morph[0]
-                pos_txt_form += morph[1] if len(pos_txt_form) == 0 else f"+{morph[1]}"
-            pos_txt_form = f"{org_txt_form}/{pos_txt_form}"
+        # 형태소는 공백/개행문자를 포함하여 문서를 빈틈없이 나누므로, 단어는 앞 단어가 끝나는 위치에서 시작한다
+        start = self._morph_starts[0] if self._morph_starts else 0
+        for word in words:
+            # org_txt, pos 태그 계산
+            org_txt_form = "".join([morph[0] for morph in word])
+            pos_tag = "+".join([morph[1] for morph in word])
 
             self._tree.add_node(
-                node_id=f"{ParseTree.ID_ROOT}_{idx:03d}",
                 node_data=NodeData(
-                    node_id=f"{ParseTree.ID_ROOT}_{idx:03d}",
                     node_type="단어",
                     parent_node_id=ParseTree.ID_ROOT,
                     org_txt_form=org_txt_form,
-                    pos_txt_form=pos_txt_form,
+                    pos_units=[(org_txt_form, pos_tag)],
+                    start=start,
                 ),
             )
-
-        if proc_composite_word:
-            self._create_composite_words()
-        if proc_josa:
-            self._create_josa_suffix_words()
+            start += len(org_txt_form)
 
     # 형태소 분석결과에서 구분자 태그를 이용해 단어를 추출한다.
     def _words_from_morphs(self, morphs):
@@ -240,505 +391,177 @@ class DocumentParser:
         return words
 
     def _create_composite_words(self):
-        delimiters = [
-            "SF",
-            "SE",
-            "SSO",
-            "SSC",
-            "SC",
-            "SY",
-            "SWS",  # 기호/공백 문자로 구분
-            "JKS",
-            "JKC",
-            "JKG",
-            "JKO",
-            "JKB",
-            "JKV",
-            "JKQ",
-            "JX",
-            "JC",  # 명사 추출을 위해 관계언을 살려둔다
-            "IC",
-            "UNKNOWN",  # 감탄사 활용
-        ]
-        node_ids = self._tree.get_children_node_ids(parent_node_id=ParseTree.ID_ROOT)
-
-        idx = 0
-        sub_nodes = []
-        while idx < len(node_ids):
-            node_data = self._tree.get_node_data_by_id(node_ids[idx])
-
-            if node_data.get_last_pos_tag() in delimiters:
-                if len(sub_nodes) > 1:
-                    self._create_sub_tree(
-                        parent_node_id=ParseTree.ID_ROOT,
-                        children_node_data=sub_nodes,
-                        node_type="단어",
-                    )
-                sub_nodes = []
-                idx += 1
-                continue
-
-            sub_nodes.append(node_data)
-            idx += 1
-
-        if len(sub_nodes) > 1:
-            self._create_sub_tree(
-                parent_node_id=ParseTree.ID_ROOT,
-                children_node_data=sub_nodes,
-                node_type="단어",
-            )
+        self._group_spans(ParseTree.ID_ROOT, find_composite_words, "단어")
 
     def _create_josa_suffix_words(self):
-        children_ids = self._tree.get_children_node_ids(
-            parent_node_id=ParseTree.ID_ROOT
-        )
-
-        sub_nodes = []
-        for idx, child_id in enumerate(children_ids):
-            child_data = self._tree.get_node_data_by_id(children_ids[idx])
-            sub_nodes.append(child_data)
-
-            if child_data.get_last_pos_tag() == "SWS":  # 공백/개행문자 처리
-                sub_nodes = []
-                continue
-            if (
-                child_data.get_last_pos_tag() == "SY"  # 기호 처리
-                and len(child_data.org_txt_form) > 1
-            ):
-                if len(sub_nodes) > 0:
-                    self._create_sub_tree(
-                        parent_node_id=ParseTree.ID_ROOT,
-                        children_node_data=sub_nodes,
-                        node_type="단어",
-                    )
-                sub_nodes = []
-                continue
-            if child_data.word_tag == "관계언":  # 조사 처리 (모든 조사는 관계언에 속함)
-                self._create_sub_tree(
-                    parent_node_id=ParseTree.ID_ROOT,
-                    children_node_data=sub_nodes,
-                    node_type="단어",
-                )
-                sub_nodes = []
-                continue
+        self._group_spans(ParseTree.ID_ROOT, find_josa_suffix_words, "단어")
 
     ##### identify_sub_document 관련 함수 시작
     def _identify_sub_documents(self):
-        children_node_ids = self._tree.get_children_node_ids(
-            parent_node_id=ParseTree.ID_ROOT
-        )
-
-        sub_nodes = []
-        is_sub_document = False
-        for idx, child_node_id in enumerate(children_node_ids):
-            child_node_data = self._tree.get_node_data_by_id(children_node_ids[idx])
-
-            if not is_sub_document and 1 in map(
-                lambda x: 1 if child_node_data.org_txt_form.find(x) > -1 else 0,
-                ['"', "“"],
-            ):
-                is_sub_document = True
-                sub_nodes.append(child_node_data)
-                continue
-
-            if is_sub_document and 1 in map(
-                lambda x: 1 if child_node_data.org_txt_form.find(x) > -1 else 0,
-                ['"', "”"],
-            ):
-                sub_nodes.append(child_node_data)
-                self._create_sub_tree(
-                    parent_node_id=ParseTree.ID_ROOT,
-                    children_node_data=sub_nodes,
-                    node_type="문서",
-                )
-                sub_nodes = []
-                is_sub_document = False
-                continue
-
-            if is_sub_document:
-                sub_nodes.append(child_node_data)
+        self._group_spans(ParseTree.ID_ROOT, find_sub_documents, "문서")
 
     def _identify_sentences(self):
-        def is_document_node_processed(tree, node_id):
-            return tree.get_node_data_by_id(node_id).node_type == "문장"
-
-        def get_not_processed_document_node_id(tree):
-            for node_id in tree.filter_nodes(
-                lambda x: tree.get_node_data_by_id(x).node_type == "문서"
-            ):
-                if 1 not in map(
-                    lambda x: 1 if is_document_node_processed(tree, x) else 0,
-                    tree.get_children_node_ids(parent_node_id=node_id),
-                ):
-                    return node_id
-            return None
-
-        document_node_id = get_not_processed_document_node_id(self._tree)
-        while document_node_id:
-            children_node_ids = self._tree.get_children_node_ids(
-                parent_node_id=document_node_id
+        # 문서 노드는 루트와 하위 문서뿐이므로 한번 모아두고 차례로 문장을 구분한다
+        document_node_ids = list(
+            self._tree.filter_nodes(
+                lambda x: self._tree.get_node_data_by_id(x).node_type == "문서"
             )
+        )
 
-            sub_nodes = []
-            idx = 0
-            while idx < len(children_node_ids):
-                child_node_data = self._tree.get_node_data_by_id(children_node_ids[idx])
-
-                # 문장의 처음에 공백문자를 추가하지 않는다
-                if len(sub_nodes) == 0 and child_node_data.get_last_pos_tag() == "SWS":
-                    idx += 1
-                    continue
-
-                sub_nodes.append(child_node_data)
-
-                if child_node_data.node_type != "단어":
-                    idx += 1
-                    continue
-
-                # 종결어미, 문장부호(.!?)로 문장구분
-                if child_node_data.get_last_pos_tag() in ["EF", "SF"]:
-                    idx += 1
-                    while idx < len(children_node_ids):
-                        next_child_node_data = self._tree.get_node_data_by_id(
-                            children_node_ids[idx]
-                        )
-                        if next_child_node_data.get_last_pos_tag() in [
-                            "SF",
-                            "SE",
-                            "SY",
-                            "SWS",
-                        ]:
-                            sub_nodes.append(next_child_node_data)
-                        else:
-                            if sub_nodes[-1].get_last_pos_tag() in ["SWS"]:
-                                sub_nodes = sub_nodes[0:-1]  # 공백으로 끝나지 않도록 조정한다
-                            self._create_sub_tree(
-                                parent_node_id=document_node_id,
-                                children_node_data=sub_nodes,
-                                node_type="문장",
-                            )
-                            sub_nodes = []
-                            sub_nodes.append(next_child_node_data)
-                            break
-
-                        idx += 1
-
-                # 종결부호 [.!?]/SY 후 띄어쓰기나 엔터가 오는 문장 처리
-                elif (
-                    child_node_data.org_txt_form[-1] in [".", "!", "?"]
-                    and len(child_node_data.org_txt_form) == 1
-                    and child_node_data.get_last_pos_tag() in ["SY"]
-                ):
-                    next_idx = idx + 1
-                    if next_idx < len(children_node_ids):
-                        next_child_node_data = self._tree.get_node_data_by_id(
-                            children_node_ids[next_idx]
-                        )
-                        if next_child_node_data.get_last_pos_tag() in ["SWS"]:
-                            self._create_sub_tree(
-                                parent_node_id=document_node_id,
-                                children_node_data=sub_nodes,
-                                node_type="문장",
-                            )
-                            sub_nodes = []
-                            idx = next_idx
-
-                # 2개이상의 기호가 연속으로 왔을때 문장으로 구분함
-                elif (
-                    child_node_data.get_last_pos_tag() in ["SY"]
-                    and len(child_node_data.org_txt_form) > 1
-                ):
-                    idx += 1
-                    while idx < len(children_node_ids):
-                        next_child_node_data = self._tree.get_node_data_by_id(
-                            children_node_ids[idx]
-                        )
-                        if next_child_node_data.get_last_pos_tag() in [
-                            "SY",
-                            "SF",
-                            "SE",
-                        ]:
-                            sub_nodes.append(next_child_node_data)
-                        else:
-                            self._create_sub_tree(
-                                parent_node_id=document_node_id,
-                                children_node_data=sub_nodes,
-                                node_type="문장",
-                            )
-                            sub_nodes = []
-                            sub_nodes.append(next_child_node_data)
-                            break
-
-                        idx += 1
-
-                # 말줄임표로 구분된 문장 처리
-                elif child_node_data.get_last_pos_tag() in ["SE"]:
-                    self._create_sub_tree(
-                        parent_node_id=document_node_id,
-                        children_node_data=sub_nodes,
-                        node_type="문장",
-                    )
-                    sub_nodes = []
-
-                # 감탄사로 구분된 문장 처리
-                elif child_node_data.get_last_pos_tag() in ["IC"]:
-                    idx += 1
-                    while idx < len(children_node_ids):
-                        next_child_node_data = self._tree.get_node_data_by_id(
-                            children_node_ids[idx]
-                        )
-                        if next_child_node_data.get_last_pos_tag() in ["IC", "SWS"]:
-                            sub_nodes.append(next_child_node_data)
-                        else:
-                            if sub_nodes[-1].get_last_pos_tag() in ["SWS"]:
-                                sub_nodes = sub_nodes[0:-1]  # 공백으로 끝나지 않도록 조정한다
-                            self._create_sub_tree(
-                                parent_node_id=document_node_id,
-                                children_node_data=sub_nodes,
-                                node_type="문장",
-                            )
-                            sub_nodes = []
-                            sub_nodes.append(next_child_node_data)
-                            break
-
-                        idx += 1
-
-                idx += 1
-
-            if len(sub_nodes) > 0:
-                self._create_sub_tree(
-                    parent_node_id=document_node_id,
-                    children_node_data=sub_nodes,
-                    node_type="문장",
-                )
-            document_node_id = get_not_processed_document_node_id(self._tree)
+        for document_node_id in document_node_ids:
+            self._group_spans(document_node_id, find_sentences, "문장")
 
     def _identify_phrases(self):
-        def is_sentence_node_processed(tree, node_id):
-            return tree.get_node_data_by_id(node_id).node_type == "구"
-
-        def get_not_processed_sentence_node_id(tree):
-            for node_id in tree.filter_nodes(
-                lambda x: tree.get_node_data_by_id(x).node_type == "문장"
-            ):
-                if 1 not in map(
-                    lambda x: 1 if is_sentence_node_processed(tree, x) else 0,
-                    tree.get_children_node_ids(parent_node_id=node_id),
-                ):
-                    return node_id
-            return None
-
-        sentence_node_id = get_not_processed_sentence_node_id(self._tree)
-        while sentence_node_id:
-            children_node_ids = self._tree.get_children_node_ids(
-                parent_node_id=sentence_node_id
+        # 구 노드는 문장 노드 하위에만 생성되므로 문장 노드를 한번 모아두고 차례로 처리한다
+        sentence_node_ids = list(
+            self._tree.filter_nodes(
+                lambda x: self._tree.get_node_data_by_id(x).node_type == "문장"
             )
+        )
 
-            sub_nodes = []
-            idx = 0
-            while idx < len(children_node_ids):
-                child_node_data = self._tree.get_node_data_by_id(children_node_ids[idx])
-
-                # 구의 처음에 공백문자를 추가하지 않는다
-                if len(sub_nodes) == 0 and child_node_data.get_last_pos_tag() == "SWS":
-                    idx += 1
-                    continue
-
-                sub_nodes.append(child_node_data)
-
-                if child_node_data.node_type != "단어":
-                    idx += 1
-                    continue
-
-                # 문장의 부속성분 (관형어, 부사어) 와 관련한 구 구분 규칙
-                if child_node_data.sentence_tag in ["관형어", "부사어"]:
-
-                    # 관형어 뒤에 1) 체언으로 시작하는 단어, 2) 주어 혹은 목적어가 오면 합친다
-                    if child_node_data.sentence_tag in ["관형어"]:
-                        idx, sub_nodes = self.check_phrase_to_merge_next_word(
-                            idx,
-                            sub_nodes,
-                            children_node_ids,
-                            lambda next_node: next_node.word_tag in ["체언"]
-                            or next_node.sentence_tag in ["주어", "목적어"],
-                        )
-
-                    # 구 노드를 생성한다
-                    self._create_sub_tree(
-                        parent_node_id=sentence_node_id,
-                        children_node_data=sub_nodes,
-                        node_type="구",
-                    )
-                    sub_nodes = []
-
-                # 문장의 주성분 (주어, 목적어, 서술어, 보어) 과 관련한 구 구분 규칙
-                if child_node_data.sentence_tag in ["주어", "목적어", "서술어", "보어"]:
-
-                    # 목적어 뒤에 오는 관형어를 처리한다: '중국을 방문한 대통령'을 '중국을 방문한' '대통령' 으로 나눈다
-                    if child_node_data.sentence_tag in ["목적어"]:
-                        idx, sub_nodes = self.check_phrase_to_merge_next_word(
-                            idx,
-                            sub_nodes,
-                            children_node_ids,
-                            lambda next_node: next_node.sentence_tag in ["관형어"],
-                        )
-
-                    # 서술어 뒤어 오는 보조 용언 VX를 처리한다: '논란을 빚고 있다' 를 '논란을' '빚고 있다' 로 나눈다
-                    if child_node_data.sentence_tag in ["서술어"]:
-                        idx, sub_nodes = self.check_phrase_to_merge_next_word(
-                            idx,
-                            sub_nodes,
-                            children_node_ids,
-                            lambda next_node: next_node.get_first_pos_tag() in ["VX"],
-                        )
-
-                    # 동사(VV)로 시작하는 보어가 다음에 서술어를 만나면 합친다: '이긴것이 아니다', '위해서도 낫다'
-                    if child_node_data.sentence_tag in [
-                        "보어"
-                    ] and child_node_data.get_first_pos_tag() in ["VV"]:
-                        idx, sub_nodes = self.check_phrase_to_merge_next_word(
-                            idx,
-                            sub_nodes,
-                            children_node_ids,
-                            lambda next_node: next_node.sentence_tag in ["서술어"],
-                        )
-
-                    # 구 노드를 생성한다
-                    self._create_sub_tree(
-                        parent_node_id=sentence_node_id,
-                        children_node_data=sub_nodes,
-                        node_type="구",
-                    )
-                    sub_nodes = []
-
-                idx += 1
-
-            if len(sub_nodes) > 0:
-                self._create_sub_tree(
-                    parent_node_id=sentence_node_id,
-                    children_node_data=sub_nodes,
-                    node_type="구",
-                )
-            sentence_node_id = get_not_processed_sentence_node_id(self._tree)
-
-    def check_phrase_to_merge_next_word(self, idx, sub_nodes, children_node_ids, rule):
-        next_idx = idx + 1
-        next_sub_nodes = []
+        for sentence_node_id in sentence_node_ids:
+            self._group_spans(sentence_node_id, find_phrases, "구")
 
-        # 공백문자를 건너뛴다
-        while next_idx < len(children_node_ids):
-            next_child_node_data = self._tree.get_node_data_by_id(
-                children_node_ids[next_idx]
-            )
-            if next_child_node_data.get_last_pos_tag() in ["SWS"]:
-                next_sub_nodes.append(next_child_node_data)
-                next_idx += 1
-                continue
-            else:
-                break
+    def _group_spans(self, parent_node_id, find_spans, node_type):
+        # 하위 노드 중 find_spans 가 찾은 구간 [begin, end) 를 각각 하나의 노드로 묶는다
+        children_node_data = [
+            self._tree.get_node_data_by_id(child_id)
+            for child_id in self._tree.get_children_node_ids(parent_node_id)
+        ]
 
-        if next_idx < len(children_node_ids):
-            next_child_node_data = self._tree.get_node_data_by_id(
-                children_node_ids[next_idx]
+        for begin, end in find_spans(children_node_data):
+            self._create_sub_tree(
+                parent_node_id=parent_node_id,
+                children_node_data=children_node_data[begin:end],
+                node_type=node_type,
             )
-            if rule(next_child_node_data):
-                sub_nodes += next_sub_nodes
-                sub_nodes.append(next_child_node_data)
-                idx = next_idx
-
-        return idx, sub_nodes
 
     ##### 유틸리티 함수 - 트리 분할 / 합병 관련
-    def _update_sub_tree_identifier(
-        self, sub_root_node_data, new_node_id, new_parent_node_id, updated_data
-    ):
-        children_node_ids = self._tree.get_children_node_ids(sub_root_node_data.node_id)
-
-        for idx, child_id in enumerate(children_node_ids):
-            child_data = self._tree.get_node_data_by_id(child_id)
-            self._update_sub_tree_identifier(
-                child_data, f"{new_node_id}_{idx:03d}", new_node_id, updated_data
-            )
-
-        self._tree.remove_node(sub_root_node_data.node_id)  # 기존 노드는 삭제
-        sub_root_node_data.node_id = new_node_id  # 새로운 노드 ID를 부여
-        sub_root_node_data.parent_node_id = new_parent_node_id
-        updated_data.append(sub_root_node_data)  # 데이터를 유지하여 추후 다시 추가할 수 있도록 함
-
     def _create_sub_tree(self, parent_node_id, children_node_data, node_type=None):
         if len(children_node_data) > 0:
-            # org_txt, pos_txt 계산
+            # org_txt 계산, pos_txt 는 하위 노드로부터 필요할 때 계산된다
             org_txt_form = "".join([node.org_txt_form for node in children_node_data])
-            pos_txt_form = " ".join([node.pos_txt_form for node in children_node_data])
-
-            # 기존 node id 업데이트
-            new_node_id = children_node_data[0].node_id
-            updated_data = []
-            for idx, node_data in enumerate(children_node_data):
-                self._update_sub_tree_identifier(
-                    node_data, f"{new_node_id}_{idx:03d}", new_node_id, updated_data
-                )
 
-            # 신규 node 생성
-            self._tree.add_node(
-                node_id=new_node_id,
+            # 신규 node 를 생성하고 기존 nodes 를 신규 node 하위로 이동
+            self._tree.group_nodes(
+                children_node_ids=[node.node_id for node in children_node_data],
                 node_data=NodeData(
-                    node_id=new_node_id,
                     node_type=node_type,
                     parent_node_id=parent_node_id,
                     org_txt_form=org_txt_form,
-                    pos_txt_form=pos_txt_form,
+                    pos_units=children_node_data,
+                    start=children_node_data[0].start,
                 ),
             )
 
-            # 기존 nodes 를 신규 node 하위로 이동
-            for node_data in updated_data:
-                self._tree.add_node(node_id=node_data.node_id, node_data=node_data)
-
     def keywords(self):
+        if self._cached is not None:
+            return list(self._cached.keywords)
+
+        return [node_data.org_txt_form for node_data in self._keyword_nodes()]
+
+    def keyword_spans(self):
+        """
+        키워드와 원래 문서에서의 위치를 keywords() 와 같은 순서로 리턴합니다.
+
+        :return: [(키워드, 시작 위치, 끝 위치)] 리스트, 위치는 전처리 전 문서 기준
+        """
+        return self._spans(self._keyword_nodes())
+
+    def _keyword_nodes(self):
+        if self._extraction is None and self._tree is None:
+            self._analyze()
+        if self._extraction is not None:
+            return self._extraction.keywords()
+
         result = []
-        queue = [ParseTree.ID_ROOT]
+        queue = deque([ParseTree.ID_ROOT])
 
         while len(queue) > 0:
-            node_id = queue.pop(0)
+            node_id = queue.popleft()
             node_data = self._tree.get_node_data_by_id(node_id)
 
-            if (
-                node_data.node_type == "구"
-                and node_data.word_tag == "체언"
-                and node_data.sentence_tag == "독립어"
-                and (not node_data.org_txt_form.endswith("할 수"))
-            ):
-                result.append(node_data.org_txt_form)
-                continue
-
-            if (
-                node_data.node_type == "단어"
-                and node_data.word_tag in ["체언", "독립언"]
-                and (
-                    len(node_data.org_txt_form) > 1
-                    or self._is_hanja(node_data.org_txt_form)
-                )
-            ):
-                result.append(node_data.org_txt_form)
+            if is_keyword(node_data):
+                result.append(node_data)
                 continue
 
             # 자식노드를 큐에 추가
-            queue += self._tree.get_children_node_ids(node_id)
+            queue.extend(self._tree.get_children_node_ids(node_id))
 
         return result
 
-    ##### 문장 분리 관련 함수 시작
-    def sentences(self):
+    def _spans(self, nodes):
+        # 원래 문서의 위치는 처음 요청할 때 계산한다
+        if self._offsets is None:
+            _, starts, ends = preproc_with_offsets(self._original)
+            self._offsets = (starts, ends)
+        starts, ends = self._offsets
+
         result = []
-        for node_id in self._tree.filter_nodes(
-            lambda x: self._tree.get_node_data_by_id(x).node_type == "문장"
-        ):
-            node_data = self._tree.get_node_data_by_id(node_id)
-            result.append(node_data.org_txt_form)
+        for node_data in nodes:
+            result.append(
+                (
+                    node_data.org_txt_form,
+                    starts[node_data.start],
+                    ends[node_data.end - 1],
+                )
+            )
         return result
 
-    def printable_tree(self, debug=True):
-        return self._tree.printable_subtree(
-            sub_root_node_id=ParseTree.ID_ROOT, debug=debug
+    ##### 문장 분리 관련 함수 시작
+    def sentences(self):
+        if self._cached is not None:
+            return list(self._cached.sentences)
+
+        return [node_data.org_txt_form for node_data in self._sentence_nodes()]
+
+    def sentence_spans(self):
+        """
+        문장과 원래 문서에서의 위치를 sentences() 와 같은 순서로 리턴합니다.
+
+        :return: [(문장, 시작 위치, 끝 위치)] 리스트, 위치는 전처리 전 문서 기준
+        """
+        return self._spans(self._sentence_nodes())
+
+    def _sentence_nodes(self):
+        if self._extraction is None and self._tree is None:
+            self._analyze()
+        if self._extraction is not None:
+            return self._extraction.sentences()
+
+        return [
+            self._tree.get_node_data_by_id(node_id)
+            for node_id in self._tree.filter_nodes(
+                lambda x: self._tree.get_node_data_by_id(x).node_type == "문장"
+            )
+        ]
+
+    def printable_tree(self, debug=True, format=FORMAT_PLAIN):
+        return "".join(self.iter_printable_tree(debug=debug, format=format))
+
+    def iter_printable_tree(self, debug=True, format=FORMAT_PLAIN):
+        """
+        파싱 트리를 출력용 문자열로 변환하여 노드마다 한 줄씩 돌려줍니다.
+
+        :param debug: true 일 경우 문서위계, 5언 7성분 9품사 정보를 함께 출력 (기본값 true)
+        :param format: plain, html(이스케이프된 HTML), json(한 줄에 노드 하나) 중 하나 (기본값 plain)
+        :return: 노드별 문자열 generator
+        """
+        if self._tree is None:
+            self._build_tree()
+
+        return self._tree.iter_printable_subtree(
+            sub_root_node_id=ParseTree.ID_ROOT, debug=debug, format=format
         )
+
+    def write_printable_tree(self, stream, debug=True, format=FORMAT_PLAIN):
+        """
+        파싱 트리를 출력용 문자열로 변환하여 텍스트 스트림에 씁니다.
+
+        :param stream: write 메소드가 있는 텍스트 스트림 (예: sys.stdout, 열린 파일 객체)
+        :param debug: true 일 경우 문서위계, 5언 7성분 9품사 정보를 함께 출력 (기본값 true)
+        :param format: plain, html, json 중 하나 (기본값 plain)
+        :return: void
+        """
+        for printable in self.iter_printable_tree(debug=debug, format=format):
+            stream.write(printable)
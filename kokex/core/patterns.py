@@ -0,0 +1,120 @@
+import re
+
+RE_TAG = re.compile(r"[A-Z0-9_]*")
+RE_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+DEFAULT_FLAGS = re.compile("").flags
+
+
+class CustomPatterns:
+    """
+    사용자 정의 형태소를 위한 정규식 패턴 모음
+
+    패턴은 생성할 때 한번만 검사하고 컴파일하여 여러 문서에 재사용합니다.
+    가능한 패턴들은 하나의 정규식으로 합쳐서 문서를 한번만 탐색하고, 매칭될 수 있는 위치에서만 패턴별로 매칭합니다.
+    같은 위치에서 여러 패턴이 매칭되면 형태소 경계에서 끝나는 매칭 중 먼저 입력된 패턴이 우선합니다.
+    """
+
+    def __init__(self, patterns):
+        """
+        :param patterns: [{'pattern': string, 'tag': string}] 형태의 패턴 목록
+        """
+        self._patterns = [dict(pattern) for pattern in patterns]
+
+        self._combinable = []
+        self._separate = []  # 다른 패턴과 합칠 수 없는 패턴은 따로 탐색한다
+        for idx, pattern in enumerate(self._patterns):
+            # 패턴 유효성 검사
+            if not RE_TAG.fullmatch(pattern["tag"]):
+                raise Exception("패턴 tag 는 영문대문자 / 숫자 / 밑줄(_) 만 사용할 수 있습니다")
+
+            compiled = re.compile(pattern["pattern"])
+            if self._is_combinable(compiled):
+                self._combinable.append((idx, compiled, pattern["tag"]))
+            else:
+                self._separate.append((idx, compiled, pattern["tag"]))
+
+        # 합친 정규식으로 어느 패턴이든 매칭되는 위치만 찾고, 그 위치에서만 패턴별로 매칭한다
+        # 이름 있는 그룹이나 전방탐색을 쓰면 정규식 엔진의 접두어 최적화가 꺼지므로 사용하지 않는다
+        self._combined = (
+            re.compile(
+                "|".join(
+                    [f"(?:{compiled.pattern})" for _, compiled, _ in self._combinable]
+                )
+            )
+            if self._combinable
+            else None
+        )
+
+    @classmethod
+    def of(cls, patterns):
+        """
+        패턴 목록 혹은 CustomPatterns 를 받아 CustomPatterns 를 리턴합니다.
+        """
+        if isinstance(patterns, CustomPatterns):
+            return patterns
+        return cls(patterns if patterns else [])
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __iter__(self):
+        return iter(self._patterns)
+
+    def __eq__(self, other):
+        return isinstance(other, CustomPatterns) and self._patterns == other._patterns
+
+    def __hash__(self):
+        return hash(tuple((p["pattern"], p["tag"]) for p in self._patterns))
+
+    def __getstate__(self):
+        return self._patterns
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def match_index(self, txt):
+        """
+        문서에서 패턴을 탐색하여 시작 위치별 매칭 후보를 리턴합니다.
+        각 패턴은 따로 탐색한 것과 같이 매칭되므로, 다른 패턴의 매칭과 겹치는 매칭도 후보에 포함됩니다.
+
+        :param txt: 문서
+        :return: {시작 위치: [(끝 위치, 매칭된 문자열, 태그)]} 딕셔너리, 후보는 먼저 입력된 패턴 순서
+        """
+        candidates = []
+
+        if self._combined is not None:
+            # 패턴별로 마지막 매칭이 끝난 위치, 각 패턴의 매칭은 finditer 와 같이 서로 겹치지 않는다
+            ends = [0] * len(self._combinable)
+            position = self._combined.search(txt)
+            while position is not None:
+                start = position.start()
+                for order, (idx, compiled, tag) in enumerate(self._combinable):
+                    if start < ends[order]:
+                        continue
+                    match = compiled.match(txt, start)
+                    if match is not None and match.end() > start:
+                        candidates.append((idx, match, tag))
+                        ends[order] = match.end()
+
+                # 합친 정규식의 매칭은 다른 패턴의 매칭을 가릴 수 있으므로 바로 다음 위치부터 다시 탐색한다
+                # 모든 패턴의 매칭이 아직 끝나지 않았다면 그 중 가장 먼저 끝나는 위치부터 탐색한다
+                position = self._combined.search(txt, max(start + 1, min(ends)))
+
+        for idx, compiled, tag in self._separate:
+            candidates += [(idx, match, tag) for match in compiled.finditer(txt)]
+
+        index = {}
+        for _, match, tag in sorted(candidates, key=lambda x: x[0]):
+            start = match.start()
+            if match.end() > start:
+                index.setdefault(start, []).append((match.end(), match.group(), tag))
+        return index
+
+    @staticmethod
+    def _is_combinable(compiled):
+        # 이름 있는 그룹, 역참조, 인라인 플래그가 있는 패턴은 합치면 의미가 바뀔 수 있다
+        return (
+            not compiled.groupindex
+            and compiled.flags == DEFAULT_FLAGS
+            and not RE_BACKREFERENCE.search(compiled.pattern)
+        )
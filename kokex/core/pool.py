@@ -0,0 +1,132 @@
+import queue
+import threading
+from contextlib import contextmanager
+from os import environ
+
+from .parser import DocumentParser
+
+WARMUP_DOCUMENT = "kokex 워밍업 문서입니다."
+DEFAULT_POOL_SIZE = 4
+
+
+def default_pool_size():
+    """
+    :return: 환경변수 KOKEX_POOL_SIZE 로 지정한 파서 풀의 크기, 지정하지 않았다면 DEFAULT_POOL_SIZE
+    """
+    return int(environ.get("KOKEX_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+
+class ParserPool:
+    """
+    DocumentParser 인스턴스를 재사용하기 위한 스레드 안전한 풀
+
+    DocumentParser 를 생성할 때마다 Mecab 사전을 다시 읽어야 하므로,
+    한번 생성한 파서를 풀에 보관해두고 요청마다 빌려준다.
+    """
+
+    def __init__(self, size=None, analyzer=None):
+        """
+        :param size: 동시에 유지할 파서의 최대 개수 (기본값 None, 환경변수 KOKEX_POOL_SIZE 또는 4)
+        :param analyzer: 각 파서가 사용할 형태소 분석기 이름 (기본값 None, 환경변수 KOKEX_ANALYZER 또는 mecab)
+        """
+        size = default_pool_size() if size is None else size
+        if size < 1:
+            raise ValueError("풀 크기는 1 이상이어야 합니다")
+
+        self._size = size
+        self._analyzer = analyzer
+        self._created = 0
+        self._idle = queue.LifoQueue()  # 최근에 사용한 파서를 먼저 재사용한다
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self._size
+
+    def resize(self, size):
+        """
+        풀의 최대 크기를 변경합니다. 줄어든 만큼의 파서는 반납될 때 폐기됩니다.
+
+        :param size: 동시에 유지할 파서의 최대 개수
+        :return: void
+        """
+        if size < 1:
+            raise ValueError("풀 크기는 1 이상이어야 합니다")
+
+        with self._lock:
+            self._size = size
+        self._trim()
+
+    def warmup(self, count=None):
+        """
+        파서를 미리 생성하고 짧은 문서를 분석하여 사전을 적재해둡니다.
+
+        :param count: 미리 생성할 파서의 개수 (기본값 풀 크기)
+        :return: void
+        """
+        count = self._size if count is None else min(count, self._size)
+
+        parsers = []
+        try:
+            while len(parsers) < count:
+                parser = self._acquire(block=False)
+                if parser is None:
+                    break
+                parsers.append(parser)
+            for parser in parsers:
+                parser.parse(document=WARMUP_DOCUMENT)
+        finally:
+            for parser in parsers:
+                self._release(parser)
+
+    @contextmanager
+    def parser(self):
+        """
+        풀에서 파서를 빌려주고, with 블록이 끝나면 반납합니다.
+
+        :return: DocumentParser
+        """
+        parser = self._acquire(block=True)
+        try:
+            yield parser
+        finally:
+            self._release(parser)
+
+    def _acquire(self, block):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self._size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                return DocumentParser(analyzer=self._analyzer)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        return self._idle.get() if block else None
+
+    def _release(self, parser):
+        with self._lock:
+            if self._created > self._size:
+                self._created -= 1
+                return
+        self._idle.put(parser)
+
+    def _trim(self):
+        while True:
+            with self._lock:
+                if self._created <= self._size:
+                    return
+                try:
+                    self._idle.get_nowait()
+                except queue.Empty:
+                    return
+                self._created -= 1
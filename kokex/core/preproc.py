@@ -1,5 +1,23 @@
 import html
 import re
+from functools import lru_cache
+
+# html.unescape 가 사용하는 문자 참조 패턴
+RE_CHARREF = re.compile(r"&(#[0-9]+;?|#[xX][0-9a-fA-F]+;?|[^\t\n\f <&#;]{1,32};?)")
+
+# 모든 패턴은 \n 을 넘어서 매칭되지 않으므로 문서를 \n 으로 나누어 처리해도 결과가 같다
+# (\r, \x85, \u2028 등은 str.splitlines() 와 달리 줄의 일부로 취급한다)
+RE_HTML_TAG = re.compile(r"</?[a-zA-Z][a-zA-Z0-9]*>")
+RE_URL_LINK = re.compile(
+    r"(http|ftp|https)://(?:[-\w.]|(?:[%/\w]))+(\?.+?=.+?(&.+?=.+?)*\b)?"
+)
+RE_EMAIL = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+RE_MENTION = re.compile(r"@[a-zA-Z0-9_.+-]+")
+
+# 말줄임표와 ㅋ 반복은 서로의 치환 결과에 영향을 주지 않으므로 하나의 패턴으로 처리한다
+RE_DOTS_KKKS = re.compile(r"(?P<dots>·{2,}|\.{2,})|(?P<kkks>ㅋ{3,})")
+REPL_DOTS = "… "
+REPL_KKKS = "ㅋㅋㅋ "
 
 
 # preprocessing 함수
@@ -9,48 +27,134 @@ def preproc(document):
     document = _replace_url_link(document)
     document = _replace_email(document)
     document = _replace_mention(document)
-    document = _replace_dots(document)
-    document = _replace_kkks(document)
+    document = _replace_dots_kkks(document)
     document = _replace_unicode_char(document)
     return document
 
 
+def preproc_with_offsets(document):
+    """
+    문서를 전처리하고, 전처리된 문서의 각 문자가 원래 문서의 어느 위치에서 왔는지 함께 리턴합니다.
+    치환된 문자는 치환 전 문자열 전체의 위치를 가집니다.
+
+    :param document: 원래 문서
+    :return: (전처리된 문서, 각 문자의 원래 시작 위치 리스트, 각 문자의 원래 끝 위치 리스트)
+    """
+    starts = list(range(len(document)))
+    ends = list(range(1, len(document) + 1))
+
+    steps = [
+        (RE_CHARREF, lambda match: html.unescape(match.group())),
+        (RE_HTML_TAG, ""),
+        (RE_URL_LINK, ""),
+        (RE_EMAIL, ""),
+        (RE_MENTION, ""),
+        (
+            RE_DOTS_KKKS,
+            lambda match: REPL_DOTS if match.lastgroup == "dots" else REPL_KKKS,
+        ),
+    ]
+    for pattern, repl in steps:
+        document, starts, ends = _sub_with_offsets(
+            pattern, repl, document, starts, ends
+        )
+
+    # 출력할 수 없는 문자는 앞의 치환 (예: &nbsp;) 으로 생길 수 있으므로 마지막에 확인한다
+    if not document.isprintable():
+        document, starts, ends = _sub_with_offsets(
+            _unicode_char_pattern(), " ", document, starts, ends
+        )
+
+    return document, starts, ends
+
+
+def _sub_with_offsets(pattern, repl, text, starts, ends):
+    pieces = []
+    new_starts = []
+    new_ends = []
+
+    txt_idx = 0
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        pieces.append(text[txt_idx:start])
+        new_starts.extend(starts[txt_idx:start])
+        new_ends.extend(ends[txt_idx:start])
+
+        # 치환된 문자는 모두 매칭된 원래 문자열 전체의 위치를 가진다 (모든 패턴은 빈 문자열과 매칭되지 않는다)
+        replaced = repl if isinstance(repl, str) else repl(match)
+        pieces.append(replaced)
+        new_starts.extend([starts[start]] * len(replaced))
+        new_ends.extend([ends[end - 1]] * len(replaced))
+        txt_idx = end
+
+    if txt_idx == 0:
+        return text, starts, ends
+
+    pieces.append(text[txt_idx:])
+    new_starts.extend(starts[txt_idx:])
+    new_ends.extend(ends[txt_idx:])
+    return "".join(pieces), new_starts, new_ends
+
+
 def _html_unescape(text):
     return html.unescape(text)
 
 
 def _replace_html_tag(text):
-    re_pattern = r"</?[a-zA-Z][a-zA-Z0-9]*>"
-    return re.sub(pattern=re_pattern, repl="", string=text)
+    return RE_HTML_TAG.sub("", text) if "<" in text else text
 
 
 def _replace_url_link(text):
-    re_pattern = r"(http|ftp|https)://(?:[-\w.]|(?:[%/\w]))+(\?.+?=.+?(&.+?=.+?)*\b)?"
-    return re.sub(pattern=re_pattern, repl="", string=text)
+    return RE_URL_LINK.sub("", text) if "://" in text else text
 
 
 def _replace_email(text):
-    re_pattern = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
-    return re.sub(pattern=re_pattern, repl="", string=text)
+    return RE_EMAIL.sub("", text) if "@" in text else text
 
 
 def _replace_mention(text):
-    re_pattern = r"@[a-zA-Z0-9_.+-]+"
-    return re.sub(pattern=re_pattern, repl="", string=text)
+    return RE_MENTION.sub("", text) if "@" in text else text
 
 
-def _replace_unicode_char(text):
-    u_chars = "".join(
-        re.findall(pattern=r"(\\u[0-9a-zA-Z]{4}|\\x[0-9a-zA-Z]{2})", string=repr(text))
+def _replace_dots_kkks(text):
+    if ".." not in text and "··" not in text and "ㅋㅋㅋ" not in text:
+        return text
+    return RE_DOTS_KKKS.sub(
+        lambda match: REPL_DOTS if match.lastgroup == "dots" else REPL_KKKS, text
     )
-    return re.sub(pattern=fr"[{u_chars}]", repl=" ", string=text) if u_chars else text
-
-
-def _replace_dots(text):
-    re_pattern = r"((·{2,})|(\.{2,}))"
-    return re.sub(pattern=re_pattern, repl="… ", string=text)
 
 
-def _replace_kkks(text):
-    re_pattern = r"(ㅋ{3,})"
-    return re.sub(pattern=re_pattern, repl="ㅋㅋㅋ ", string=text)
+def _replace_unicode_char(text):
+    # repr() 에서 \x, \u 형태로 표시되는 (출력할 수 없는) 문자를 공백으로 치환한다
+    if text.isprintable():
+        return text
+    return _unicode_char_pattern().sub(" ", text)
+
+
+@lru_cache(maxsize=None)
+def _unicode_char_pattern():
+    ranges = []
+    for code in range(0x10000):
+        if code in (0x09, 0x0A, 0x0D):  # 탭, 개행문자는 repr() 에서 \t, \n, \r 로 표시된다
+            continue
+        if (
+            code < 0x20
+            or code == 0x7F
+            or (code >= 0x80 and not chr(code).isprintable())
+        ):
+            if ranges and ranges[-1][1] == code - 1:
+                ranges[-1][1] = code
+            else:
+                ranges.append([code, code])
+
+    return re.compile(
+        "["
+        + "".join(
+            [
+                re.escape(chr(start))
+                + ("-" + re.escape(chr(end)) if end > start else "")
+                for start, end in ranges
+            ]
+        )
+        + "]"
+    )
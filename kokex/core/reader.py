@@ -0,0 +1,72 @@
+import json
+from os import PathLike, fspath
+
+FORMAT_LINES = "lines"
+FORMAT_JSONL = "jsonl"
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+
+
+def iter_documents(source, text_field="doc", format=None):
+    """
+    문서 목록, 파일 경로 혹은 파일 객체로부터 문서를 하나씩 읽어 돌려줍니다.
+    파일은 한 줄씩 읽으므로 전체를 메모리에 올리지 않습니다.
+
+    :param source: 문서 iterable, 파일 경로 혹은 열린 파일 객체
+    :param text_field: jsonl 의 각 줄이 객체일 때 문서가 담긴 필드 이름 (기본값 doc)
+    :param format: lines (한 줄에 한 문서) 혹은 jsonl, 지정하지 않으면 파일 확장자로 판단 (기본값 None)
+    :return: 문서 generator
+    """
+    if isinstance(source, (str, PathLike)):
+        with open(source, encoding="utf-8") as f:
+            yield from _read_documents(
+                f, format or _format_of(fspath(source)), text_field
+            )
+    elif hasattr(source, "readline"):
+        yield from _read_documents(
+            source, format or _format_of(getattr(source, "name", "")), text_field
+        )
+    else:
+        yield from source
+
+
+def _format_of(name):
+    if isinstance(name, str) and name.lower().endswith(JSONL_EXTENSIONS):
+        return FORMAT_JSONL
+    return FORMAT_LINES
+
+
+def read_document(line, format=FORMAT_JSONL, text_field="doc"):
+    """
+    한 줄을 읽어 문서를 리턴합니다.
+
+    :param line: 문자열 혹은 bytes 한 줄
+    :param format: lines (한 줄에 한 문서) 혹은 jsonl (기본값 jsonl)
+    :param text_field: jsonl 의 각 줄이 객체일 때 문서가 담긴 필드 이름 (기본값 doc)
+    :return: 문서, 빈 줄이면 None
+    """
+    if format not in (FORMAT_LINES, FORMAT_JSONL):
+        raise ValueError(f"지원하지 않는 형식입니다: {format}")
+
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    line = line.rstrip("\r\n")
+
+    # 빈 줄은 문서로 취급하지 않는다
+    if not line.strip():
+        return None
+
+    if format == FORMAT_LINES:
+        return line
+
+    record = json.loads(line)
+    return record if isinstance(record, str) else record[text_field]
+
+
+def _read_documents(f, format, text_field):
+    if format not in (FORMAT_LINES, FORMAT_JSONL):
+        raise ValueError(f"지원하지 않는 형식입니다: {format}")
+
+    for line in f:
+        doc = read_document(line, format=format, text_field=text_field)
+        if doc is not None:
+            yield doc
@@ -0,0 +1,128 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+
+SCORING_COUNT = "count"
+SCORING_DF = "df"
+SCORING_TFIDF = "tfidf"
+SCORING_BM25 = "bm25"
+SCORINGS = (SCORING_COUNT, SCORING_DF, SCORING_TFIDF, SCORING_BM25)
+
+
+class KeywordScorer:
+    """
+    문서별 키워드 목록을 한번씩만 읽어서 키워드의 점수를 집계하는 클래스
+
+    - count: 전체 문서에서 키워드가 나타난 횟수 (kokex.keywords 의 기본 결과와 같음)
+    - df: 키워드가 나타난 문서의 개수
+    - tfidf: 나타난 횟수 x idf, idf = log((1 + 문서 수) / (1 + df)) + 1
+    - bm25: 문서별 BM25 가중치의 합, 문서 길이는 문서의 키워드 개수
+
+    BM25 는 평균 문서 길이를 알아야 계산할 수 있으므로, 키워드마다 (문서 내 빈도, 문서 길이) 별 문서 수를 보관해두었다가
+    점수를 요청할 때 계산한다. 대부분의 키워드는 이 조합이 몇 개 되지 않으므로 문서를 다시 읽는 것보다 훨씬 작다.
+    """
+
+    def __init__(self, scoring=SCORING_COUNT, k1=1.2, b=0.75):
+        """
+        :param scoring: 점수 계산 방식 count, df, tfidf, bm25 중 하나 (기본값 count)
+        :param k1: BM25 의 빈도 포화 계수 (기본값 1.2)
+        :param b: BM25 의 문서 길이 정규화 계수 (기본값 0.75)
+        """
+        if scoring not in SCORINGS:
+            raise ValueError(f"지원하지 않는 점수 계산 방식입니다: {scoring}")
+
+        self.scoring = scoring
+        self.k1 = k1
+        self.b = b
+
+        self.num_docs = 0
+        self.num_keywords = 0
+        self.tf = defaultdict(int)
+        self.df = defaultdict(int)
+        self._postings = defaultdict(Counter)
+
+    def __len__(self):
+        return len(self.tf)
+
+    def add(self, keywords):
+        """
+        문서 하나의 키워드 목록을 집계에 추가합니다.
+
+        :param keywords: DocumentParser.keywords() 가 리턴한 키워드 목록
+        :return: void
+        """
+        self.num_docs += 1
+        self.num_keywords += len(keywords)
+
+        for word, count in Counter(keywords).items():
+            self.tf[word] += count
+            self.df[word] += 1
+            if self.scoring == SCORING_BM25:
+                self._postings[word][(count, len(keywords))] += 1
+
+    def merge(self, other):
+        """
+        다른 KeywordScorer 의 집계를 더합니다. 여러 프로세스에서 나누어 집계한 결과를 합칠 때 사용합니다.
+
+        :param other: 같은 방식으로 집계한 KeywordScorer
+        :return: void
+        """
+        if other.scoring != self.scoring:
+            raise ValueError("점수 계산 방식이 같은 집계만 합칠 수 있습니다")
+
+        self.num_docs += other.num_docs
+        self.num_keywords += other.num_keywords
+        for word, count in other.tf.items():
+            self.tf[word] += count
+            self.df[word] += other.df[word]
+        for word, postings in other._postings.items():
+            self._postings[word].update(postings)
+
+    def score(self, word):
+        """
+        :param word: 키워드
+        :return: 키워드의 점수, 집계에 없는 키워드는 0
+        """
+        if word not in self.tf:
+            return 0
+
+        if self.scoring == SCORING_COUNT:
+            return self.tf[word]
+        if self.scoring == SCORING_DF:
+            return self.df[word]
+        if self.scoring == SCORING_TFIDF:
+            return self.tf[word] * self._tfidf_idf(self.df[word])
+
+        idf = self._bm25_idf(self.df[word])
+        avg_len = self.num_keywords / self.num_docs
+        return sum(
+            idf
+            * docs
+            * tf
+            * (self.k1 + 1)
+            / (tf + self.k1 * (1 - self.b + self.b * length / avg_len))
+            for (tf, length), docs in self._postings[word].items()
+        )
+
+    def scores(self):
+        """
+        :return: 키워드와 점수가 담긴 딕셔너리, 키워드가 처음 나타난 순서
+        """
+        return {word: self.score(word) for word in self.tf}
+
+    def top(self, k):
+        """
+        점수가 높은 키워드 k 개를 리턴합니다. 전체 키워드를 정렬하지 않고 힙으로 선택합니다.
+
+        :param k: 리턴할 키워드의 개수
+        :return: 점수가 높은 순서의 (키워드, 점수) 리스트, 점수가 같으면 처음 나타난 순서
+        """
+        return heapq.nlargest(
+            k, ((word, self.score(word)) for word in self.tf), key=lambda x: x[1]
+        )
+
+    def _tfidf_idf(self, df):
+        return math.log((1 + self.num_docs) / (1 + df)) + 1
+
+    def _bm25_idf(self, df):
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
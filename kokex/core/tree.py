@@ -1,19 +1,52 @@
+import html
+import json
 import re
 
-import networkx as nx
+FORMAT_PLAIN = "plain"
+FORMAT_HTML = "html"
+FORMAT_JSON = "json"
 
 
 class NodeData:
+    """
+    파싱 트리의 노드 데이터
+
+    형태소 태그는 pos_units 로 입력받아 구조화된 형태로 보관하며, pos_txt_form 은 요청할 때 만들어진다.
+    pos_units 의 각 항목은 (문자열, 태그) 튜플이거나 하위 노드의 NodeData 이다.
+    start 는 전처리된 문서에서 org_txt_form 이 시작하는 위치이다.
+    """
+
+    __slots__ = (
+        "__node_id",
+        "__node_type",
+        "__parent_node_id",
+        "__word_tag",
+        "__sentence_tag",
+        "__semantic_tag",
+        "__org_txt_form",
+        "__pos_txt_form",
+        "__pos_units",
+        "__first_pos_tag",
+        "__last_pos_tag",
+        "__start",
+    )
+
+    RE_FIRST_POS_TAG = re.compile(r"(?<=/)[A-Z0-9_]+")
+    RE_LAST_POS_TAG = re.compile(r"(?<=[/+])[A-Z0-9_]+$")
+    RE_POS_TAGS = re.compile(r"(?<=[/+])[A-Z0-9_]+(?=[+ ]|$)")
+
     def __init__(
         self,
-        node_id,
-        node_type,
+        node_id=None,
+        node_type=None,
         parent_node_id=None,
         word_tag=None,
         sentence_tag=None,
         semantic_tag=None,
         org_txt_form=None,
         pos_txt_form=None,
+        pos_units=None,
+        start=None,
     ):
 
         self.__node_id = node_id
@@ -25,7 +58,11 @@ class NodeData:
         self.__semantic_tag = semantic_tag
 
         self.__org_txt_form = org_txt_form
-        self.__pos_txt_form = pos_txt_form
+        self.__start = start
+        if pos_txt_form is not None:
+            self.pos_txt_form = pos_txt_form
+        else:
+            self.pos_units = pos_units if pos_units is not None else ()
 
     @property
     def node_id(self):
@@ -83,42 +120,406 @@ class NodeData:
     def org_txt_form(self, value):
         self.__org_txt_form = value
 
+    @property
+    def start(self):
+        return self.__start
+
+    @start.setter
+    def start(self, value):
+        self.__start = value
+
+    @property
+    def end(self):
+        if self.__start is None:
+            return None
+        return self.__start + len(self.__org_txt_form)
+
     @property
     def pos_txt_form(self):
-        return self.__pos_txt_form
+        if self.__pos_txt_form is not None:
+            return self.__pos_txt_form
+
+        return " ".join(
+            [
+                unit.pos_txt_form if isinstance(unit, NodeData) else "/".join(unit)
+                for unit in self.__pos_units
+            ]
+        )
 
     @pos_txt_form.setter
     def pos_txt_form(self, value):
         self.__pos_txt_form = value
+        self.__pos_units = None
+
+        first = self.RE_FIRST_POS_TAG.search(value)
+        last = self.RE_LAST_POS_TAG.search(value)
+        self.__first_pos_tag = first.group() if first else None
+        self.__last_pos_tag = last.group() if last else None
+
+    @property
+    def pos_units(self):
+        return self.__pos_units
+
+    @pos_units.setter
+    def pos_units(self, value):
+        self.__pos_txt_form = None
+        self.__pos_units = tuple(value)
+
+        if len(self.__pos_units) == 0:
+            self.__first_pos_tag = None
+            self.__last_pos_tag = None
+            return
+
+        first = self.__pos_units[0]
+        last = self.__pos_units[-1]
+        self.__first_pos_tag = (
+            first.get_first_pos_tag()
+            if isinstance(first, NodeData)
+            else first[1].split("+", 1)[0]
+        )
+        self.__last_pos_tag = (
+            last.get_last_pos_tag()
+            if isinstance(last, NodeData)
+            else last[1].rsplit("+", 1)[-1]
+        )
+
+    @property
+    def pos_tags(self):
+        """
+        노드에 포함된 형태소 태그를 순서대로 담은 튜플
+        """
+        if self.__pos_units is None:
+            return tuple(self.RE_POS_TAGS.findall(self.__pos_txt_form))
+
+        tags = []
+        for unit in self.__pos_units:
+            if isinstance(unit, NodeData):
+                tags.extend(unit.pos_tags)
+            else:
+                tags.extend(unit[1].split("+"))
+        return tuple(tags)
+
+    @property
+    def first_pos_tag(self):
+        return self.__first_pos_tag
+
+    @property
+    def last_pos_tag(self):
+        return self.__last_pos_tag
 
     def get_last_pos_tag(self):
-        p = re.compile(r"(?<=[/+])[A-Z0-9_]+$")
-        return p.findall(self.pos_txt_form)[0]
+        return self.__last_pos_tag
 
     def get_first_pos_tag(self):
-        p = re.compile(r"(?<=/)[A-Z0-9_]+")
-        return p.findall(self.pos_txt_form)[0]
+        return self.__first_pos_tag
 
 
 class ParseTree:
-    ID_ROOT = "root"
+    ID_ROOT = 0
+    LABEL_ROOT = "root"
+    NO_NODE = -1
 
     def __init__(self):
-        self.g = nx.DiGraph()
-        self.root = None
+        self.clear()
 
     def clear(self):
-        self.g.clear()
+        # 노드 ID 는 배열의 인덱스이며, 노드가 다른 노드 하위로 이동해도 바뀌지 않는다
+        # 자식 노드의 순서는 형제 노드간의 연결 리스트로 유지한다
+        self._data = []
+        self._parent = []
+        self._first_child = []
+        self._last_child = []
+        self._prev_sibling = []
+        self._next_sibling = []
+        self._child_count = []
+        self._size = 0  # 삭제되지 않은 노드의 개수
         self.root = None
 
-    def add_node(self, node_id: str, node_data: NodeData):
-        # 노드 추가
-        self.g.add_node(node_id, data=node_data)
+        # 이전 API 의 문자열 노드 ID (예: root_000_001) 와 노드 ID 의 대응
+        self._ids_by_label = {}
+        self._labels = {}
+
+    def __len__(self):
+        return self._size
+
+    def add_node(self, node_data: NodeData = None, node_id: str = None):
+        """
+        노드를 부모 노드의 마지막 자식으로 추가합니다.
+
+        이전 API 처럼 add_node(node_id, node_data) 로 문자열 노드 ID 를 함께 주면 노드를 그 문자열로 다룹니다.
+        이때 parent_node_id 도 문자열 ID 여야 하고, 형제 노드는 문자열 ID 순서로 정렬되며,
+        다른 메소드에 노드 ID 대신 문자열 ID 를 넘기면 문자열 ID 로 결과를 돌려줍니다.
+
+        :param node_data: 추가할 노드 데이터, parent_node_id 가 None 이면 루트 노드
+        :param node_id: 이전 API 와 호환되는 문자열 노드 ID (기본값 None)
+        :return: 추가된 노드의 ID, 문자열 노드 ID 를 주었다면 그 문자열
+        """
+        if isinstance(node_data, str):
+            node_id, node_data = node_data, node_id
+        if node_id is not None:
+            return self._add_labeled_node(node_id, node_data)
+
+        node_id = self._new_node(node_data)
 
         # 루트 노드가 아니라면 부모 노드와 에지 추가
-        if node_data.parent_node_id:
-            self.g.add_edge(node_data.parent_node_id, node_id)
+        if node_data.parent_node_id is not None:
+            self._append_child(node_data.parent_node_id, node_id)
+        elif self.root is None:
+            self.root = node_id
+
+        return node_id
+
+    def group_nodes(self, children_node_ids, node_data: NodeData):
+        """
+        연속된 형제 노드들을 새로운 노드 하위로 옮기고, 새로운 노드를 그 자리에 추가합니다.
+        옮겨지는 노드의 개수에 비례하는 시간이 걸립니다.
+
+        :param children_node_ids: 같은 부모 아래에 연속으로 위치한 노드 ID 목록
+        :param node_data: 새로운 노드 데이터, parent_node_id 는 옮겨지는 노드들의 부모여야 함
+        :return: 새로운 노드의 ID
+        """
+        first_id = children_node_ids[0]
+        last_id = children_node_ids[-1]
+        parent_id = node_data.parent_node_id
+
+        for prev_id, next_id in zip(children_node_ids, children_node_ids[1:]):
+            if self._next_sibling[prev_id] != next_id:
+                raise ValueError("연속된 형제 노드만 묶을 수 있습니다")
+        if self._parent[first_id] != parent_id:
+            raise ValueError("묶을 노드의 부모가 일치하지 않습니다")
+
+        node_id = self._new_node(node_data)
+
+        # 새로운 노드를 기존 노드들의 자리에 연결한다
+        prev_id = self._prev_sibling[first_id]
+        next_id = self._next_sibling[last_id]
+        self._parent[node_id] = parent_id
+        self._prev_sibling[node_id] = prev_id
+        self._next_sibling[node_id] = next_id
+        if prev_id == self.NO_NODE:
+            self._first_child[parent_id] = node_id
+        else:
+            self._next_sibling[prev_id] = node_id
+        if next_id == self.NO_NODE:
+            self._last_child[parent_id] = node_id
+        else:
+            self._prev_sibling[next_id] = node_id
+
+        # 기존 노드들을 새로운 노드 하위로 이동
+        self._first_child[node_id] = first_id
+        self._last_child[node_id] = last_id
+        self._child_count[node_id] = len(children_node_ids)
+        self._child_count[parent_id] -= len(children_node_ids) - 1
+        self._prev_sibling[first_id] = self.NO_NODE
+        self._next_sibling[last_id] = self.NO_NODE
+        for child_id in children_node_ids:
+            self._parent[child_id] = node_id
+            self._data[child_id].parent_node_id = node_id
+
+        return node_id
+
+    def get_node_data_by_id(self, node_id: int):
+        return self._data[self._resolve(node_id)]
+
+    def get_children_node_ids(self, parent_node_id: int):
+        children = []
+        child_id = self._first_child[self._resolve(parent_node_id)]
+        while child_id != self.NO_NODE:
+            children.append(child_id)
+            child_id = self._next_sibling[child_id]
+
+        if isinstance(parent_node_id, str):
+            return [self._labels[child_id] for child_id in children]
+        return children
+
+    def remove_node(self, node_id: int):
+        if isinstance(node_id, str):
+            node_id = self._ids_by_label.pop(node_id)
+            del self._labels[node_id]
+        self._detach(node_id)
+
+        # 자식 노드는 남겨두고 부모와의 연결만 끊는다
+        for child_id in self.get_children_node_ids(node_id):
+            self._parent[child_id] = self.NO_NODE
+            self._prev_sibling[child_id] = self.NO_NODE
+            self._next_sibling[child_id] = self.NO_NODE
+
+        self._data[node_id] = None
+        self._size -= 1
+        self._first_child[node_id] = self.NO_NODE
+        self._last_child[node_id] = self.NO_NODE
+        self._child_count[node_id] = 0
+        if self.root == node_id:
+            self.root = None
+
+    def filter_nodes(self, func):
+        # 노드가 생성된 순서대로 순회한다
+        return filter(
+            func,
+            (
+                self._labels.get(node_id, node_id)
+                for node_id, data in enumerate(self._data)
+                if data is not None
+            ),
+        )
+
+    def is_leaf(self, node_id: int):
+        return self._first_child[self._resolve(node_id)] == self.NO_NODE
+
+    def get_node_path(self, node_id: int):
+        """
+        루트부터 노드까지 각 위계에서의 순서를 계산합니다. 노드를 문서 순서로 정렬하는 키로 사용할 수 있습니다.
+
+        :param node_id: 노드 ID
+        :return: 정수 튜플, 루트 노드는 빈 튜플
+        """
+        positions = []
+        node_id = self._resolve(node_id)
+        while self._parent[node_id] != self.NO_NODE:
+            position = 0
+            sibling_id = self._prev_sibling[node_id]
+            while sibling_id != self.NO_NODE:
+                position += 1
+                sibling_id = self._prev_sibling[sibling_id]
+            positions.append(position)
+            node_id = self._parent[node_id]
+
+        return tuple(reversed(positions))
+
+    def get_node_label(self, node_id: int):
+        """
+        출력용 노드 이름을 계산합니다. 루트부터 각 위계에서의 순서를 이어붙인 형태입니다.
+
+        :param node_id: 노드 ID
+        :return: root_000_001 형태의 문자열, 문자열 ID 로 추가한 노드는 그 문자열
+        """
+        if isinstance(node_id, str) or node_id in self._labels:
+            return self._labels[self._resolve(node_id)]
+
+        label = self.LABEL_ROOT
+        parent_id = self.root
+        for position in self.get_node_path(node_id):
+            label = self._child_label(label, position, self._child_count[parent_id])
+            parent_id = self.get_children_node_ids(parent_id)[position]
+        return label
 
+    @staticmethod
+    def _child_label(parent_label, position, sibling_count):
+        # 형제 노드가 1000개 이상이어도 문자열 순서와 노드 순서가 같도록 자릿수를 맞춘다
+        width = max(3, len(str(sibling_count - 1)))
+        return f"{parent_label}_{position:0{width}d}"
+
+    def printable_subtree(self, sub_root_node_id, debug=True, format=FORMAT_PLAIN):
+        return "".join(
+            self.iter_printable_subtree(sub_root_node_id, debug=debug, format=format)
+        )
+
+    def iter_printable_subtree(self, sub_root_node_id, debug=True, format=FORMAT_PLAIN):
+        """
+        서브트리를 출력용 문자열로 변환하여 노드마다 한 줄씩 돌려줍니다.
+        재귀 호출 없이 순회하므로 트리의 깊이와 관계없이 사용할 수 있습니다.
+
+        :param sub_root_node_id: 출력할 서브트리의 루트 노드 ID
+        :param debug: true 일 경우 문서위계, 5언 7성분 9품사 정보를 함께 출력 (기본값 true)
+        :param format: plain, html, json 중 하나 혹은 (노드 이름, 깊이, NodeData, debug) 를 받아 한 줄을 리턴하는 함수 (기본값 plain)
+        :return: 노드별 문자열 generator
+        """
+        render = format if callable(format) else _RENDERERS.get(format)
+        if render is None:
+            raise ValueError(f"지원하지 않는 출력 형식입니다: {format}")
+
+        return self._iter_printable_subtree(sub_root_node_id, render, debug)
+
+    def _iter_printable_subtree(self, sub_root_node_id, render, debug):
+        label = self.get_node_label(sub_root_node_id)
+        stack = [(self._resolve(sub_root_node_id), label, label.count("_"))]
+        while stack:
+            node_id, label, node_depth = stack.pop()
+            yield render(label, node_depth, self._data[node_id], debug)
+
+            # 첫번째 자식 노드를 먼저 출력하도록 역순으로 스택에 넣는다
+            child_count = self._child_count[node_id]
+            child_id = self._last_child[node_id]
+            idx = child_count - 1
+            while child_id != self.NO_NODE:
+                stack.append(
+                    (
+                        child_id,
+                        self._labels.get(child_id)
+                        or self._child_label(label, idx, child_count),
+                        node_depth + 1,
+                    )
+                )
+                child_id = self._prev_sibling[child_id]
+                idx -= 1
+
+    def to_networkx(self):
+        """
+        트리를 networkx.DiGraph 로 변환합니다. networkx 가 설치되어 있어야 합니다.
+
+        :return: 각 노드의 data 속성에 NodeData 가 담긴 networkx.DiGraph
+        """
+        import networkx as nx
+
+        g = nx.DiGraph()
+        for node_id in self.filter_nodes(lambda x: True):
+            g.add_node(node_id, data=self.get_node_data_by_id(node_id))
+        for node_id in self.filter_nodes(lambda x: True):
+            for child_id in self.get_children_node_ids(node_id):
+                g.add_edge(node_id, child_id)
+        return g
+
+    def _resolve(self, node_id):
+        # 이전 API 의 문자열 노드 ID 를 노드 ID 로 바꾼다
+        return self._ids_by_label[node_id] if isinstance(node_id, str) else node_id
+
+    def _add_labeled_node(self, label, node_data):
+        node_id = self._ids_by_label.get(label)
+        if node_id is None:
+            node_id = self._new_node(node_data)
+            self._ids_by_label[label] = node_id
+            self._labels[node_id] = label
+        else:
+            # 이미 있는 문자열 ID 는 노드 데이터를 바꾸고, 자식 노드는 그대로 둔다
+            self._detach(node_id)
+            node_data.node_id = node_id
+            self._data[node_id] = node_data
+            self._tag_node(node_data)
+
+        parent_label = node_data.parent_node_id
+        node_data.node_id = label
+        if not parent_label:
+            if self.root is None:
+                self.root = node_id
+            return label
+
+        # 형제 노드 중 문자열 ID 가 더 큰 첫번째 노드 앞에 넣는다
+        parent_id = self._ids_by_label[parent_label]
+        next_id = self.NO_NODE
+        sibling_id = self._last_child[parent_id]
+        while sibling_id != self.NO_NODE and self._labels[sibling_id] > label:
+            next_id = sibling_id
+            sibling_id = self._prev_sibling[sibling_id]
+        self._append_child(parent_id, node_id, next_id)
+        return label
+
+    def _new_node(self, node_data):
+        node_id = len(self._data)
+        node_data.node_id = node_id
+
+        self._data.append(node_data)
+        self._parent.append(self.NO_NODE)
+        self._first_child.append(self.NO_NODE)
+        self._last_child.append(self.NO_NODE)
+        self._prev_sibling.append(self.NO_NODE)
+        self._next_sibling.append(self.NO_NODE)
+        self._child_count.append(0)
+        self._size += 1
+
+        self._tag_node(node_data)
+        return node_id
+
+    def _tag_node(self, node_data):
         # 추가한 노드에 대한 후처리: 5언 7성분을 태깅
         if node_data.node_type in ["단어", "구"]:
             node_data.word_tag = self._compute_word_tag(node_data.get_last_pos_tag())
@@ -127,46 +528,46 @@ class ParseTree:
                 node_data.get_last_pos_tag()
             )
 
-    def get_node_data_by_id(self, node_id: str):
-        return self.g.nodes[node_id]["data"]
-
-    def get_children_node_ids(self, parent_node_id: str):
-        return sorted(self.g.adj[parent_node_id])
-
-    def remove_node(self, node_id: str):
-        self.g.remove_node(node_id)
-
-    def filter_nodes(self, func):
-        return filter(func, self.g.nodes)
-
-    def is_leaf(self, node_id: str):
-        return len(self.g.adj[node_id]) == 0
-
-    def printable_subtree(self, sub_root_node_id, debug=True):
-        node_depth = len(sub_root_node_id.split("_")) - 1
-        node_data = self.g.nodes[sub_root_node_id]["data"]
-        printable = ("\t" * node_depth) + "[" + node_data.node_id + "] "
-        if debug:
-            printable += (
-                "["
-                + node_data.node_type
-                + "] "
-                + "["
-                + (node_data.word_tag if node_data.word_tag else "")
-                + "] "
-                + "["
-                + (node_data.sentence_tag if node_data.sentence_tag else "")
-                + "] "
-                + node_data.pos_txt_form
-            )
+    def _append_child(self, parent_id, node_id, next_id=NO_NODE):
+        # next_id 가 주어지면 마지막 대신 그 형제 노드 앞에 추가한다
+        prev_id = (
+            self._last_child[parent_id]
+            if next_id == self.NO_NODE
+            else self._prev_sibling[next_id]
+        )
+        self._parent[node_id] = parent_id
+        self._prev_sibling[node_id] = prev_id
+        self._next_sibling[node_id] = next_id
+        if prev_id == self.NO_NODE:
+            self._first_child[parent_id] = node_id
         else:
-            printable += node_data.org_txt_form
-        printable += "\n"
-
-        for child_id in self.get_children_node_ids(sub_root_node_id):
-            printable += self.printable_subtree(child_id, debug=debug)
+            self._next_sibling[prev_id] = node_id
+        if next_id == self.NO_NODE:
+            self._last_child[parent_id] = node_id
+        else:
+            self._prev_sibling[next_id] = node_id
+        self._child_count[parent_id] += 1
+
+    def _detach(self, node_id):
+        parent_id = self._parent[node_id]
+        if parent_id == self.NO_NODE:
+            return
+
+        prev_id = self._prev_sibling[node_id]
+        next_id = self._next_sibling[node_id]
+        if prev_id == self.NO_NODE:
+            self._first_child[parent_id] = next_id
+        else:
+            self._next_sibling[prev_id] = next_id
+        if next_id == self.NO_NODE:
+            self._last_child[parent_id] = prev_id
+        else:
+            self._prev_sibling[next_id] = prev_id
 
-        return printable
+        self._parent[node_id] = self.NO_NODE
+        self._prev_sibling[node_id] = self.NO_NODE
+        self._next_sibling[node_id] = self.NO_NODE
+        self._child_count[parent_id] -= 1
 
     # 노드 태그 관련 유틸리티함수 시작
     @staticmethod
@@ -204,3 +605,38 @@ class ParseTree:
             sentence_tag = "독립어"
 
         return sentence_tag
+
+
+# 출력 형식별로 노드 하나를 한 줄로 변환하는 함수
+def _render_plain(label, node_depth, node_data, debug):
+    indent = "\t" * node_depth
+    if debug:
+        return (
+            f"{indent}[{label}] [{node_data.node_type}] "
+            f"[{node_data.word_tag or ''}] [{node_data.sentence_tag or ''}] "
+            f"{node_data.pos_txt_form}\n"
+        )
+    return f"{indent}[{label}] {node_data.org_txt_form}\n"
+
+
+def _render_html(label, node_depth, node_data, debug):
+    # 문서에 포함된 태그가 그대로 출력되지 않도록 이스케이프한다
+    printable = html.escape(_render_plain(label, node_depth, node_data, debug))
+    return printable.replace("\n", "<br>").replace("\t", "&nbsp;" * 4)
+
+
+def _render_json(label, node_depth, node_data, debug):
+    printable = {"label": label, "depth": node_depth, "text": node_data.org_txt_form}
+    if debug:
+        printable["node_type"] = node_data.node_type
+        printable["word_tag"] = node_data.word_tag
+        printable["sentence_tag"] = node_data.sentence_tag
+        printable["pos"] = node_data.pos_txt_form
+    return json.dumps(printable, ensure_ascii=False) + "\n"
+
+
+_RENDERERS = {
+    FORMAT_PLAIN: _render_plain,
+    FORMAT_HTML: _render_html,
+    FORMAT_JSON: _render_json,
+}
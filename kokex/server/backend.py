@@ -0,0 +1,521 @@
+import asyncio
+import multiprocessing
+import queue
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from itertools import count
+
+from kokex.core.analyzer import analyzer_class
+from kokex.core.cache import CacheEntry, ParseCache
+from kokex.core.metrics import StatsCollector, collect_stats
+from kokex.core.parser import DocumentParser
+from kokex.core.pool import WARMUP_DOCUMENT, ParserPool
+from kokex.core.preproc import preproc
+from kokex.core.tree import FORMAT_PLAIN
+
+TASK_KEYWORDS = "keywords"
+TASK_SENTENCES = "sentences"
+TASK_PARSE = "parse"
+TASK_PARSE_STREAM = "parse_stream"
+TASK_ANALYZE = "analyze"
+
+# 파싱 결과를 나누어 보낼 때 한 조각의 최소 크기 (문자 수)
+PARSE_CHUNK_SIZE = 64 * 1024
+
+
+class BackendOverloaded(Exception):
+    """
+    대기열이 가득 차서 분석 요청을 받을 수 없을 때 발생하는 예외
+    """
+
+
+class ParserBackend:
+    """
+    서버의 분석 요청을 워커 프로세스에 나누어 처리하는 백엔드
+
+    각 워커 프로세스는 미리 적재된 파서를 보유하고, 동시에 들어온 요청들은 모아서 (micro-batch)
+    한번에 워커로 보낸다. 여러 조각으로 나눈 요청의 조각들은 서로 다른 배치로 보내 동시에 분석한다. 대기열이 가득 차면 BackendOverloaded 를 발생시켜 요청을 거절한다.
+    캐시를 지정하면 서버 프로세스에서 캐시를 확인하고, 캐시에 없는 문서만 워커로 보낸다.
+    """
+
+    def __init__(
+        self,
+        workers=1,
+        max_batch_size=8,
+        max_batch_delay=0.002,
+        max_queue_size=256,
+        cache=None,
+    ):
+        """
+        :param workers: 워커 프로세스의 개수, 0 이면 서버 프로세스의 스레드에서 분석 (기본값 1)
+        :param max_batch_size: 한번에 워커로 보내는 요청의 최대 개수 (기본값 8)
+        :param max_batch_delay: 배치를 채우기 위해 기다리는 최대 시간(초) (기본값 0.002)
+        :param max_queue_size: 처리를 기다릴 수 있는 요청의 최대 개수 (기본값 256)
+        :param cache: 문서별 키워드와 문장을 재사용할 ParseCache 혹은 DiskCache (기본값 None)
+        """
+        if workers < 0:
+            raise ValueError("workers 는 0 이상이어야 합니다")
+        if max_batch_size < 1 or max_queue_size < 1:
+            raise ValueError("max_batch_size, max_queue_size 는 1 이상이어야 합니다")
+
+        self._workers = workers
+        self._max_batch_size = max_batch_size
+        self._max_batch_delay = max_batch_delay
+        self._max_queue_size = max_queue_size
+        self.cache = cache
+        self.metrics = StatsCollector()  # 워커에서 분석한 문서의 단계별 통계
+
+        self._executor = None
+        self._run_batch = None
+        self._chunks = None  # 워커가 파싱 결과를 조각마다 보내는 큐
+        self._streams = {}  # 스트림 ID -> (이벤트 루프, 조각을 받을 asyncio.Queue)
+        self._stream_ids = count()
+        self._pending = set()  # 워커로 보냈지만 끝나지 않은 배치 작업
+        self._loop = None
+        self._queue = None
+        self._deferred = None  # 다음 배치로 넘긴 대기열 항목
+        self._slots = None
+        self._batcher = None
+
+    @property
+    def concurrency(self):
+        """
+        동시에 처리하는 배치의 개수
+        """
+        return max(self._workers, 1)
+
+    async def start(self):
+        """
+        워커를 생성하고 각 워커의 파서를 미리 적재해둡니다.
+        워커 프로세스는 initializer 에서 파서를 적재하므로, 모든 워커 프로세스가 생성될 때까지 기다립니다.
+
+        :return: void
+        """
+        self._bind_loop()
+        if self._workers == 0:
+            await self._loop.run_in_executor(self._executor, self._run_batch, [])
+            return
+
+        # 각 작업은 모든 워커가 작업을 받을 때까지 끝나지 않으므로, 워커 수만큼의 프로세스가 생성된다
+        await asyncio.gather(
+            *[
+                self._loop.run_in_executor(self._executor, _wait_for_workers)
+                for _ in range(self._workers)
+            ]
+        )
+
+    def stop(self):
+        """
+        대기 중인 배치 작업을 멈추고 워커를 종료합니다.
+
+        :return: void
+        """
+        if self._batcher is not None:
+            self._batcher.cancel()
+        if self._executor is not None:
+            # Executor.shutdown 의 cancel_futures 는 python 3.9 부터 지원하므로 직접 취소한다
+            for future in list(self._pending):
+                future.cancel()
+            self._executor.shutdown(wait=False)
+            self._chunks.put(None)
+
+        self._executor = None
+        self._chunks = None
+        self._loop = None
+
+    async def keywords(self, docs):
+        """
+        문서 목록의 키워드 빈도를 집계합니다. 문서가 많으면 워커 수만큼 나누어 동시에 분석합니다.
+
+        :param docs: 문서 목록
+        :return: 키워드와 빈도가 담긴 딕셔너리
+        """
+        result = defaultdict(int)
+
+        # 문서 순서대로 병합하므로 결과는 kokex.keywords 와 동일하다
+        if self.cache is not None:
+            for analyzed in await self._analyze_all(docs):
+                for word in analyzed["keywords"]:
+                    result[word] += 1
+            return dict(result)
+
+        for counts in await self._submit(TASK_KEYWORDS, self._split(docs) or [[]]):
+            for word, count in counts.items():
+                result[word] += count
+
+        return dict(result)
+
+    async def sentences(self, doc):
+        """
+        :param doc: 문서
+        :return: 문장으로 분리한 리스트
+        """
+        if self.cache is not None:
+            result = await self._analyze_all([doc])
+            return result[0]["sentences"]
+
+        result = await self._submit(TASK_SENTENCES, [doc])
+        return result[0]
+
+    async def parse(self, doc, debug=True, format=FORMAT_PLAIN):
+        """
+        :param doc: 문서
+        :param debug: true 일 경우 문서위계, 5언 7성분 9품사 정보를 함께 출력 (기본값 true)
+        :param format: 출력 형식 plain, html, json 중 하나 (기본값 plain)
+        :return: 출력을 위해 들여쓰기가 된 문자열
+        """
+        result = await self._submit(TASK_PARSE, [(doc, debug, format)])
+        return result[0]
+
+    async def parse_stream(
+        self, doc, debug=True, format=FORMAT_PLAIN, chunk_size=PARSE_CHUNK_SIZE
+    ):
+        """
+        파싱 결과를 워커가 만드는 대로 조각씩 돌려줍니다.
+        워커는 노드마다 한 줄씩 만든 출력 문자열을 chunk_size 이상 모일 때마다 서버 프로세스로 보냅니다.
+
+        :param doc: 문서
+        :param debug: true 일 경우 문서위계, 5언 7성분 9품사 정보를 함께 출력 (기본값 true)
+        :param format: 출력 형식 plain, html, json 중 하나 (기본값 plain)
+        :param chunk_size: 한 조각의 최소 크기 (문자 수, 기본값 PARSE_CHUNK_SIZE)
+        :return: 이어붙이면 parse 의 결과가 되는 문자열 async generator
+        """
+        self._bind_loop()
+        stream_id = next(self._stream_ids)
+        chunks = asyncio.Queue()
+        self._streams[stream_id] = (self._loop, chunks)
+        task = asyncio.ensure_future(
+            self._submit(
+                TASK_PARSE_STREAM, [(stream_id, doc, debug, format, chunk_size)]
+            )
+        )
+
+        try:
+            while True:
+                chunk = await self._next_chunk(chunks, task)
+                if chunk is None:
+                    break
+                yield chunk
+
+            # 워커에서 발생한 오류는 마지막 조각 뒤에 발생시킨다
+            await task
+        finally:
+            # 연결이 끊겨 중단되면 워커가 이후에 보내는 조각은 버려진다
+            del self._streams[stream_id]
+            task.cancel()
+
+    async def _next_chunk(self, chunks, task):
+        get = asyncio.ensure_future(chunks.get())
+        done, _ = await asyncio.wait({get, task}, return_when=asyncio.FIRST_COMPLETED)
+        if get in done:
+            return get.result()
+
+        # 작업이 실패했다면 오류를 발생시키고, 성공했다면 마지막 조각까지 기다린다
+        # (조각과 작업의 결과는 서로 다른 경로로 오므로 결과가 먼저 도착할 수 있다)
+        get.cancel()
+        task.result()
+        return await chunks.get()
+
+    async def analyze(self, doc, wait=False):
+        """
+        문서를 한번 분석하여 키워드와 문장을 함께 리턴합니다.
+
+        :param doc: 문서
+        :param wait: true 일 경우 대기열이 가득 차면 거절하지 않고 자리가 날 때까지 기다림 (기본값 false)
+        :return: {'keywords': 키워드 목록, 'sentences': 문장 목록} 딕셔너리
+        """
+        result = await self._analyze_all([doc], wait=wait)
+        return result[0]
+
+    async def _analyze_all(self, docs, wait=False):
+        results = [None] * len(docs)
+        keys = [None] * len(docs)
+        missing = []
+
+        for idx, doc in enumerate(docs):
+            if self.cache is not None:
+                keys[idx] = ParseCache.key(preproc(doc), analyzer=analyzer_class())
+                entry = self.cache.get(keys[idx])
+                if entry is not None:
+                    results[idx] = {
+                        "keywords": list(entry.keywords),
+                        "sentences": list(entry.sentences),
+                    }
+                    continue
+            missing.append(idx)
+
+        # 캐시에 없는 문서만 워커 수만큼 나누어 분석한다
+        if missing:
+            chunks = self._split([docs[idx] for idx in missing])
+            analyzed = [
+                result
+                for chunk in await self._submit(TASK_ANALYZE, chunks, wait=wait)
+                for result in chunk
+            ]
+            for idx, result in zip(missing, analyzed):
+                results[idx] = result
+                if self.cache is not None:
+                    self.cache.put(
+                        keys[idx], CacheEntry(result["keywords"], result["sentences"])
+                    )
+
+        return results
+
+    def _split(self, docs):
+        size = -(-len(docs) // self.concurrency) or 1
+        return [docs[idx : idx + size] for idx in range(0, len(docs), size)]
+
+    async def _submit(self, kind, payloads, wait=False):
+        self._bind_loop()
+
+        # 요청의 일부만 대기열에 들어가지 않도록 남은 자리를 먼저 확인한다
+        waiting = self._queue.qsize() + len(self._deferred)
+        if not wait and self._queue.maxsize - waiting < len(payloads):
+            raise BackendOverloaded("분석 대기열이 가득 찼습니다")
+
+        request = object()  # 같은 요청의 조각을 구분하는 표시
+        futures = []
+        for payload in payloads:
+            future = self._loop.create_future()
+            await self._queue.put((kind, payload, future, request))
+            futures.append(future)
+
+        return await asyncio.gather(*futures)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        if self._executor is None:
+            self._create_executor()
+
+        # 대기열과 배치 작업은 실행 중인 이벤트 루프에 묶인다
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self._max_queue_size)
+        self._deferred = deque()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._batcher = loop.create_task(self._batch_loop())
+
+    def _create_executor(self):
+        if self._chunks is not None:
+            self._chunks.put(None)
+
+        if self._workers == 0:
+            self._chunks = queue.SimpleQueue()
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._run_batch = partial(
+                _run_batch_in_pool, ParserPool(size=1), self._chunks
+            )
+        else:
+            self._chunks = multiprocessing.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                initializer=_init_worker,
+                initargs=(self._chunks, multiprocessing.Barrier(self._workers)),
+            )
+            self._run_batch = _run_batch
+
+        threading.Thread(
+            target=self._receive_chunks, args=(self._chunks,), daemon=True
+        ).start()
+
+    def _receive_chunks(self, chunks):
+        # 워커가 보낸 조각을 스트림별 asyncio.Queue 로 옮긴다, None 을 받으면 종료한다
+        while True:
+            item = chunks.get()
+            if item is None:
+                return
+
+            stream_id, chunk = item
+            stream = self._streams.get(stream_id)
+            if stream is None:
+                continue
+
+            loop, stream_chunks = stream
+            try:
+                loop.call_soon_threadsafe(stream_chunks.put_nowait, chunk)
+            except RuntimeError:
+                # 스트림을 기다리던 이벤트 루프가 이미 닫혔다
+                continue
+
+    async def _batch_loop(self):
+        while True:
+            # 모든 워커가 바쁜 동안 들어온 요청은 대기열에 쌓였다가 다음 배치로 묶인다
+            await self._slots.acquire()
+
+            batch = [await self._next_item()]
+            requests = {batch[0][3]}
+            deadline = self._loop.time() + self._max_batch_delay
+            while len(batch) < self._max_batch_size:
+                if self._deferred or not self._queue.empty():
+                    item = await self._next_item()
+                else:
+                    timeout = deadline - self._loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                # 같은 요청의 다른 조각은 다른 워커에서 동시에 분석되도록 다음 배치로 넘긴다
+                if item[3] in requests:
+                    self._deferred.appendleft(item)
+                    break
+                batch.append(item)
+                requests.add(item[3])
+
+            self._loop.create_task(self._dispatch(batch))
+
+    async def _next_item(self):
+        # 다음 배치로 넘긴 항목을 대기열보다 먼저 꺼낸다
+        if self._deferred:
+            return self._deferred.popleft()
+        return await self._queue.get()
+
+    async def _dispatch(self, batch):
+        # 응답을 기다리지 않는 (연결이 끊긴) 요청은 분석하지 않는다
+        batch = [item for item in batch if not item[2].done()]
+        if not batch:
+            self._slots.release()
+            return
+
+        executor = self._executor
+        try:
+            task = executor.submit(
+                self._run_batch, [(kind, payload) for kind, payload, _, _ in batch]
+            )
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            results, stats = await asyncio.wrap_future(task)
+            self.metrics.merge(stats)
+        except Exception as e:
+            # 워커 프로세스가 비정상 종료되면 남은 워커를 정리하고 다음 요청을 위해 워커를 다시 생성한다
+            # 같은 executor 의 다른 배치도 실패하므로 한번만 다시 생성한다
+            if isinstance(e, BrokenProcessPool) and executor is self._executor:
+                executor.shutdown(wait=False)
+                self._create_executor()
+            results = [(False, e)] * len(batch)
+        finally:
+            self._slots.release()
+
+        for (_, _, future, _), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+##### 워커에서 실행되는 함수 시작
+# 각 워커 프로세스가 보유하는 파서, 파싱 결과의 조각을 보낼 큐, 모든 워커의 생성을 기다리는 barrier
+_worker_parser = None
+_worker_chunks = None
+_worker_barrier = None
+
+
+def _init_worker(chunks, barrier):
+    global _worker_parser, _worker_chunks, _worker_barrier
+    _worker_parser = DocumentParser()
+    _worker_parser.parse(document=WARMUP_DOCUMENT)
+    _worker_chunks = chunks
+    _worker_barrier = barrier
+
+
+def _wait_for_workers():
+    _worker_barrier.wait()
+
+
+def _run_batch(tasks):
+    return _run_tasks(_worker_parser, tasks, _worker_chunks)
+
+
+def _run_batch_in_pool(pool, chunks, tasks):
+    with pool.parser() as parser:
+        if not tasks:
+            parser.parse(document=WARMUP_DOCUMENT)
+        return _run_tasks(parser, tasks, chunks)
+
+
+def _run_tasks(parser, tasks, chunks):
+    # 하나의 요청이 실패해도 같은 배치의 다른 요청에는 영향을 주지 않는다
+    # 배치에서 분석한 문서의 통계는 결과와 함께 서버 프로세스로 보내 합친다
+    results = []
+    with collect_stats() as stats:
+        for kind, payload in tasks:
+            try:
+                if kind == TASK_PARSE_STREAM:
+                    results.append(
+                        (True, _send_printable_tree(parser, payload, chunks))
+                    )
+                else:
+                    results.append((True, _TASKS[kind](parser, payload)))
+            except Exception as e:
+                results.append((False, e))
+
+    return results, stats
+
+
+def _count_keywords(parser, docs):
+    counts = defaultdict(int)
+    for doc in docs:
+        parser.parse(document=doc, build_tree=False)
+
+        for word in parser.keywords():
+            counts[word] += 1
+
+    return dict(counts)
+
+
+def _split_sentences(parser, doc):
+    parser.parse(document=doc, build_tree=False, eager_phrase=False)
+    return parser.sentences()
+
+
+def _printable_tree(parser, payload):
+    doc, debug, format = payload
+    parser.parse(document=doc)
+    return parser.printable_tree(debug=debug, format=format)
+
+
+def _send_printable_tree(parser, payload, chunks):
+    # 노드마다 한 줄씩 만든 문자열을 chunk_size 이상 모일 때마다 보내고, 마지막에 None 을 보낸다
+    stream_id, doc, debug, format, chunk_size = payload
+    try:
+        parser.parse(document=doc)
+
+        lines = []
+        size = 0
+        for line in parser.iter_printable_tree(debug=debug, format=format):
+            lines.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                chunks.put((stream_id, "".join(lines)))
+                lines = []
+                size = 0
+        if lines:
+            chunks.put((stream_id, "".join(lines)))
+    finally:
+        chunks.put((stream_id, None))
+
+
+def _analyze_documents(parser, docs):
+    result = []
+    for doc in docs:
+        parser.parse(document=doc, build_tree=False)
+        result.append({"keywords": parser.keywords(), "sentences": parser.sentences()})
+
+    return result
+
+
+_TASKS = {
+    TASK_KEYWORDS: _count_keywords,
+    TASK_SENTENCES: _split_sentences,
+    TASK_PARSE: _printable_tree,
+    TASK_ANALYZE: _analyze_documents,
+}
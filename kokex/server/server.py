@@ -1,22 +1,89 @@
+import asyncio
+import json
 import sys
-from os import environ, path
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from os import cpu_count, environ, path
 from typing import Dict, List, Optional
 
 import uvicorn
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Form, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
+from starlette.requests import ClientDisconnect
 
 sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
 SERVER_PORT = int(environ.get("SERVER_PORT", 8081))
+WORKERS = int(environ.get("KOKEX_WORKERS", cpu_count() or 1))
+MAX_BATCH_SIZE = int(environ.get("KOKEX_MAX_BATCH_SIZE", 8))
+MAX_BATCH_DELAY_MS = float(environ.get("KOKEX_MAX_BATCH_DELAY_MS", 2))
+MAX_QUEUE_SIZE = int(environ.get("KOKEX_MAX_QUEUE_SIZE", 256))
+CACHE_SIZE = int(environ.get("KOKEX_CACHE_SIZE", 0))
+CACHE_BYTES = int(environ.get("KOKEX_CACHE_BYTES", 0))
+CACHE_PATH = environ.get("KOKEX_CACHE_PATH")
 
-import kokex
+from kokex.core.cache import DiskCache, ParseCache
+from kokex.core.reader import FORMAT_JSONL, FORMAT_LINES, read_document
+from kokex.core.tree import FORMAT_HTML, FORMAT_JSON, FORMAT_PLAIN
+from kokex.server.backend import BackendOverloaded, ParserBackend
 
-app = FastAPI()
+PARSE_MEDIA_TYPES = {
+    FORMAT_PLAIN: "text/plain; charset=utf-8",
+    FORMAT_HTML: "text/html; charset=utf-8",
+    FORMAT_JSON: "application/x-ndjson",
+}
+
+
+def _create_cache():
+    # KOKEX_CACHE_PATH 를 지정하면 재시작 후에도 유지되는 캐시를 사용한다
+    if CACHE_PATH:
+        return DiskCache(CACHE_PATH)
+    if CACHE_SIZE or CACHE_BYTES:
+        return ParseCache(max_entries=CACHE_SIZE or None, max_bytes=CACHE_BYTES or None)
+    return None
+
+
+backend = ParserBackend(
+    workers=WORKERS,
+    max_batch_size=MAX_BATCH_SIZE,
+    max_batch_delay=MAX_BATCH_DELAY_MS / 1000,
+    max_queue_size=MAX_QUEUE_SIZE,
+    cache=_create_cache(),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 첫 요청이 Mecab 사전 적재를 기다리지 않도록 워커의 파서를 미리 적재한다
+    await backend.start()
+    yield
+    backend.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="template")
 
 
+@app.exception_handler(BackendOverloaded)
+async def overloaded(request: Request, exc: BackendOverloaded):
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+    )
+
+
+@app.get("/cache")
+async def cache():
+    # 캐시를 사용하지 않으면 빈 객체를 돌려준다
+    return JSONResponse(content=backend.cache.stats() if backend.cache else {})
+
+
+@app.get("/metrics")
+async def metrics():
+    # 워커에서 분석한 문서의 단계별 수행 시간 히스토그램과 평균 노드 수
+    return JSONResponse(content=backend.metrics.to_dict())
+
+
 class KEXRequestKeywords(BaseModel):
     docs: List[str]
 
@@ -26,11 +93,112 @@ class KEXResponseKeywords(BaseModel):
 
 
 @app.post("/keywords", response_model=KEXResponseKeywords)
-def keywords(kex_request: KEXRequestKeywords):
-    result = kokex.keywords(kex_request.docs)
+async def keywords(kex_request: KEXRequestKeywords):
+    result = await backend.keywords(kex_request.docs)
     return JSONResponse(content=result)
 
 
+class NDJSONResponse(StreamingResponse):
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        # 응답을 보내는 동안에도 요청 본문을 읽어야 하므로, 연결 종료를 감시하는 receive 호출을 하지 않는다
+        # 연결 종료는 _stream_documents 에서 본문을 읽을 때, 본문을 다 읽은 뒤에는 결과를 보낼 때마다 확인한다
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/keywords/stream", response_class=NDJSONResponse)
+async def keywords_stream(
+    request: Request,
+    aggregate: bool = False,
+    text_field: str = "doc",
+    format: str = FORMAT_JSONL,
+):
+    """
+    한 줄에 한 문서씩 (NDJSON) 입력받아, 분석이 끝나는 대로 문서별 키워드와 문장을 한 줄씩 돌려줍니다.
+    aggregate 가 true 이면 마지막 줄에 전체 키워드 빈도를 돌려줍니다.
+    """
+    if format not in (FORMAT_JSONL, FORMAT_LINES):
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 형식입니다: {format}")
+
+    return NDJSONResponse(_stream_documents(request, aggregate, text_field, format))
+
+
+async def _stream_documents(request, aggregate, text_field, format):
+    counts = defaultdict(int)
+    pending = deque()
+    window = backend.concurrency * 2  # 진행 중인 문서 수를 제한하여 메모리 사용량을 일정하게 유지한다
+    index = 0
+
+    async def records(limit, body_consumed=False):
+        # 진행 중인 문서가 limit 개 이하가 될 때까지 입력 순서대로 결과를 돌려준다
+        # 본문을 읽는 중에 receive 를 호출하면 본문 조각을 잃으므로, 연결 종료는 본문을 다 읽은 뒤에만 확인한다
+        nonlocal index
+        while len(pending) > limit:
+            if body_consumed and await request.is_disconnected():
+                raise ClientDisconnect()
+
+            result = await pending.popleft()
+            if result is None:
+                continue
+
+            for word in result.get("keywords", []):
+                counts[word] += 1
+
+            yield json.dumps({"index": index, **result}, ensure_ascii=False) + "\n"
+            index += 1
+
+    try:
+        async for line in _iter_lines(request):
+            pending.append(
+                asyncio.ensure_future(_analyze_line(line, text_field, format))
+            )
+            async for record in records(window - 1):
+                yield record
+
+        async for record in records(0, body_consumed=True):
+            yield record
+    except ClientDisconnect:
+        # 연결이 끊기면 남은 문서는 분석하지 않는다
+        return
+    finally:
+        for future in pending:
+            future.cancel()
+
+    if aggregate:
+        yield json.dumps({"aggregate": dict(counts)}, ensure_ascii=False) + "\n"
+
+
+async def _analyze_line(line, text_field, format):
+    # 문서 하나의 오류로 전체 스트림이 중단되지 않도록 오류는 해당 문서의 결과로 돌려준다
+    try:
+        doc = read_document(line, format=format, text_field=text_field)
+        if doc is None:
+            return None
+        return await backend.analyze(doc, wait=True)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+async def _iter_lines(request):
+    # 새로 받은 조각만 나누고, 줄이 끝나지 않은 조각들은 모아두었다가 한번에 합친다
+    rest = []
+    async for chunk in request.stream():
+        *lines, tail = chunk.split(b"\n")
+        if lines:
+            lines[0] = b"".join(rest + [lines[0]])
+            rest = []
+            for line in lines:
+                yield line
+        if tail:
+            rest.append(tail)
+
+    if rest:
+        yield b"".join(rest)
+
+
 class KEXRequestSentences(BaseModel):
     doc: str
 
@@ -40,25 +208,51 @@ class KEXResponseSentences(BaseModel):
 
 
 @app.post("/sentences", response_model=KEXResponseSentences)
-def sentences(kex_request: KEXRequestSentences):
-    result = kokex.sentences(kex_request.doc)
+async def sentences(kex_request: KEXRequestSentences):
+    result = await backend.sentences(kex_request.doc)
     return JSONResponse(content=result)
 
 
 @app.get("/parse", response_class=HTMLResponse)
-def parse(request: Request):
+async def parse(request: Request):
     return templates.TemplateResponse("parse.html", {"request": request, "result": ""})
 
 
 @app.post("/parse", response_class=HTMLResponse)
-def parse(request: Request, doc: str = Form(...)):
-    result = kokex.parse(doc, debug=True)
-    result = result.replace("\n", "<br>")
-    result = result.replace("\t", "&nbsp;" * 4)
+async def parse(request: Request, doc: str = Form(...)):
+    result = await backend.parse(doc, debug=True, format=FORMAT_HTML)
     return templates.TemplateResponse(
         "parse.html", {"request": request, "doc": doc, "result": result}
     )
 
 
+class KEXRequestParse(BaseModel):
+    doc: str
+
+
+@app.post("/parse/stream")
+async def parse_stream(
+    kex_request: KEXRequestParse, debug: bool = True, format: str = FORMAT_PLAIN
+):
+    """
+    파싱 결과를 워커가 만드는 대로 나누어 돌려줍니다. format 이 json 이면 한 줄에 노드 하나씩 (NDJSON) 돌려줍니다.
+    """
+    if format not in PARSE_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 형식입니다: {format}")
+
+    # 첫 조각을 받기 전에 발생한 오류 (대기열 초과 등) 는 오류 응답으로 돌려준다
+    chunks = backend.parse_stream(kex_request.doc, debug=debug, format=format)
+    first = await chunks.__anext__()
+    return StreamingResponse(
+        _prepend(first, chunks), media_type=PARSE_MEDIA_TYPES[format]
+    )
+
+
+async def _prepend(first, chunks):
+    yield first
+    async for chunk in chunks:
+        yield chunk
+
+
 if __name__ == "__main__":
     uvicorn.run("server:app", reload=True, host="0.0.0.0", port=SERVER_PORT)
@@ -32,8 +32,11 @@ setuptools.setup(
     python_requires=">=3.7",
     install_requires=[
         "konlpy>=0.5.2",
-        "networkx>=2.5.1",
+        "mecab-python3>=1.0.3",
     ],
+    extras_require={
+        "networkx": ["networkx>=2.5.1"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -1,7 +1,22 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
 from fastapi.testclient import TestClient
 
 import kokex
+from kokex import api
+from kokex.core.analyzer import FakeAnalyzer
+from kokex.core.metrics import StatsCollector
+from kokex.core.parser import DocumentParser
+from kokex.core.pool import DEFAULT_POOL_SIZE, ParserPool, default_pool_size
+from kokex.core.preproc import preproc
 from kokex.server import server
+from kokex.server.backend import BackendOverloaded, ParserBackend
 
 client = TestClient(server.app)
 
@@ -32,3 +47,377 @@ def check_results(input_documents, expected_results):
     response = client.post("/keywords", json={"docs": input_documents})
     assert response.status_code == 200
     assert response.json() == expected_results
+
+
+def test_keywords_pool():
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "새로운 테스트 문장을 일련번호와 함께 메소드로 추가합니다.",
+    ]
+    expected_results = kokex.keywords(input_documents)
+
+    # 프로세스 전체에서 공유하는 풀의 크기는 다른 테스트를 위해 되돌려둔다
+    original_size = api._pool.size
+    try:
+        kokex.warmup(pool_size=2)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(kokex.keywords, [input_documents] * 8))
+    finally:
+        api._pool.resize(original_size)
+
+    assert all(result == expected_results for result in results)
+
+
+def test_keywords_pool_size(monkeypatch):
+    # 풀 크기의 기본값은 환경변수 KOKEX_POOL_SIZE 에서 읽는다
+    assert ParserPool().size == DEFAULT_POOL_SIZE
+    monkeypatch.setenv("KOKEX_POOL_SIZE", "2")
+    assert ParserPool().size == default_pool_size() == 2
+    assert ParserPool(size=1).size == 1
+
+
+def test_keywords_server_concurrent():
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "새로운 테스트 문장을 일련번호와 함께 메소드로 추가합니다.",
+    ]
+    expected_results = kokex.keywords(input_documents)
+
+    with TestClient(server.app) as server_client:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(
+                executor.map(
+                    lambda docs: server_client.post("/keywords", json={"docs": docs}),
+                    [input_documents] * 8,
+                )
+            )
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json() == expected_results for response in responses)
+
+
+def test_keywords_backpressure():
+    backend = ParserBackend(workers=0, max_queue_size=1)
+
+    async def submit_all():
+        return await asyncio.gather(
+            *[backend.keywords(["첫 번째 문서입니다."]) for _ in range(3)],
+            return_exceptions=True,
+        )
+
+    try:
+        results = asyncio.run(submit_all())
+    finally:
+        backend.stop()
+
+    assert results[0] == {"첫 번째": 1, "문서": 1}
+    assert all(isinstance(result, BackendOverloaded) for result in results[1:])
+
+
+def test_keywords_workers():
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "두 번째 문서입니다. 여러 문서를 포함할 수 있습니다.",
+        "새로운 테스트 문장을 일련번호와 함께 메소드로 추가합니다.",
+    ] * 5
+    expected_results = kokex.keywords(input_documents)
+
+    for workers in [2, 3]:
+        keywords = kokex.keywords(input_documents, workers=workers, chunk_size=2)
+        assert keywords == expected_results
+        assert list(keywords) == list(expected_results)
+
+
+def _pid_batch(tasks):
+    # 배치를 처리한 워커 프로세스를 키워드 대신 돌려준다
+    time.sleep(0.2)
+    return [(True, {str(os.getpid()): 1}) for _ in tasks], StatsCollector()
+
+
+def test_keywords_backend_fan_out():
+    backend = ParserBackend(workers=2)
+
+    async def submit():
+        # 시작할 때 모든 워커 프로세스가 생성되어 파서를 적재한다
+        await backend.start()
+        assert len(backend._executor._processes) == 2
+
+        backend._run_batch = _pid_batch
+        return await backend.keywords(["첫 번째 문서입니다."] * 8)
+
+    try:
+        pids = asyncio.run(submit())
+    finally:
+        backend.stop()
+
+    # 한 요청의 조각들은 각각 다른 배치로 나뉘어 두 워커에서 동시에 분석된다
+    assert sum(pids.values()) == 2
+    assert len(pids) == 2
+
+
+def _exit_batch(tasks):
+    os._exit(1)
+
+
+def test_keywords_backend_broken_worker():
+    backend = ParserBackend(workers=1)
+    calls = []
+
+    async def submit():
+        await backend.start()
+        executor = backend._executor
+        shutdown = executor.shutdown
+        executor.shutdown = lambda wait=True: calls.append(wait) or shutdown(wait)
+        backend._run_batch = _exit_batch
+        with pytest.raises(BrokenProcessPool):
+            await backend.keywords(["첫 번째 문서입니다."])
+
+        # 워커가 비정상 종료되면 이전 executor 를 종료하고 새로운 워커로 다음 요청을 처리한다
+        assert backend._executor is not executor
+        assert calls == [False]
+        return await backend.keywords(["첫 번째 문서입니다."])
+
+    try:
+        assert asyncio.run(submit()) == {"첫 번째": 1, "문서": 1}
+    finally:
+        backend.stop()
+
+
+def test_keywords_streaming(tmp_path):
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "두 번째 문서입니다. 여러 문서를 포함할 수 있습니다.",
+    ]
+    expected_results = {"첫 번째": 1, "두 번째": 1, "문서": 3, "문장": 1, "포함": 2}
+
+    iterator = kokex.iter_keywords(iter(input_documents))
+    assert next(iterator) == ["첫 번째", "문서", "문장", "포함"]
+    assert next(iterator) == ["두 번째", "문서", "문서", "포함"]
+
+    lines_path = tmp_path / "docs.txt"
+    lines_path.write_text("\n".join(input_documents) + "\n", encoding="utf-8")
+    assert kokex.count_keywords(lines_path) == expected_results
+
+    jsonl_path = tmp_path / "docs.jsonl"
+    jsonl_path.write_text(
+        "\n".join([json.dumps({"doc": doc}) for doc in input_documents]),
+        encoding="utf-8",
+    )
+    with open(jsonl_path, encoding="utf-8") as f:
+        assert kokex.count_keywords(f) == expected_results
+    assert list(kokex.iter_keywords(str(jsonl_path), workers=2)) == list(
+        kokex.iter_keywords(input_documents)
+    )
+
+
+def test_keywords_server_stream():
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "두 번째 문서입니다. 여러 문서를 포함할 수 있습니다.",
+    ] * 3
+    body = "\n".join(
+        [json.dumps({"doc": doc}, ensure_ascii=False) for doc in input_documents]
+        + ["", '{"text": "필드가 없는 문서"}']
+    )
+
+    response = client.post(
+        "/keywords/stream", params={"aggregate": "true"}, content=body.encode("utf-8")
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["index"] for record in records[:-1]] == list(range(7))
+    for record, doc in zip(records, input_documents):
+        assert record["keywords"] == next(kokex.iter_keywords([doc]))
+        assert record["sentences"] == kokex.sentences(doc)
+    assert "error" in records[6]
+    assert records[-1] == {"aggregate": kokex.keywords(input_documents)}
+
+
+def test_keywords_server_stream_disconnect():
+    input_documents = ["첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다."] * (
+        server.backend.concurrency * 2 + 4
+    )
+    body = "\n".join(json.dumps({"doc": doc}) for doc in input_documents)
+    # 한 줄을 여러 조각으로 나누어 보낸다
+    chunks = [body[idx : idx + 7].encode("utf-8") for idx in range(0, len(body), 7)]
+
+    async def call():
+        messages = [
+            {"type": "http.request", "body": chunk, "more_body": True}
+            for chunk in chunks
+        ] + [{"type": "http.request", "body": b"", "more_body": False}]
+        sent = []
+
+        async def receive():
+            # 본문을 다 보낸 뒤에는 연결이 끊긴 것으로 응답한다
+            if messages:
+                return messages.pop(0)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "POST",
+            "path": "/keywords/stream",
+            "raw_path": b"/keywords/stream",
+            "root_path": "",
+            "scheme": "http",
+            "query_string": b"aggregate=true",
+            "headers": [(b"content-type", b"application/x-ndjson")],
+            "client": ("test", 0),
+            "server": ("test", 80),
+        }
+        await server.app(scope, receive, send)
+        return sent
+
+    sent = asyncio.run(call())
+    lines = b"".join(message.get("body", b"") for message in sent[1:]).splitlines()
+
+    # 본문을 다 읽은 뒤 연결이 끊겼으므로 남은 문서의 결과와 집계는 보내지 않는다
+    assert sent[0]["status"] == 200
+    assert 0 < len(lines) < len(input_documents)
+    assert all("aggregate" not in json.loads(line) for line in lines)
+
+
+def test_keywords_cache():
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "두 번째 문서입니다. 여러 문서를 포함할 수 있습니다.",
+    ]
+    expected_results = kokex.keywords(input_documents * 2)
+
+    cache = kokex.ParseCache(max_entries=2)
+    assert kokex.keywords(input_documents * 2, cache=cache) == expected_results
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+    # 전처리 결과가 같은 문서는 같은 결과를 재사용한다
+    html_document = "<b>첫 번째 문서입니다.</b> 여러 문장을 포함할 수 있습니다."
+    assert kokex.keywords([html_document], cache=cache) == kokex.keywords(
+        input_documents[:1]
+    )
+    assert cache.stats()["hits"] == 3
+
+    kokex.keywords(["새로운 테스트 문장을 일련번호와 함께 메소드로 추가합니다."], cache=cache)
+    assert len(cache) == 2 and cache.stats()["evictions"] == 1
+
+
+def test_keywords_disk_cache(tmp_path):
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "두 번째 문서입니다. 여러 문서를 포함할 수 있습니다.",
+    ]
+    expected_results = kokex.keywords(input_documents)
+
+    cache = kokex.DiskCache(tmp_path / "kokex.db")
+    assert kokex.keywords(input_documents, cache=cache) == expected_results
+    assert cache.stats()["misses"] == 2 and cache.stats()["morph_misses"] == 2
+    cache.close()
+
+    # 재시작한 프로세스에서도 같은 결과를 재사용한다
+    cache = kokex.DiskCache(tmp_path / "kokex.db")
+    assert kokex.keywords(input_documents, cache=cache) == expected_results
+    assert cache.stats()["hits"] == 2
+
+    # 분석 옵션이 다르면 키워드는 다시 추출하지만 형태소 분석 결과는 재사용한다
+    custom_patterns = [{"pattern": "번째", "tag": "ORDER"}]
+    assert kokex.keywords(
+        input_documents, custom_patterns=custom_patterns, cache=cache
+    ) == kokex.keywords(input_documents, custom_patterns=custom_patterns)
+    assert cache.stats()["morph_hits"] == 2
+
+    assert kokex.keywords(
+        input_documents * 2, workers=2, chunk_size=1, cache=cache
+    ) == (kokex.keywords(input_documents * 2))
+
+    # 다른 버전의 결과는 사용하지 않는다
+    other_version = kokex.DiskCache(tmp_path / "kokex.db", version="0.0.0")
+    assert other_version.get(kokex.DiskCache.key("두 번째 문서입니다.")) is None
+    assert len(other_version) == 0
+    assert len(cache) == 4
+
+    # 다른 형태소 분석기는 보관된 키워드와 형태소 분석 결과를 사용하지 않는다
+    fake_parser = DocumentParser(analyzer=FakeAnalyzer())
+    fake_parser.parse(document=input_documents[0], build_tree=False)
+    fake_keywords = fake_parser.keywords()
+    fake_parser.parse(document=input_documents[0], cache=cache, build_tree=False)
+    assert fake_parser.keywords() == fake_keywords
+    assert fake_keywords != next(kokex.iter_keywords(input_documents[:1]))
+    assert cache.get_morphs(preproc(input_documents[0]), FakeAnalyzer()) is not None
+
+
+def test_keywords_spans():
+    input_document = "<p>첫 번째 문서입니다.</p> 여러 문장을 &quot;포함&quot;할 수 있습니다..."
+    spans = kokex.keyword_spans(input_document)
+    assert [word for word, _, _ in spans] == list(kokex.keywords([input_document]))
+
+    # 위치는 전처리 전 문서 기준이다
+    for word, start, end in spans:
+        assert input_document[start:end] == word
+
+    # 캐시에서 찾은 결과도 같은 위치를 돌려준다
+    cache = kokex.ParseCache()
+    kokex.keywords([input_document], cache=cache)
+    assert kokex.keyword_spans(input_document, cache=cache) == spans
+
+
+def test_keywords_scoring():
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "두 번째 문서입니다. 여러 문서를 포함할 수 있습니다.",
+    ]
+    assert kokex.keywords(input_documents, scoring="df") == {
+        "첫 번째": 1,
+        "문서": 2,
+        "문장": 1,
+        "포함": 2,
+        "두 번째": 1,
+    }
+
+    # 모든 문서에 나타난 키워드는 idf 가 1 이므로 tfidf 점수는 빈도와 같다
+    scores = kokex.keywords(input_documents, scoring="tfidf")
+    assert scores["문서"] == 3 and scores["포함"] == 2
+    assert scores["문장"] > 1
+
+    # top_k 는 점수 순서대로, 점수가 같으면 처음 나타난 순서대로 돌려준다
+    assert list(kokex.keywords(input_documents, top_k=2)) == ["문서", "포함"]
+    assert list(kokex.keywords(input_documents, scoring="bm25", top_k=3)) == [
+        "첫 번째",
+        "문장",
+        "두 번째",
+    ]
+
+    assert kokex.keywords(
+        input_documents * 2, workers=2, chunk_size=1, scoring="bm25"
+    ) == kokex.keywords(input_documents * 2, scoring="bm25")
+
+
+def test_keywords_scoring_invalid():
+    with pytest.raises(ValueError):
+        kokex.keywords([], scoring="unknown")
+
+
+def test_keywords_index():
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "두 번째 문서입니다. 여러 문서를 포함할 수 있습니다.",
+    ]
+    index = kokex.KeywordIndex(bucket_seconds=60)
+    for doc_id, doc_keywords in enumerate(kokex.iter_keywords(input_documents * 2)):
+        index.add(doc_id, doc_keywords, timestamp=doc_id * 60)
+
+    assert index.counts() == kokex.keywords(input_documents * 2)
+    assert index.counts(start=120) == kokex.keywords(input_documents)
+    assert index.top(2) == [("문서", 6), ("포함", 4)]
+
+    # 스냅샷에서 복원한 인덱스는 같은 통계를 돌려준다
+    restored = kokex.KeywordIndex.restore(index.snapshot())
+    assert restored.counts(start=120) == index.counts(start=120)
+
+    assert index.expire(120) == 2
+    assert index.remove(3) and not index.remove(3)
+    assert index.counts() == kokex.keywords(input_documents[:1])
@@ -0,0 +1,692 @@
+import ast
+import asyncio
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import kokex
+from kokex.core.analyzer import (
+    FakeAnalyzer,
+    align_morph,
+    analyzer_class,
+    create_analyzer,
+)
+from kokex.core.metrics import STAGES
+from kokex.core.parser import DocumentParser
+from kokex.core.preproc import preproc
+from kokex.core.tree import NodeData, ParseTree
+from kokex.server import server
+from kokex.server.backend import ParserBackend
+
+client = TestClient(server.app)
+
+
+def test_parse_0001():
+    result = kokex.parse("첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.", debug=False)
+    lines = result.splitlines()
+
+    assert lines[0] == "[root] 첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다."
+    assert lines[1] == "\t[root_000] 첫 번째 문서입니다."
+    assert lines[2] == "\t\t[root_000_000] 첫 번째"
+    assert "\t[root_002] 여러 문장을 포함할 수 있습니다." in lines
+
+
+def test_parse_0002():
+    # 자식 노드가 1000개 이상이면 문자열 정렬 순서가 유지되도록 자릿수를 늘린다
+    sentences = [f"{idx}번째 문장입니다." for idx in range(600)]
+    result = kokex.parse(" ".join(sentences), debug=False)
+    labels = [
+        line.split("]")[0] + "]"
+        for line in result.splitlines()
+        if line.startswith("\t[")
+    ]
+
+    assert labels[0] == "\t[root_0000]"
+    assert labels[-1] == "\t[root_1198]"
+    assert labels == sorted(labels)
+
+
+def test_parse_patterns():
+    document = "kokex 0.0.11 버전에서는 패턴 규칙을 추가했습니다."
+    patterns = [{"pattern": r"\d+.\d+.\d+", "tag": "PT001"}]
+
+    result = kokex.parse(document, custom_patterns=patterns)
+    assert "0.0.11/PT001" in result
+    assert (
+        kokex.parse(document, custom_patterns=kokex.CustomPatterns(patterns)) == result
+    )
+
+
+def test_parse_patterns_overlap():
+    document = "전화 010-1234-5678 입니다"
+    phone = {"pattern": r"\d{3}-\d{4}-\d{4}", "tag": "PHONE"}
+
+    # 먼저 입력된 패턴의 매칭과 겹치더라도, 형태소 경계에서 끝나는 매칭은 형태소가 된다
+    result = kokex.parse(
+        document, custom_patterns=[{"pattern": r"화 \d", "tag": "PA"}, phone]
+    )
+    assert "010-1234-5678/PHONE" in result
+    assert "/PA" not in result
+
+    # 같은 위치에서는 형태소 경계에서 끝나는 매칭 중 먼저 입력된 패턴을 고른다
+    result = kokex.parse(
+        document, custom_patterns=[{"pattern": r"010-12", "tag": "PA"}, phone]
+    )
+    assert "010-1234-5678/PHONE" in result
+
+    # 매칭 후보는 패턴마다 따로 finditer 로 탐색한 결과와 같다
+    patterns = [
+        {"pattern": r"\d{3}", "tag": "PA"},
+        {"pattern": r"\d+-\d+", "tag": "PB"},
+        {"pattern": r"(?i)A\d", "tag": "PC"},
+    ]
+    document = "12345-678 a1 A2 99"
+    expected = {}
+    for pattern in patterns:
+        for match in re.finditer(pattern["pattern"], document):
+            expected.setdefault(match.start(), []).append(
+                (match.end(), match.group(), pattern["tag"])
+            )
+    assert kokex.CustomPatterns(patterns).match_index(document) == expected
+
+
+def test_parse_patterns_invalid_tag():
+    with pytest.raises(Exception):
+        kokex.CustomPatterns([{"pattern": r"\d+", "tag": "pt001"}])
+
+
+def test_parse_preproc_lines():
+    # \n 으로 나누어 전처리해도 문서 전체를 전처리한 결과와 같다
+    input_documents = [
+        "https://a.b/c?x=y&z=w&amp;\u200b\t\ra@b.co",
+        "https://a.b/c?x\r=y\n다음 줄",
+        "https://a.b/c?x\u2028y=z 입니다\n@mention 다음 줄",
+        "https://a.b/c?x\x85y=z\r\nhttps://d.e/?f=g",
+    ]
+    for input_document in input_documents:
+        expected = preproc(input_document)
+        assert "\n".join(map(preproc, input_document.split("\n"))) == expected
+
+    assert preproc("https://a.b/c?x\r=y") == ""
+
+
+def test_parse_cache():
+    input_document = "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다."
+    expected_results = kokex.parse(input_document)
+
+    for store_tree in [False, True]:
+        cache = kokex.ParseCache(store_tree=store_tree)
+        for _ in range(2):
+            assert kokex.parse(input_document, cache=cache) == expected_results
+        assert cache.stats()["hits"] == 1
+
+    # 분석 옵션이 다르면 다른 키를 사용한다
+    assert kokex.ParseCache.key(input_document) != kokex.ParseCache.key(
+        input_document, proc_phrase=False
+    )
+    assert kokex.ParseCache.key(input_document) != kokex.ParseCache.key(
+        input_document, custom_patterns=[{"pattern": "문서", "tag": "DOC"}]
+    )
+
+    # 형태소 분석기나 사전이 다르면 다른 키를 사용한다
+    fake_analyzer = FakeAnalyzer()
+    assert kokex.ParseCache.key(
+        input_document, analyzer=fake_analyzer
+    ) != kokex.ParseCache.key(input_document, analyzer=analyzer_class())
+    other_dicpath = FakeAnalyzer()
+    other_dicpath.dicpath = "/tmp/other-dic"
+    assert kokex.ParseCache.key(
+        input_document, analyzer=fake_analyzer
+    ) != kokex.ParseCache.key(input_document, analyzer=other_dicpath)
+
+    # 같은 캐시를 사용해도 분석기마다 결과를 따로 보관한다
+    cache = kokex.ParseCache(max_segments=16)
+    fake_parser = DocumentParser(analyzer=fake_analyzer)
+    fake_parser.parse(document=input_document)
+    fake_results = fake_parser.printable_tree()
+    for _ in range(2):
+        assert kokex.parse(input_document, cache=cache) == expected_results
+        fake_parser.parse(document=input_document, cache=cache)
+        assert fake_parser.printable_tree() == fake_results
+
+
+def test_parse_segment_cache():
+    signature = "\n\n기자 홍길동 hong@example.com\n무단 전재 및 재배포 금지!"
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다." + signature,
+        "두 번째 문서입니다.\n여러 문서를 포함할 수 있습니다!" + signature,
+        "새로운 테스트 문장을 일련번호와 함께 메소드로 추가합니다." + signature,
+    ]
+
+    cache = kokex.ParseCache(max_segments=16)
+    for input_document in input_documents:
+        assert kokex.parse(input_document, cache=cache) == kokex.parse(input_document)
+
+    # 앞뒤 줄이 같은 서명의 마지막 줄은 Mecab 분석 결과를 재사용한다
+    assert cache.stats()["segment_hits"] == 2
+
+    # 줄 단위로 보관한 결과를 이어붙이면 문서 전체를 한번에 분석한 결과와 같다
+    corpus = Path(__file__).parent.parent / "bench" / "corpus" / "sample.txt"
+    input_documents += [
+        corpus.read_text(encoding="utf-8"),
+        "첫 줄입니다.\n\n  \n둘째 줄은  공백이 많습니다.\n마지막 줄",
+    ]
+    analyzer = create_analyzer()
+    cache = kokex.ParseCache(max_segments=1024)
+    for input_document in input_documents:
+        document = preproc(input_document)
+        expected = analyzer.pos(document)
+        for _ in range(2):
+            assert cache.pos(document, analyzer.pos, analyzer.pos_many) == expected
+
+    # 문서에 그대로 없는 표면형을 돌려주는 분석기도 줄 단위로 나눌 수 있다
+    class NormalizingAnalyzer(FakeAnalyzer):
+        def pos(self, text):
+            return [
+                (token.replace(",", ""), tag)
+                for token, tag in super().pos(text.replace("1,000", "1000"))
+            ]
+
+    input_document = "가격은 1,000원입니다.\n정말 저렴합니다.\n1,000원"
+    parser = DocumentParser(analyzer=NormalizingAnalyzer())
+    parser.parse(document=input_document)
+    expected = parser.printable_tree()
+    parser.parse(document=input_document, cache=kokex.ParseCache(max_segments=16))
+    assert parser.printable_tree() == expected
+
+    # 문서에서 찾을 수 없는 형태소는 멈추지 않고 ValueError 를 발생시킨다
+    class BrokenAnalyzer(FakeAnalyzer):
+        def pos(self, text):
+            return super().pos(text) + [("없는", "NNG")]
+
+    with pytest.raises(ValueError):
+        DocumentParser(analyzer=BrokenAnalyzer()).parse(
+            document="문서\n둘째 줄", cache=kokex.ParseCache(max_segments=16)
+        )
+
+
+def test_parse_formats():
+    document = "<b>첫 번째</b> 문서입니다. 여러 문장을 &lt;포함&gt;할 수 있습니다."
+    result = kokex.parse(document, debug=False)
+
+    html = kokex.parse(document, debug=False, format="html")
+    assert "&lt;포함&gt;" in html and "<br>" in html and "\t" not in html
+
+    nodes = [
+        json.loads(line) for line in kokex.parse(document, format="json").splitlines()
+    ]
+    assert [node["label"] for node in nodes] == [
+        line.split("]")[0].lstrip("\t[") for line in result.splitlines()
+    ]
+    assert nodes[1] == {
+        "label": "root_000",
+        "depth": 1,
+        "text": "첫 번째 문서입니다.",
+        "node_type": "문장",
+        "word_tag": None,
+        "sentence_tag": None,
+        "pos": nodes[1]["pos"],
+    }
+
+    with pytest.raises(ValueError):
+        kokex.parse(document, format="xml")
+
+    response = client.post(
+        "/parse/stream", params={"debug": False}, json={"doc": document}
+    )
+    assert response.status_code == 200
+    assert response.text == result
+
+    response = client.post(
+        "/parse/stream", params={"format": "xml"}, json={"doc": document}
+    )
+    assert response.status_code == 400
+
+
+def test_parse_stream():
+    document = "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.\n두 번째 줄입니다."
+    parser = DocumentParser()
+    parser.parse(document=document)
+    expected = list(parser.iter_printable_tree())
+
+    for workers in [0, 1]:
+        backend = ParserBackend(workers=workers)
+
+        async def stream():
+            chunks = [
+                chunk async for chunk in backend.parse_stream(document, chunk_size=1)
+            ]
+
+            # 중간에 그만 받은 스트림의 남은 조각은 버려진다
+            abandoned = backend.parse_stream(document, chunk_size=1)
+            await abandoned.__anext__()
+            await abandoned.aclose()
+
+            with pytest.raises(ValueError):
+                async for _ in backend.parse_stream(document, format="xml"):
+                    pass
+
+            return chunks, await backend.parse(document)
+
+        try:
+            chunks, result = asyncio.run(stream())
+        finally:
+            backend.stop()
+
+        # 워커는 노드를 출력하는 대로 조각을 보낸다
+        assert chunks == expected
+        assert result == "".join(expected)
+        assert not backend._streams
+
+
+def test_parse_deep_tree():
+    # 재귀 호출 한도보다 깊은 트리도 출력할 수 있다
+    tree = ParseTree()
+    parent_node_id = None
+    for _ in range(sys.getrecursionlimit() + 100):
+        parent_node_id = tree.add_node(
+            NodeData(
+                node_type="구",
+                parent_node_id=parent_node_id,
+                org_txt_form="문서",
+                pos_units=[("문서", "NNG")],
+            )
+        )
+
+    lines = tree.printable_subtree(ParseTree.ID_ROOT, debug=False).splitlines()
+    assert len(lines) == sys.getrecursionlimit() + 100
+    assert lines[-1].endswith("_000] 문서")
+
+
+def test_parse_tree_storage():
+    tree = ParseTree()
+    root_id = tree.add_node(NodeData(node_type="문서", org_txt_form="가나다"))
+    word_ids = [
+        tree.add_node(
+            NodeData(
+                node_type="단어",
+                parent_node_id=root_id,
+                org_txt_form=txt,
+                pos_units=[(txt, "NNG")],
+            )
+        )
+        for txt in "가나다"
+    ]
+    assert tree.get_children_node_ids(root_id) == word_ids
+    assert len(tree) == 4
+
+    # 연속된 형제 노드를 묶으면 그 자리에 새로운 노드가 들어간다
+    group_id = tree.group_nodes(
+        word_ids[:2],
+        NodeData(
+            node_type="단어",
+            parent_node_id=root_id,
+            org_txt_form="가나",
+            pos_units=[("가나", "NNG")],
+        ),
+    )
+    assert tree.get_children_node_ids(root_id) == [group_id, word_ids[2]]
+    assert tree.get_children_node_ids(group_id) == word_ids[:2]
+    assert tree.get_node_data_by_id(word_ids[0]).parent_node_id == group_id
+    with pytest.raises(ValueError):
+        tree.group_nodes(
+            [word_ids[0], word_ids[2]],
+            NodeData(
+                node_type="단어",
+                parent_node_id=root_id,
+                org_txt_form="가다",
+                pos_units=[("가다", "NNG")],
+            ),
+        )
+
+    tree.remove_node(word_ids[2])
+    assert tree.get_children_node_ids(root_id) == [group_id]
+    assert len(tree) == 4
+    assert list(tree.filter_nodes(lambda x: True)) == [root_id] + word_ids[:2] + [
+        group_id
+    ]
+
+
+def test_parse_tree_string_ids():
+    def node_data(node_id, parent_node_id, txt):
+        return NodeData(
+            node_id=node_id,
+            node_type="단어",
+            parent_node_id=parent_node_id,
+            org_txt_form=txt,
+            pos_txt_form=f"{txt}/NNG",
+        )
+
+    tree = ParseTree()
+    tree.add_node("root", node_data("root", None, "가나다"))
+    for node_id, txt in [("root_002", "다"), ("root_000", "가"), ("root_001", "나")]:
+        tree.add_node(node_id, node_data(node_id, "root", txt))
+    tree.add_node("root_001_000", node_data("root_001_000", "root_001", "나"))
+
+    # 자식 노드는 추가한 순서와 관계없이 ID 순서로 정렬되고, 노드는 추가한 순서로 순회한다
+    assert tree.get_children_node_ids("root") == ["root_000", "root_001", "root_002"]
+    assert list(tree.filter_nodes(lambda x: True)) == [
+        "root",
+        "root_002",
+        "root_000",
+        "root_001",
+        "root_001_000",
+    ]
+    assert tree.get_node_data_by_id("root_002").org_txt_form == "다"
+    assert tree.get_node_data_by_id("root_002").word_tag == "체언"
+    assert not tree.is_leaf("root_001") and tree.is_leaf("root_002")
+
+    # 같은 ID 로 다시 추가하면 노드 데이터를 바꾸고 자식 노드는 유지한다
+    tree.add_node("root_001", node_data("root_001", "root", "라"))
+    assert tree.get_children_node_ids("root") == ["root_000", "root_001", "root_002"]
+    assert tree.get_node_data_by_id("root_001").org_txt_form == "라"
+    assert tree.get_children_node_ids("root_001") == ["root_001_000"]
+
+    # 노드를 삭제해도 다른 형제 노드의 순서는 유지된다
+    tree.remove_node("root_000")
+    assert tree.get_children_node_ids("root") == ["root_001", "root_002"]
+    tree.add_node("root_000", node_data("root_000", "root", "가"))
+    assert tree.get_children_node_ids("root") == ["root_000", "root_001", "root_002"]
+    assert list(tree.filter_nodes(lambda x: True))[-1] == "root_000"
+
+
+def test_parse_tree_labels():
+    # 이전 API 처럼 문자열 노드 ID 로 노드를 추가하면, 출력에도 그 ID 를 사용한다
+    tree = ParseTree()
+    for node_id, parent_node_id, txt in [
+        (ParseTree.LABEL_ROOT, None, "가나"),
+        ("root_001", "root", "나"),
+        ("root_000", "root", "가"),
+        ("root_000_000", "root_000", "가"),
+    ]:
+        tree.add_node(
+            node_id,
+            NodeData(
+                node_id=node_id,
+                node_type="단어",
+                parent_node_id=parent_node_id,
+                org_txt_form=txt,
+                pos_units=[(txt, "NNG")],
+            ),
+        )
+
+    assert tree.printable_subtree("root", debug=False).splitlines() == [
+        "[root] 가나",
+        "\t[root_000] 가",
+        "\t\t[root_000_000] 가",
+        "\t[root_001] 나",
+    ]
+    assert tree.get_node_label("root_000_000") == "root_000_000"
+    assert tree.get_node_data_by_id("root_001").node_id == "root_001"
+
+    # 정수 노드 ID 로 추가한 노드의 이름은 형제 노드 사이의 순서로 계산한다
+    tree = ParseTree()
+    root_id = tree.add_node(NodeData(node_type="문서", org_txt_form="가"))
+    child_id = tree.add_node(
+        NodeData(
+            node_type="단어",
+            parent_node_id=root_id,
+            org_txt_form="가",
+            pos_units=[("가", "NNG")],
+        )
+    )
+    assert root_id == ParseTree.ID_ROOT
+    assert tree.get_node_label(child_id) == "root_000"
+
+
+def test_parse_to_networkx():
+    pytest.importorskip("networkx")
+
+    parser = DocumentParser()
+    parser.parse(document="첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.")
+    tree = parser._tree
+
+    g = tree.to_networkx()
+    assert g.number_of_nodes() == len(tree)
+    assert g.number_of_edges() == len(tree) - 1
+    for node_id, data in g.nodes(data="data"):
+        assert data is tree.get_node_data_by_id(node_id)
+    for parent_id, child_id in g.edges():
+        assert g.nodes[child_id]["data"].parent_node_id == parent_id
+
+
+def test_parse_stats():
+    input_document = "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다."
+    parser = DocumentParser()
+
+    received = []
+    parser.parse(document=input_document, on_stats=received.append)
+    assert received == [parser.stats]
+    assert list(parser.stats.stages) == list(STAGES)
+    assert parser.stats.stages["phrases"][1] == len(parser._tree)
+
+    # 캐시에서 찾은 문서는 전처리 단계만 기록한다
+    cache = kokex.ParseCache()
+    with kokex.collect_stats() as collector:
+        kokex.parse(input_document, cache=cache)
+        kokex.sentences(input_document, cache=cache)
+    assert collector.docs == 2 and collector.cached == 1
+    assert collector.stages["preproc"].count == 2
+    assert collector.stages["morphs"].count == 1
+
+    # 키워드를 추출할 때는 구 단계를 기록하고, 문장만 분리할 때는 건너뛴다
+    with kokex.collect_stats() as collector:
+        kokex.keywords([input_document, "두 번째 문서입니다."])
+        kokex.sentences(input_document)
+    assert collector.docs == 3
+    assert collector.stages["sentences"].count == 3
+    assert collector.stages["phrases"].count == 2
+
+    client.post("/sentences", json={"doc": input_document})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.json()["stages"]["sentences"]["seconds"]["count"] >= 1
+
+    # 서버의 /keywords 도 구 단계를 기록한다
+    phrases = response.json()["stages"]["phrases"]["seconds"]["count"]
+    client.post("/keywords", json={"docs": [input_document]})
+    response = client.get("/metrics")
+    assert response.json()["stages"]["phrases"]["seconds"]["count"] == phrases + 1
+
+
+def test_parse_build_tree():
+    input_documents = [
+        "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다.",
+        "봉준호 감독은 \"상상도 못 했다. 정말 기쁘다\"며 '기생충' 팀에 감사했다... 와 대단하다!! #영화 #오스카",
+        "중국을 방문한 대통령이 논란을 빚고 있다\n\n이긴것이 아니다 大韓民國 NASA",
+    ]
+
+    tree_parser = DocumentParser()
+    parser = DocumentParser()
+    for input_document in input_documents:
+        for options in [{}, {"proc_composite_word": False}, {"proc_phrase": False}]:
+            tree_parser.parse(document=input_document, **options)
+            parser.parse(document=input_document, build_tree=False, **options)
+            assert list(parser.stats.stages) == list(tree_parser.stats.stages)
+            assert parser.keywords() == tree_parser.keywords()
+
+            # 구 단위 분석을 미루면 문장만 요청할 때 구 단계는 건너뛴다
+            parser.parse(
+                document=input_document,
+                build_tree=False,
+                eager_phrase=False,
+                **options,
+            )
+            assert parser.sentences() == tree_parser.sentences()
+            assert parser.sentence_spans() == tree_parser.sentence_spans()
+            assert "phrases" not in parser.stats.stages
+            assert parser.keywords() == tree_parser.keywords()
+            assert parser.keyword_spans() == tree_parser.keyword_spans()
+            assert parser.printable_tree() == tree_parser.printable_tree()
+
+    # 캐시에는 트리 없이 키워드와 문장을 보관한다
+    cache = kokex.ParseCache()
+    parser.parse(document=input_documents[1], cache=cache, build_tree=False)
+    assert "phrases" in parser.stats.stages
+    tree_parser.parse(document=input_documents[1], cache=cache)
+    assert tree_parser.stats.cached
+    assert tree_parser.keywords() == parser.keywords()
+    assert tree_parser.printable_tree() == kokex.parse(input_documents[1])
+
+
+def test_parse_build_tree_parity():
+    # 키워드, 문장 테스트와 벤치마크 코퍼스의 모든 문서에서 트리를 만들 때와 만들지 않을 때의 결과가 같다
+    test_dir = Path(__file__).parent
+    input_documents = []
+    for name in ["test_keywords.py", "test_sentences.py"]:
+        tree = ast.parse((test_dir / name).read_text(encoding="utf-8"))
+        input_documents += [
+            node.value
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Constant)
+            and isinstance(node.value, str)
+            and re.search("[가-힣]", node.value)
+        ]
+    corpus = test_dir.parent / "bench" / "corpus" / "sample.txt"
+    input_documents += corpus.read_text(encoding="utf-8").splitlines()
+
+    tree_parser = DocumentParser()
+    parser = DocumentParser()
+    options_list = [
+        {},
+        {"proc_composite_word": False},
+        {"proc_josa": False},
+        {"proc_phrase": False},
+    ]
+    for input_document in input_documents:
+        for options in options_list:
+            tree_parser.parse(document=input_document, **options)
+            parser.parse(document=input_document, build_tree=False, **options)
+
+            assert parser.keywords() == tree_parser.keywords()
+            assert parser.keyword_spans() == tree_parser.keyword_spans()
+            assert parser.sentences() == tree_parser.sentences()
+            assert parser.sentence_spans() == tree_parser.sentence_spans()
+            assert {
+                stage: nodes for stage, (_, nodes) in parser.stats.stages.items()
+            } == {
+                stage: nodes for stage, (_, nodes) in tree_parser.stats.stages.items()
+            }
+
+
+def test_parse_analyzer(monkeypatch):
+    input_document = "첫 번째 문서입니다. 여러 문장을 포함할 수 있습니다."
+
+    # konlpy 를 사용해도 결과는 같다
+    parser = DocumentParser(analyzer="konlpy")
+    parser.parse(document=input_document)
+    assert parser.printable_tree() == kokex.parse(input_document)
+
+    # 테스트용 백엔드는 Mecab 없이 문자 종류로 태그를 붙인다
+    parser = DocumentParser(analyzer=FakeAnalyzer())
+    parser.parse(document=input_document)
+    assert parser.sentences() == ["첫 번째 문서입니다.", "여러 문장을 포함할 수 있습니다."]
+
+    class CountingAnalyzer(FakeAnalyzer):
+        calls = 0
+
+        def pos_many(self, texts):
+            self.calls += 1
+            return super().pos_many(texts)
+
+    # 캐시에 없는 줄들은 한번에 분석한다
+    analyzer = CountingAnalyzer()
+    parser = DocumentParser(analyzer=analyzer)
+    cache = kokex.ParseCache(max_segments=16)
+    parser.parse(document="첫 줄\n둘째 줄\n셋째 줄\n넷째 줄\n다섯째 줄", cache=cache)
+    parser.parse(document="바뀐 줄\n둘째 줄\n셋째 줄\n넷째 줄\n바뀐 끝 줄", cache=cache)
+    assert analyzer.calls == 1
+
+    with pytest.raises(ValueError):
+        DocumentParser(analyzer="unknown")
+
+    # Mecab 사전 경로는 환경변수로 바꿀 수 있고, 캐시 키도 이를 따른다
+    default_key = kokex.ParseCache.key(input_document, analyzer=analyzer_class("mecab"))
+    monkeypatch.setenv("KOKEX_MECAB_DICPATH", "/nonexistent/mecab-ko-dic")
+    assert analyzer_class("mecab").default_dicpath() == "/nonexistent/mecab-ko-dic"
+    assert (
+        kokex.ParseCache.key(input_document, analyzer=analyzer_class("mecab"))
+        != default_key
+    )
+    with pytest.raises(RuntimeError):
+        create_analyzer("mecab")
+
+
+def test_parse_analyzer_surface_mismatch():
+    class NormalizingAnalyzer(FakeAnalyzer):
+        # 숫자의 쉼표를 지운 표면형을 돌려주는 분석기
+        def pos(self, text):
+            return [
+                (token.replace(",", ""), tag)
+                for token, tag in super().pos(text.replace("1,000", "1000"))
+            ]
+
+    input_document = "가격은 1,000원입니다. 정말 저렴합니다."
+    parser = DocumentParser(analyzer=NormalizingAnalyzer())
+    parser.parse(document=input_document)
+
+    # 문서에 없는 표면형은 글자 단위로 맞추어, 위치가 문서를 벗어나거나 음수가 되지 않는다
+    assert "".join(morph for morph, _ in parser._morphs) == input_document
+    assert parser._morph_starts == sorted(parser._morph_starts)
+    assert all(0 <= end <= len(input_document) for end in parser._morph_ends)
+    for sentence, start, end in parser.sentence_spans():
+        assert input_document[start:end] == sentence
+
+    # 뒤에 같은 문자열이 있어도 건너뛰지 않고, 공백이 아닌 문자는 SWS 가 되지 않는다
+    input_document = "가격은 1,000원과 1000원입니다."
+    parser.parse(document=input_document)
+    assert parser._morphs[:4] == [
+        ("가격은", "NNG"),
+        (" ", "SWS"),
+        ("1,000", "SN"),
+        ("원과", "NNG"),
+    ]
+    assert all(not morph.strip() for morph, tag in parser._morphs if tag == "SWS")
+    assert align_morph("x나가", "가") == (0, 3)
+
+    class BrokenAnalyzer(FakeAnalyzer):
+        def pos(self, text):
+            return super().pos(text) + [("없는", "NNG")]
+
+    with pytest.raises(ValueError):
+        DocumentParser(analyzer=BrokenAnalyzer()).parse(document="문서")
+
+
+def test_parse_lazy_import():
+    # import kokex 는 형태소 분석기, 서버 등 무거운 모듈을 불러오지 않는다
+    code = (
+        "import sys, kokex; "
+        "print(' '.join(sorted(m for m in ('konlpy', 'jpype', 'MeCab', 'networkx', "
+        "'fastapi', 'kokex.api') if m in sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+    # import kokex 에 걸리는 시간(하위 모듈 포함)은 넉넉한 기준(200ms) 안에 든다
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import kokex"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = [
+        int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.split("|")[-1].strip() == "kokex"
+    ]
+    assert len(cumulative) == 1
+    assert cumulative[0] < 200_000
+
+    # 형태소 분석기는 처음 분석할 때 적재한다
+    parser = DocumentParser()
+    assert parser._analyzer is None
+    parser.preload()
+    assert parser._analyzer is not None
+    assert "첫 번째 문서입니다." in kokex.sentences("첫 번째 문서입니다.")
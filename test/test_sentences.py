@@ -13,6 +13,22 @@ def test_sentences_0001():
     )
 
 
+def test_sentences_0002():
+    check_results(
+        input_document="",
+        expected_results=[],
+    )
+
+
+def test_sentences_0003():
+    # 한 위계에 1000개 이상의 단어가 있는 문서
+    sentences = [f"{idx}번째 문장입니다." for idx in range(300)]
+    check_results(
+        input_document=" ".join(sentences),
+        expected_results=sentences,
+    )
+
+
 def check_results(input_document, expected_results):
     sentences = kokex.sentences(input_document)
     assert sentences == expected_results
@@ -20,3 +36,15 @@ def check_results(input_document, expected_results):
     response = client.post("/sentences", json={"doc": input_document})
     assert response.status_code == 200
     assert response.json() == expected_results
+
+
+def test_sentences_spans():
+    input_document = "<b>첫 번째 문서입니다.</b> 여러 문장을 &lt;포함&gt;할 수 있습니다."
+    spans = kokex.sentence_spans(input_document)
+    assert [sentence for sentence, _, _ in spans] == kokex.sentences(input_document)
+
+    # 전처리로 바뀐 부분은 바뀌기 전의 문자열 전체를 포함한다
+    assert [input_document[start:end] for _, start, end in spans] == [
+        "첫 번째 문서입니다.",
+        "여러 문장을 &lt;포함&gt;할 수 있습니다.",
+    ]